@@ -0,0 +1,75 @@
+import numpy as np
+
+from config import compiled
+
+
+def _buy_sell(price, cfg):
+    """Kosten per opgeslagen kWh (prijs / charge_eff) en opbrengst per opgeslagen kWh (prijs × discharge_eff)."""
+    price = np.asarray(price, dtype=np.float64)
+    pc = compiled(cfg)
+    ceff = pc.charge_eff
+    deff = pc.discharge_eff
+    missing = np.isnan(price)
+    buy = np.where(missing, np.inf, price / ceff)
+    sell = np.where(missing, -np.inf, price * deff)
+    return buy, sell
+
+
+def best_pair(price, cfg):
+    """
+    Meest winstgevende (laadslot i, later ontlaadslot j > i) na rendementsverliezen, in één O(n)-scan.
+    Retourneert (i, j, marge € per opgeslagen kWh) of None als geen enkel paar winst oplevert.
+    """
+    buy, sell = _buy_sell(price, cfg)
+    if len(buy) < 2:
+        return None
+    # Goedkoopste inkoop strikt vóór elk slot
+    cheapest = np.minimum.accumulate(buy)
+    margin = sell[1:] - cheapest[:-1]
+    j = int(np.argmax(margin)) + 1
+    if not margin[j - 1] > 0:
+        return None
+    i = int(np.argmin(buy[:j]))
+    return i, j, float(margin[j - 1])
+
+
+def top_k_pairs(price, cfg, k: int):
+    """
+    Maximaal k niet-overlappende cycli (laad i₁ < ontlaad j₁ < laad i₂ < ontlaad j₂ …) met de hoogste
+    totale marge per opgeslagen kWh. DP in O(n·k): per slot één gevectoriseerde stap over k.
+    Retourneert [(i, j, marge)] op tijdsvolgorde.
+    """
+    buy, sell = _buy_sell(price, cfg)
+    n = len(buy)
+    if n < 2 or k < 1:
+        return []
+    hold = np.full(k + 1, -np.inf)   # hold[c]: c-de cyclus geladen, nog niet ontladen
+    free = np.zeros(k + 1)           # free[c]: c cycli afgerond
+    free[1:] = -np.inf
+    bought = np.zeros((n, k + 1), dtype=bool)
+    sold = np.zeros((n, k + 1), dtype=bool)
+    for t in range(n):
+        take_buy = free[:-1] - buy[t]
+        take_sell = hold[1:] + sell[t]
+        bought[t, 1:] = take_buy > hold[1:]
+        sold[t, 1:] = take_sell > free[1:]
+        new_hold = hold.copy()
+        new_hold[1:] = np.where(bought[t, 1:], take_buy, hold[1:])
+        free[1:] = np.where(sold[t, 1:], take_sell, free[1:])
+        hold = new_hold
+
+    # Terug volgen vanaf het beste aantal afgeronde cycli
+    c = int(np.argmax(free))
+    pairs = []
+    holding = False
+    j = None
+    for t in range(n - 1, -1, -1):
+        if c == 0:
+            break
+        if not holding and sold[t, c]:
+            holding, j = True, t
+        elif holding and bought[t, c]:
+            pairs.append((t, j, float(sell[j] - buy[t])))
+            holding = False
+            c -= 1
+    return pairs[::-1]
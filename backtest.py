@@ -0,0 +1,238 @@
+"""
+Backtest: speel opgeslagen dagprijzen en gearchiveerde instraling af door planner en simulator.
+
+    python backtest.py --start 2025-01-01 --end 2025-12-31 --out backtest.jsonl
+    python backtest.py --start 2025-01-01 --end 2025-12-31 --variant klein:battery_kwh=30,inverter_charge_kw=6
+
+Config-varianten lopen parallel over een process pool; de dagen van één variant lopen op volgorde in één
+worker, zodat elke dag de eind-SOC van de vorige overneemt (de eerste start op backtest_start_soc) en de
+uitkomst niet van het aantal workers afhangt. Elke dagregel gaat via een queue terug zodra die dag klaar is
+en wordt direct als JSON-regel naar schijf geschreven.
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import queue
+from concurrent.futures import ProcessPoolExecutor
+from datetime import date, datetime, timedelta, time as dtime
+from zoneinfo import ZoneInfo
+
+import numpy as np
+
+from config import load_or_create_config
+from planner import (
+    PvSurplus, plan, plan_optimal, estimate_arbitrage, max_soc_increase_in_slot, max_soc_decrease_in_slot,
+)
+from series import PriceSeries, RadiationSeries
+from services import location_key
+from simulator import simulate_soc, cashflow_eur
+from store import STORE_PATH, PriceStore, RadiationStore
+
+
+def _day_range(start: date, end: date):
+    return [start + timedelta(days=i) for i in range((end - start).days + 1)]
+
+
+def _iso(v):
+    return v.isoformat() if isinstance(v, datetime) else v
+
+
+_row_queue = None      # per worker-proces, gezet door _init_worker
+
+
+def _init_worker(rows):
+    global _row_queue
+    _row_queue = rows
+    # Niet bij afsluiten op de queue wachten: stopt de lezer vroegtijdig, dan blokkeert een volle pipe anders
+    rows.cancel_join_thread()
+
+
+def _run_variant(cfg, variant: str, day_isos, store_path: str, mode: str):
+    """Worker: alle dagen van één variant op volgorde; elke dagregel gaat direct naar de queue, daarna None."""
+    try:
+        for row in _variant_days(cfg, variant, day_isos, store_path, mode):
+            _row_queue.put(row)
+    finally:
+        _row_queue.put(None)
+
+
+def _variant_days(cfg, variant: str, day_isos, store_path: str, mode: str):
+    """
+    Plan + simulatie per dag voor één config-variant, als generator. De eind-SOC van de simulatie van een
+    dag is de start-SOC van de volgende; de eerste dag start op backtest_start_soc.
+    """
+    tz = ZoneInfo(cfg["timezone"])
+    prices_store = PriceStore(store_path)
+    rad_store = RadiationStore(store_path)
+    loc = location_key(cfg)
+    soc = float(cfg.get("backtest_start_soc", cfg["min_soc_reserve"]))
+
+    for iso in day_isos:
+        day = date.fromisoformat(iso)
+        row = {"date": iso, "variant": variant, "start_soc": round(soc, 1)}
+        blocks = prices_store.get_day(day, tz)
+        if not blocks:
+            row["note"] = "geen prijzen opgeslagen"
+            yield row
+            continue
+        prices = PriceSeries.from_blocks(blocks, tz)
+        day_start = datetime.combine(day, dtime(0), tzinfo=tz)
+        day_end = datetime.combine(day + timedelta(days=1), dtime(0), tzinfo=tz)
+        ts, sw = rad_store.history(loc, day_start.timestamp(), day_end.timestamp())
+        pv = PvSurplus(RadiationSeries.from_points(ts, sw, 3600, tz, fill=0.0), cfg)
+
+        out = plan(soc, prices, pv, day_start, cfg, tz)
+        if "note" in out:
+            row["note"] = out["note"]
+            yield row
+            continue
+        arb = estimate_arbitrage(out, cfg)
+        row.update({
+            "radiation_hours": len(ts),
+            "cheap_start": _iso(out["cheap_start"]),
+            "cheap_price": out["cheap_price"],
+            "exp_start": _iso(out["exp_start"]),
+            "exp_price": out["exp_price"],
+            "add_pct": out["add_pct"],
+            "target_soc_after_charge": out["target_soc_after_charge"],
+            "est_profit_eur": arb["profit_eur"],
+        })
+        if mode in ("dp", "both"):
+            opt = plan_optimal(soc, prices, pv, day_start, cfg, tz)
+            row["dp_profit_eur"] = opt.get("profit_eur")
+            row["dp_windows"] = len(opt.get("windows", []))
+
+        day_prices = prices.slice(day_start, day_end)
+        t = day_prices.t
+        hours = day_prices.step / 3600.0
+        sim = simulate_soc(
+            soc,
+            pv.slot_gains(t, t + day_prices.step),
+            (t >= out["cheap_start"].timestamp()) & (t < out["cheap_end"].timestamp()),
+            (t >= out["exp_start"].timestamp()) & (t < out["exp_end"].timestamp()),
+            out["target_soc_after_charge"],
+            cfg["min_soc_reserve"],
+            max_soc_increase_in_slot(hours, cfg),
+            max_soc_decrease_in_slot(hours, cfg),
+        )
+        cash = cashflow_eur(np.nan_to_num(day_prices.price), sim, cfg)
+        soc = float(sim.soc[-1])
+        row["sim_profit_eur"] = round(float(cash), 2)
+        row["sim_end_soc"] = round(soc, 1)
+        yield row
+
+
+def backtest_rows(cfg, days, variants=None, workers=None, mode: str = "simple", store_path: str = STORE_PATH):
+    """
+    Genereer resultaatregels per (variant, dag) zodra elke dag klaar is; per variant in datumvolgorde.
+    variants: [(naam, {cfg-overrides})]; standaard alleen de basisconfig. Hooguit één worker per variant.
+    """
+    variants = variants or [("base", {})]
+    workers = min(workers or os.cpu_count() or 1, len(variants))
+    day_isos = [d.isoformat() for d in days]
+    ctx = multiprocessing.get_context()
+    rows = ctx.Queue()
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx, initializer=_init_worker, initargs=(rows,)) as pool:
+        futures = [pool.submit(_run_variant, {**cfg, **overrides}, name, day_isos, store_path, mode)
+                   for name, overrides in variants]
+        running = len(futures)
+        try:
+            while running:
+                try:
+                    row = rows.get(timeout=0.5)
+                except queue.Empty:
+                    # Een afgebroken worker stuurt geen None meer: zijn fout hier doorgeven
+                    for fut in futures:
+                        if fut.done() and fut.exception() is not None:
+                            raise fut.exception()
+                    continue
+                if row is None:
+                    running -= 1
+                else:
+                    yield row
+        finally:
+            for fut in futures:
+                fut.cancel()
+        for fut in futures:
+            fut.result()
+
+
+def summarize(rows):
+    """Totaal per variant over alle dagen met een plan."""
+    out = {}
+    for row in rows:
+        s = out.setdefault(row["variant"], {"days": 0, "skipped": 0, "est_profit_eur": 0.0,
+                                            "sim_profit_eur": 0.0, "dp_profit_eur": 0.0})
+        if "note" in row:
+            s["skipped"] += 1
+            continue
+        s["days"] += 1
+        for key in ("est_profit_eur", "sim_profit_eur", "dp_profit_eur"):
+            s[key] += row.get(key) or 0.0
+    for s in out.values():
+        for key in ("est_profit_eur", "sim_profit_eur", "dp_profit_eur"):
+            s[key] = round(s[key], 2)
+    return out
+
+
+def run_backtest(cfg, start: date, end: date, out_path: str, variants=None, workers=None, mode: str = "simple",
+                 store_path: str = STORE_PATH):
+    """Backtest [start, end] en stream elke dagregel als JSON naar out_path; retourneert de samenvatting."""
+    rows = []
+    with open(out_path, "w", encoding="utf-8") as f:
+        for row in backtest_rows(cfg, _day_range(start, end), variants, workers, mode, store_path):
+            f.write(json.dumps(row, ensure_ascii=False) + "\n")
+            f.flush()
+            rows.append(row)
+    return summarize(rows)
+
+
+def parse_variant(text: str):
+    """'naam:key=value,key=value' → (naam, {key: float(value)})."""
+    name, _, assigns = text.partition(":")
+    overrides = {}
+    for part in filter(None, assigns.split(",")):
+        key, _, value = part.partition("=")
+        overrides[key.strip()] = float(value)
+    return name, overrides
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="ChargeMind backtest over opgeslagen prijzen en instraling")
+    ap.add_argument("--start", required=True, type=date.fromisoformat)
+    ap.add_argument("--end", required=True, type=date.fromisoformat)
+    ap.add_argument("--out", default="backtest.jsonl")
+    ap.add_argument("--workers", type=int, default=None)
+    ap.add_argument("--mode", choices=("simple", "dp", "both"), default="simple")
+    ap.add_argument("--variant", action="append", default=[], help="naam:key=value,... (herhaalbaar)")
+    ap.add_argument("--backfill", action="store_true",
+                    help="ontbrekende prijsdagen en archief-instraling eerst ophalen")
+    args = ap.parse_args(argv)
+
+    cfg = load_or_create_config()
+    if args.backfill:
+        import services
+        tz = ZoneInfo(cfg["timezone"])
+
+        async def backfill():
+            failed = await services.backfill_prices(_day_range(args.start, args.end), tz)
+            await services.backfill_radiation_history(cfg, tz, args.start, args.end)
+            await services.aclose_http()
+            return failed
+
+        failed = asyncio.run(backfill())
+        if failed:
+            print(f"Geen prijzen voor {len(failed)} dag(en), o.a. {failed[0].isoformat()}")
+
+    variants = [("base", {})] + [parse_variant(v) for v in args.variant]
+    summary = run_backtest(cfg, args.start, args.end, args.out, variants, args.workers, args.mode)
+    for name, s in summary.items():
+        print(f"{name:>12}: {s['days']} dagen (overgeslagen {s['skipped']}) | "
+              f"schatting {s['est_profit_eur']:.2f} € | simulatie {s['sim_profit_eur']:.2f} € | "
+              f"DP {s['dp_profit_eur']:.2f} €")
+
+
+if __name__ == "__main__":
+    main()
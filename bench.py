@@ -0,0 +1,295 @@
+"""
+Micro-benchmarks voor de hete paden van de planner, met vaste synthetische fixtures.
+
+    python bench.py                    # meten en vergelijken met de baseline van deze machine (exit 1 bij
+                                       # regressie, exit 2 zonder baseline voor een case, tenzij --allow-missing-baseline)
+    python bench.py --save             # huidige meting als nieuwe baseline opslaan (vervangt de oude)
+    python bench.py --save-if-missing  # ontbrekende baseline(-cases) eerst vastleggen, daarna vergelijken
+    python bench.py -k plan --repeat 7 # alleen cases met 'plan' in de naam
+
+Per case: tijd per aanroep (beste van --repeat rondes), doorvoer (items/s) en geheugen per aanroep
+(piek en netto, via tracemalloc). Een case regressiert als hij meer dan --tolerance trager is dan
+de baseline of duidelijk meer geheugen alloceert.
+
+Timings zijn machinegebonden, dus er is geen gedeelde baseline in de repo: elke machine krijgt er een in
+bench_baselines/<host>-<arch>-py<versie>.json. Op een nieuwe machine (of in CI) legt --save-if-missing
+die bij de eerste run vast; latere runs vergelijken ertegen.
+"""
+import argparse
+import json
+import os
+import platform
+import re
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+import numpy as np
+
+from config import DEFAULTS
+from planner import (
+    PvSurplus, pv_kwh_from_radiation, predict_soc_gain, plan, estimate_arbitrage, soc_curve,
+)
+from series import PriceSeries, RadiationSeries
+from simulator import simulate_soc, _simulate_batch
+from utils import linear_interp, tilt_factor, TILT_TABLE
+
+BASELINE_DIR = "bench_baselines"
+TZ = ZoneInfo("Europe/Amsterdam")
+BASE_DAY = datetime(2025, 6, 2, tzinfo=TZ)      # vaste maandag, geen DST-wissel in de fixtures
+SEED = 20250602
+
+# Prijsdagen: (slots, slotlengte in s) → 1 dag uur, vandaag+morgen uur, 1 dag kwartier, 1 week kwartier
+PRICE_FIXTURES = {24: 3600, 48: 3600, 96: 900, 672: 900}
+RADIATION_WEEKS = 4
+# simulate_soc: slots per run (dag uur/kwartier) en batchgrootte voor de gevectoriseerde lus
+SIM_SLOTS = (24, 96)
+SIM_BATCH = 64
+
+# Geheugen mag iets schommelen (numpy-buffers, interne caches)
+_ALLOC_SLACK_BYTES = 4096
+
+
+# ---------------------------- Fixtures ----------------------------
+
+def price_fixture(slots: int, step: int, seed: int = SEED) -> PriceSeries:
+    """Dagprofiel met ochtend- en avondpiek, middagdal en deterministische ruis (€/kWh)."""
+    rng = np.random.default_rng(seed + slots)
+    t = int(BASE_DAY.timestamp()) + step * np.arange(slots, dtype=np.int64)
+    hour = ((t - t[0]) % 86400) / 3600.0
+    price = (0.10 + 0.06 * np.exp(-((hour - 8.0) / 1.5) ** 2) + 0.10 * np.exp(-((hour - 19.0) / 2.0) ** 2)
+             - 0.08 * np.exp(-((hour - 13.5) / 2.0) ** 2) + rng.normal(0.0, 0.01, slots))
+    return PriceSeries(t, np.round(price, 5), step, TZ)
+
+
+def radiation_fixture(weeks: int = RADIATION_WEEKS, seed: int = SEED) -> RadiationSeries:
+    """Uurlijkse instraling over `weeks` weken vanaf BASE_DAY: zonneboog × wisselende bewolking."""
+    rng = np.random.default_rng(seed)
+    n = weeks * 7 * 24
+    t = int(BASE_DAY.timestamp()) + 3600 * np.arange(n, dtype=np.int64)
+    hour = (np.arange(n) % 24) + 0.5
+    sun = np.clip(np.sin((hour - 5.5) / 16.0 * np.pi), 0.0, None) * 850.0
+    clouds = np.repeat(rng.uniform(0.3, 1.0, n // 24), 24) * rng.uniform(0.85, 1.0, n)
+    return RadiationSeries(t, np.round(sun * clouds, 1), 3600, TZ)
+
+
+def simulation_fixture(slots: int, seed: int = SEED):
+    """Invoer voor simulate_soc als (1, slots)-arrays: PV overdag, 's nachts laden, 's avonds ontladen."""
+    rng = np.random.default_rng(seed + slots)
+    hour = np.arange(slots) * 24.0 / slots
+    pv = np.where((hour > 7) & (hour < 18), rng.uniform(0.0, 8.0 * 24.0 / slots, slots), 0.0)
+    return dict(
+        pv_pct=pv[None, :], charge=((hour >= 2) & (hour < 5))[None, :], discharge=((hour >= 18) & (hour < 22))[None, :],
+        target_pct=np.full((1, slots), 90.0), floor_pct=np.full((1, slots), 35.0),
+        max_charge_pct=np.full((1, slots), 24.0 * 24.0 / slots), max_discharge_pct=np.full((1, slots), 24.0 * 24.0 / slots),
+    )
+
+
+def machine_id() -> str:
+    """Sleutel van deze machine voor de baseline: host, architectuur en Python-versie."""
+    raw = f"{platform.node() or 'host'}-{platform.machine() or 'cpu'}-py{sys.version_info[0]}{sys.version_info[1]}"
+    return re.sub(r"[^A-Za-z0-9_.-]+", "_", raw)
+
+
+def default_baseline_path() -> str:
+    return os.path.join(BASELINE_DIR, machine_id() + ".json")
+
+
+def _cfg():
+    return dict(DEFAULTS)
+
+
+# ---------------------------- Cases ----------------------------
+
+def build_cases():
+    """[(naam, functie, items per aanroep)]; fixtures worden hier één keer opgebouwd."""
+    cfg = _cfg()
+    rad = radiation_fixture()
+    pv = PvSurplus(rad, cfg)
+    sw = rad.sw
+    sw_list = sw.tolist()
+    start = BASE_DAY + timedelta(hours=6, minutes=20)
+    end = BASE_DAY + timedelta(hours=17, minutes=40)
+    tilts = np.linspace(-5.0, 70.0, 1000).tolist()
+
+    cases = [
+        ("pv_kwh_from_radiation/scalar", lambda: [pv_kwh_from_radiation(w, 1.0, cfg) for w in sw_list], len(sw_list)),
+        ("pv_kwh_from_radiation/array", lambda: pv_kwh_from_radiation(sw, 1.0, cfg), len(sw)),
+        ("pv_surplus/build", lambda: PvSurplus(rad, cfg), len(rad)),
+        ("radiation/resample_900", lambda: rad.resample(900), 4 * len(rad)),
+        ("predict_soc_gain/radiation", lambda: predict_soc_gain(40.0, rad, start, end, cfg), 1),
+        ("predict_soc_gain/pv_surplus", lambda: predict_soc_gain(40.0, pv, start, end, cfg), 1),
+        ("linear_interp", lambda: [linear_interp(x, TILT_TABLE) for x in tilts], len(tilts)),
+        ("tilt_factor", lambda: [tilt_factor(x) for x in tilts], len(tilts)),
+    ]
+    # Eén run gaat via gewone floats (_simulate_one); batch_path_1 meet de numpy-lus bij B=1 ter vergelijking
+    for slots in SIM_SLOTS:
+        kw = simulation_fixture(slots)
+        one = {k: v[0] for k, v in kw.items()}
+        cases += [
+            (f"simulate_soc/one/{slots}", lambda kw=one: simulate_soc(40.0, **kw), slots),
+            (f"simulate_soc/batch_path_1/{slots}",
+             lambda kw=kw: _simulate_batch(np.array([40.0]), *kw.values()), slots),
+            (f"simulate_soc/batch_{SIM_BATCH}/{slots}",
+             lambda kw=kw: simulate_soc(np.full(SIM_BATCH, 40.0), **kw), SIM_BATCH * slots),
+        ]
+    for slots, step in PRICE_FIXTURES.items():
+        prices = price_fixture(slots, step)
+        out = plan(40.0, prices, pv, BASE_DAY, cfg, TZ)
+        cases += [
+            (f"plan/{slots}", lambda p=prices: plan(40.0, p, pv, BASE_DAY, cfg, TZ), slots),
+            (f"estimate_arbitrage/{slots}", lambda o=out: estimate_arbitrage(o, cfg), 1),
+            (f"soc_curve/{slots}", lambda o=out, st=step: soc_curve(40.0, pv, o, BASE_DAY, cfg, TZ, st), 86400 // step),
+        ]
+    return cases
+
+
+# ---------------------------- Meten ----------------------------
+
+def _time_per_call(fn, repeat: int, min_time: float) -> float:
+    """Beste tijd per aanroep (s): aantal aanroepen per ronde zo gekozen dat een ronde ≥ min_time duurt."""
+    loops = 1
+    while True:
+        t = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        elapsed = time.perf_counter() - t
+        if elapsed >= min_time or loops >= 1 << 20:
+            break
+        loops *= 2 if elapsed <= 0 else max(2, min(10, int(min_time / elapsed) + 1))
+    best = elapsed / loops
+    for _ in range(repeat - 1):
+        t = time.perf_counter()
+        for _ in range(loops):
+            fn()
+        best = min(best, (time.perf_counter() - t) / loops)
+    return best
+
+
+def _allocations(fn):
+    """(piekgeheugen, netto achtergebleven geheugen) in bytes voor één aanroep."""
+    fn()  # warm: eenmalige imports/caches niet meetellen
+    tracemalloc.start()
+    try:
+        before, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        result = fn()
+        current, peak = tracemalloc.get_traced_memory()
+        del result
+    finally:
+        tracemalloc.stop()
+    return peak - before, current - before
+
+
+def run(cases, repeat: int = 5, min_time: float = 0.05):
+    out = {}
+    for name, fn, items in cases:
+        sec = _time_per_call(fn, repeat, min_time)
+        peak, net = _allocations(fn)
+        out[name] = {
+            "us_per_call": round(sec * 1e6, 3),
+            "items_per_s": round(items / sec, 1),
+            "peak_bytes": peak,
+            "net_bytes": net,
+        }
+    return out
+
+
+def compare(results, baseline, tolerance: float):
+    """Regressies als [(naam, reden)] t.o.v. de baseline; cases zonder baseline controleert main apart."""
+    bad = []
+    for name, r in results.items():
+        b = baseline.get(name)
+        if not b:
+            continue
+        if r["us_per_call"] > b["us_per_call"] * (1.0 + tolerance):
+            bad.append((name, f"{r['us_per_call']:.1f} µs > {b['us_per_call']:.1f} µs baseline"))
+        if r["peak_bytes"] > b["peak_bytes"] * (1.0 + tolerance) + _ALLOC_SLACK_BYTES:
+            bad.append((name, f"piek {r['peak_bytes']} B > {b['peak_bytes']} B baseline"))
+    return bad
+
+
+def load_baseline(path: str) -> dict:
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    if data.get("machine") not in (None, machine_id()):
+        print(f"Let op: baseline {path} is van {data['machine']}, deze machine is {machine_id()}")
+    return data.get("results", {})
+
+
+def save_baseline(path: str, results: dict):
+    """Schrijf de baseline in zijn geheel opnieuw (geen samenvoegen met oude, mogelijk verouderde waarden)."""
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({"machine": machine_id(), "python": sys.version.split()[0], "numpy": np.__version__,
+                   "results": results}, f, indent=2)
+    print(f"Baseline opgeslagen in {path}")
+
+
+def format_table(results, baseline=None) -> str:
+    lines = [f"{'case':<32} {'µs/aanroep':>12} {'items/s':>14} {'piek KB':>10} {'netto KB':>10} {'vs base':>8}"]
+    for name, r in results.items():
+        b = (baseline or {}).get(name)
+        ratio = f"{r['us_per_call'] / b['us_per_call']:.2f}x" if b and b["us_per_call"] else "-"
+        lines.append(f"{name:<32} {r['us_per_call']:>12.1f} {r['items_per_s']:>14.0f} "
+                     f"{r['peak_bytes'] / 1024:>10.1f} {r['net_bytes'] / 1024:>10.1f} {ratio:>8}")
+    return "\n".join(lines)
+
+
+def main(argv=None) -> int:
+    ap = argparse.ArgumentParser(description="ChargeMind planner-benchmarks")
+    ap.add_argument("-k", dest="filter", default=None, help="alleen cases waarvan de naam dit bevat")
+    ap.add_argument("--repeat", type=int, default=5)
+    ap.add_argument("--min-time", type=float, default=0.05, help="minimale duur per meetronde (s)")
+    ap.add_argument("--tolerance", type=float, default=0.25, help="toegestane vertraging t.o.v. baseline")
+    ap.add_argument("--baseline", default=None, help="baselinebestand (standaard per machine in bench_baselines/)")
+    ap.add_argument("--save", action="store_true",
+                    help="meting opslaan als baseline; vervangt het hele bestand (met -k: alleen die cases)")
+    ap.add_argument("--save-if-missing", action="store_true",
+                    help="cases zonder baseline eerst vastleggen (nieuwe machine/CI), de rest vergelijken")
+    ap.add_argument("--allow-missing-baseline", action="store_true",
+                    help="cases zonder baseline niet als fout tellen (bijv. een nieuwe case vóór --save)")
+    ap.add_argument("--out", default=None, help="tabel ook naar dit bestand schrijven")
+    args = ap.parse_args(argv)
+    path = args.baseline or default_baseline_path()
+
+    all_cases = build_cases()
+    names = {name for name, _, _ in all_cases}
+    cases = [c for c in all_cases if not args.filter or args.filter in c[0]]
+    results = run(cases, args.repeat, args.min_time)
+    baseline = load_baseline(path)
+
+    table = format_table(results, baseline)
+    print(table)
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            f.write(table + "\n")
+
+    if args.save:
+        save_baseline(path, results)
+        if len(results) < len(names):
+            print(f"Let op: baseline bevat alleen de {len(results)} gemeten cases (van {len(names)})")
+        return 0
+
+    missing = [name for name in results if not baseline.get(name)]
+    if missing and args.save_if_missing:
+        # Alleen ontbrekende cases aanvullen; waarden van cases die niet meer bestaan vallen weg
+        baseline = {**{n: b for n, b in baseline.items() if n in names}, **{n: results[n] for n in missing}}
+        save_baseline(path, baseline)
+        missing = []
+    if missing:
+        print(f"Geen baseline in {path} voor: {', '.join(missing)}; maak er een met --save of --save-if-missing")
+    bad = compare(results, baseline, args.tolerance)
+    for name, why in bad:
+        print(f"REGRESSIE {name}: {why}")
+    if bad:
+        return 1
+    return 2 if missing and not args.allow_missing_baseline else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,6 +1,8 @@
 
 import json, os
 
+from utils import ORIENTATIONS, tilt_factor
+
 DEFAULTS = {
     "lat": 51.95,
     "lon": 5.23,
@@ -17,12 +19,23 @@ DEFAULTS = {
     "charge_eff": 0.95,
     "discharge_eff": 0.95,
     "timezone": "Europe/Amsterdam",
+    "planner_mode": "simple",        # 'simple' (goedkoopste/duurste blok) of 'dp' (optimalisatie hele horizon)
+    "dp_soc_step_pct": 0.5,          # SOC-rasterresolutie voor 'dp'
+    "radiation_max_age_min": 180,    # Open-Meteo cache: max. leeftijd; nieuwe modelrun forceert eerder verversen
+    "metrics_enabled": False,        # instrumentatie (latency, cache, planner-stappen); GUI toont dan een Metrics-tab
+    "profile_dir": "",               # niet leeg: elke berekening in de GUI profileren naar deze map (zie profiling.py)
     "_configured": False,
     "solis_enabled": False,
     "solis_api_id": "",
     "solis_api_secret": "",
     "solis_inverter_sn": "",
     "use_solis_soc_today": True,     # bij 'Vandaag' SOC automatisch ophalen als enabled
+    "solis_poll_interval_s": 60,     # SOC-poller: interval tussen metingen
+    "solis_soc_max_age_min": 10,     # oudere metingen niet gebruiken als actuele SOC
+    "replan_drift_pct": 5.0,         # opnieuw plannen als gemeten SOC zoveel %-punt van het plan afwijkt
+    "solis_tou_cids": {              # Device Control cid's per TOU-slot; verschillen per model/firmware
+        "charge_time": [], "charge_soc": [], "discharge_time": [], "discharge_soc": [],
+    },
     "allow_solis_control": False    # alleen aanzetten als Device Control API rechten geregeld zijn
 }
 
@@ -31,12 +44,115 @@ CONFIG_PATH = "fe_planner_gui_config.json"
 def load_or_create_config():
     if os.path.exists(CONFIG_PATH):
         with open(CONFIG_PATH,"r",encoding="utf-8") as f:
-            return json.load(f)
-    # first time -> force configuration
-    with open(CONFIG_PATH,"w",encoding="utf-8") as f:
-        json.dump(DEFAULTS, f, ensure_ascii=False, indent=2)
-    return DEFAULTS.copy()
+            cfg = json.load(f)
+    else:
+        # first time -> force configuration
+        with open(CONFIG_PATH,"w",encoding="utf-8") as f:
+            json.dump(DEFAULTS, f, ensure_ascii=False, indent=2)
+        cfg = DEFAULTS.copy()
+    try:
+        compiled(cfg)
+    except ValueError:
+        pass    # ongeldige waarden: GUI laat ze corrigeren, plannen meldt de fout
+    return cfg
 
 def save_config(cfg):
+    compiled(cfg)           # valideren vóór wegschrijven (ValueError met de veldnaam)
     with open(CONFIG_PATH,"w",encoding="utf-8") as f:
         json.dump(cfg, f, ensure_ascii=False, indent=2)
+
+# ---------------------------- Gecompileerde planner-config ----------------------------
+
+class PlannerConfig:
+    """
+    Onveranderlijke, gevalideerde planner-velden uit de config-dict, plus afgeleide constanten die
+    anders per slot opnieuw berekend worden (PR, kWh per W/m2·h, %-punt per kWh, laad/ontlaad %/h).
+    """
+    __slots__ = (
+        "timezone", "lat", "lon", "kwp", "pr_base", "orientation_choice", "tilt_deg",
+        "battery_kwh", "min_soc_reserve", "house_load_kw", "inverter_charge_kw", "inverter_discharge_kw",
+        "roundtrip_eff", "charge_eff", "discharge_eff", "planner_mode", "dp_soc_step_pct",
+        # afgeleid
+        "pr_eff", "kwh_per_wm2h", "pct_per_kwh", "house_load_pct_per_h", "charge_pct_per_h", "discharge_pct_per_h",
+    )
+
+    def __init__(self, cfg: dict):
+        def num(key, lo=None, hi=None, default=None):
+            raw = cfg.get(key, DEFAULTS.get(key) if default is None else default)
+            try:
+                v = float(raw)
+            except (TypeError, ValueError):
+                raise ValueError(f"{key}: geen getal ({raw!r})") from None
+            if (lo is not None and v < lo) or (hi is not None and v > hi):
+                raise ValueError(f"{key}: {v:g} buiten bereik [{lo if lo is not None else '-∞'}, {hi if hi is not None else '∞'}]")
+            return v
+
+        ori = cfg.get("orientation_choice", DEFAULTS["orientation_choice"])
+        if ori not in ORIENTATIONS:
+            raise ValueError(f"orientation_choice: {ori!r} is geen richting 1–{len(ORIENTATIONS)}")
+        mode = cfg.get("planner_mode", DEFAULTS["planner_mode"])
+        if mode not in ("simple", "dp"):
+            raise ValueError(f"planner_mode: {mode!r} (verwacht 'simple' of 'dp')")
+        battery_kwh = num("battery_kwh", lo=1e-6)
+        charge_kw = num("inverter_charge_kw", lo=0.0)
+        values = {
+            "timezone": str(cfg.get("timezone", DEFAULTS["timezone"])),
+            "lat": num("lat", -90.0, 90.0),
+            "lon": num("lon", -180.0, 180.0),
+            "kwp": num("kwp", lo=0.0),
+            "pr_base": num("pr_base", 0.0, 1.5),
+            "orientation_choice": ori,
+            "tilt_deg": num("tilt_deg", 0.0, 90.0),
+            "battery_kwh": battery_kwh,
+            "min_soc_reserve": num("min_soc_reserve", 0.0, 100.0),
+            "house_load_kw": num("house_load_kw", lo=0.0),
+            "inverter_charge_kw": charge_kw,
+            "inverter_discharge_kw": num("inverter_discharge_kw", lo=0.0, default=charge_kw),
+            "roundtrip_eff": num("roundtrip_eff", 0.0, 1.0),
+            "charge_eff": num("charge_eff", 1e-9, 1.0, default=1.0),
+            "discharge_eff": num("discharge_eff", 0.0, 1.0, default=1.0),
+            "planner_mode": mode,
+            "dp_soc_step_pct": num("dp_soc_step_pct", lo=1e-3),
+        }
+        pr_eff = values["pr_base"] * ORIENTATIONS[ori]["factor"] * tilt_factor(values["tilt_deg"])
+        pct_per_kwh = 100.0 / battery_kwh
+        values.update(
+            pr_eff=pr_eff,
+            kwh_per_wm2h=values["kwp"] * pr_eff / 1000.0,
+            pct_per_kwh=pct_per_kwh,
+            house_load_pct_per_h=values["house_load_kw"] * pct_per_kwh,
+            charge_pct_per_h=charge_kw * values["roundtrip_eff"] * pct_per_kwh,
+            discharge_pct_per_h=values["inverter_discharge_kw"] * values["discharge_eff"] * pct_per_kwh,
+        )
+        for key, v in values.items():
+            object.__setattr__(self, key, v)
+
+    def __setattr__(self, key, value):
+        raise AttributeError("PlannerConfig is onveranderlijk; pas de config-dict aan en compileer opnieuw")
+
+    def __repr__(self):
+        return "PlannerConfig(" + ", ".join(f"{k}={getattr(self, k)!r}" for k in _PLANNER_KEYS) + ")"
+
+
+_PLANNER_KEYS = PlannerConfig.__slots__[:PlannerConfig.__slots__.index("pr_eff")]
+_COMPILED_MAX = 8
+_compiled = {}          # inhoud van de planner-velden (tuple) -> PlannerConfig
+
+def compiled(cfg) -> PlannerConfig:
+    """
+    PlannerConfig voor `cfg` (een dict of al een PlannerConfig). Gecachet op de inhoud van de planner-velden,
+    dus kopieën van dezelfde config delen één compilatie en een ter plekke gewijzigde dict compileert opnieuw.
+    """
+    if isinstance(cfg, PlannerConfig):
+        return cfg
+    key = tuple(cfg.get(k) for k in _PLANNER_KEYS)
+    try:
+        pc = _compiled.get(key)
+    except TypeError:       # onhashbare waarde: zeker ongeldig, PlannerConfig meldt welke
+        return PlannerConfig(cfg)
+    if pc is None:
+        pc = PlannerConfig(cfg)
+        if len(_compiled) >= _COMPILED_MAX:
+            _compiled.pop(next(iter(_compiled)))
+        _compiled[key] = pc
+    return pc
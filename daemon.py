@@ -0,0 +1,283 @@
+"""
+Headless planner-daemon: plant periodiek opnieuw zonder Tk/matplotlib.
+
+    python daemon.py --interval 15 --soc 50 --out chargemind_advice.json
+    python main.py --daemon ...          # zelfde, via het gewone startpunt
+
+- 'Vandaag' wordt elke --interval minuten (op de wandklok uitgelijnd) opnieuw gepland; met SolisCloud-
+  telemetrie alleen als de gemeten SOC meer dan replan_drift_pct van het plan afwijkt (of bij een nieuwe dag);
+- vanaf --tomorrow-from (standaard 13:00) wordt elke --tomorrow-poll minuten gekeken of de prijzen
+  van morgen er zijn; zodra dat zo is volgt direct een plan voor morgen;
+- één event loop voor de hele looptijd: de httpx-pool en de caches in services blijven warm;
+- state in geheugen is begrensd: alleen het laatste plan per dag plus een deque met samenvattingen.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import signal
+import time
+from collections import deque
+from datetime import datetime, timedelta, time as dtime
+from zoneinfo import ZoneInfo
+
+from config import load_or_create_config
+import metrics
+from planner import plan_day
+from services import PricesNotPublished, get_frank_day_local, aclose_http
+from telemetry import latest_soc, needs_replan, soc_drift, start_soc_poller
+
+log = logging.getLogger("chargemind.daemon")
+
+HISTORY_LEN = 7 * 24 * 4          # ~een week aan kwartierruns
+FIRST_SAMPLE_TIMEOUT_S = 15.0     # bij de start hooguit zo lang op de eerste SOC-meting wachten
+
+
+def _iso(v):
+    return v.isoformat() if isinstance(v, datetime) else v
+
+
+def summarize_result(result: dict) -> dict:
+    """Compacte, JSON-bare samenvatting van een plan_day-resultaat (zonder grafiekreeksen)."""
+    if "note" in result:
+        return {"note": result["note"]}
+    out = {k: _iso(result.get(k)) for k in (
+        "cheap_start", "cheap_end", "cheap_price", "exp_start", "exp_end", "exp_price",
+        "add_pct", "target_soc_after_charge",
+    )}
+    if result.get("optimal"):
+        opt = result["optimal"]
+        out["dp_profit_eur"] = opt.get("profit_eur")
+        out["dp_windows"] = [{**w, "start": _iso(w["start"]), "end": _iso(w["end"])} for w in opt.get("windows", [])]
+    return out
+
+
+class DaemonState:
+    """Laatste plan per dag ('today'/'tomorrow') + begrensde geschiedenis van samenvattingen."""
+    __slots__ = ("latest", "history", "today_date", "tomorrow_date", "runs", "errors")
+
+    def __init__(self, history_len: int = HISTORY_LEN):
+        self.latest = {}
+        self.history = deque(maxlen=history_len)
+        self.today_date = None         # datum van het laatste plan voor vandaag
+        self.tomorrow_date = None      # datum waarvoor het plan voor morgen al gemaakt is
+        self.runs = 0
+        self.errors = 0
+
+    def record(self, which: str, soc: float, result: dict):
+        self.runs += 1
+        self.latest[which] = result
+        self.history.append({"at": time.time(), "which": which, "soc": soc, **summarize_result(result)})
+
+    def soc_at(self, when: datetime):
+        """SOC volgens de laatst geplande curve van vandaag op `when` (None als onbekend)."""
+        series = (self.latest.get("today") or {}).get("series") or {}
+        times, values = series.get("soc_times") or [], series.get("soc_values") or []
+        val = None
+        for t, v in zip(times, values):
+            if t > when:
+                break
+            val = v
+        return val
+
+    def end_of_day_soc(self):
+        """Gesimuleerde SOC aan het einde van het laatste slot van vandaag (startwaarde voor morgen)."""
+        values = ((self.latest.get("today") or {}).get("series") or {}).get("soc_values") or []
+        return values[-1] if values else None
+
+    def snapshot(self) -> dict:
+        return {
+            "updated_at": time.time(),
+            "runs": self.runs,
+            "errors": self.errors,
+            "today": summarize_result(self.latest["today"]) if "today" in self.latest else None,
+            "tomorrow": summarize_result(self.latest["tomorrow"]) if "tomorrow" in self.latest else None,
+        }
+
+
+class PlannerDaemon:
+    def __init__(self, cfg, interval_min: float = 15.0, fallback_soc: float = None,
+                 tomorrow_from: dtime = dtime(13, 0), tomorrow_poll_min: float = 5.0, out_path: str = None,
+                 metrics_path: str = None):
+        self.cfg = cfg
+        self.tz = ZoneInfo(cfg["timezone"])
+        self.interval_s = interval_min * 60.0
+        self.tomorrow_poll_s = tomorrow_poll_min * 60.0
+        self.tomorrow_from = tomorrow_from
+        self.fallback_soc = cfg["min_soc_reserve"] if fallback_soc is None else fallback_soc
+        self.out_path = out_path
+        self.metrics_path = metrics_path
+        self.state = DaemonState()
+        self._stop = None
+        self.poller = None
+
+    # ---------------------------- SOC ----------------------------
+
+    async def current_soc(self) -> float:
+        """SOC nu: verse meting uit de telemetrie-ring, anders de geplande curve, anders de fallback."""
+        soc = latest_soc(self.cfg)
+        if soc is None:
+            soc = self.state.soc_at(datetime.now(self.tz))
+        return self.fallback_soc if soc is None else soc
+
+    # ---------------------------- Runs ----------------------------
+
+    async def plan(self, which: str):
+        if which == "today":
+            soc = await self.current_soc()
+            result = await plan_day(self.cfg, "V", soc, None, record_planned=True)
+        else:
+            eod = self.state.end_of_day_soc()
+            soc = self.fallback_soc if eod is None else eod
+            result = await plan_day(self.cfg, "M", soc, "00:00", record_planned=True)
+        self.state.record(which, soc, result)
+        if "note" in result:
+            log.info("%s: %s", which, result["note"])
+        else:
+            log.info("%s: SOC %.1f%% | laden %s (%.3f €/kWh) tot %.1f%% | ontladen %s (%.3f €/kWh)",
+                     which, soc, _iso(result["cheap_start"]), result["cheap_price"],
+                     result["target_soc_after_charge"], _iso(result["exp_start"]), result["exp_price"])
+        self.write_snapshot()
+        return result
+
+    async def tomorrow_available(self) -> bool:
+        """False zolang Frank de prijzen voor morgen nog niet publiceert (normale wachttoestand, geen fout)."""
+        try:
+            return len(await get_frank_day_local("tomorrow", self.tz)) > 0
+        except PricesNotPublished:
+            return False
+
+    def write_snapshot(self):
+        if not self.out_path:
+            return
+        tmp = self.out_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.state.snapshot(), f, ensure_ascii=False, indent=2)
+        os.replace(tmp, self.out_path)
+
+    def should_replan_today(self, now: datetime) -> bool:
+        """
+        Zonder telemetrie: elke ronde. Met SOC-poller: alleen bij een nieuwe dag, zonder plan,
+        of als de gemeten SOC meer dan replan_drift_pct van de geplande curve afwijkt.
+        """
+        if self.poller is None or self.state.today_date != now.date():
+            return True
+        if "note" in self.state.latest.get("today", {"note": None}):
+            return True
+        if needs_replan(self.state.latest["today"], self.cfg):
+            log.info("SOC-afwijking %.1f %%-pt: opnieuw plannen", soc_drift(self.state.latest["today"]))
+            return True
+        return False
+
+    async def tick(self):
+        """Eén ronde: vandaag (zo nodig) herplannen; morgen plannen zodra de prijzen er (voor het eerst) zijn."""
+        now = datetime.now(self.tz)
+        try:
+            if self.should_replan_today(now):
+                await self.plan("today")
+                self.state.today_date = now.date()
+        except Exception as e:
+            self.state.errors += 1
+            log.exception("plan vandaag mislukt: %s", e)
+        await self.check_tomorrow(now)
+        if self.metrics_path:
+            metrics.write(self.metrics_path)
+
+    async def check_tomorrow(self, now: datetime):
+        tomorrow = (now + timedelta(days=1)).date()
+        if self.state.tomorrow_date == tomorrow or now.time() < self.tomorrow_from:
+            return False
+        try:
+            if not await self.tomorrow_available():
+                return False
+            await self.plan("tomorrow")
+            self.state.tomorrow_date = tomorrow
+            return True
+        except Exception as e:
+            self.state.errors += 1
+            log.exception("plan morgen mislukt: %s", e)
+            return False
+
+    # ---------------------------- Loop ----------------------------
+
+    def _next_tick(self, now_ts: float) -> float:
+        return (now_ts // self.interval_s + 1) * self.interval_s
+
+    async def _sleep_until(self, ts: float) -> bool:
+        """Slaap tot ts of tot stop(); True als er gestopt moet worden."""
+        try:
+            await asyncio.wait_for(self._stop.wait(), timeout=max(0.0, ts - time.time()))
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    def stop(self):
+        if self._stop is not None:
+            self._stop.set()
+
+    async def run(self, once: bool = False):
+        self._stop = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                loop.add_signal_handler(sig, self.stop)
+            except (NotImplementedError, RuntimeError):
+                pass   # bijv. Windows: KeyboardInterrupt volstaat
+
+        log.info("daemon gestart (interval %.0f min)", self.interval_s / 60.0)
+        self.poller = start_soc_poller(self.cfg)
+        if self.poller is not None:
+            # Eerste leespoging afwachten zodat het eerste plan al de echte SOC gebruikt
+            await asyncio.to_thread(self.poller.first_read.wait, FIRST_SAMPLE_TIMEOUT_S)
+        try:
+            await self.tick()
+            next_tick = self._next_tick(time.time())
+            while not once:
+                # Tussen twee herplanningen: morgen-prijzen pollen (eigen, korter interval)
+                wake = next_tick
+                now = datetime.now(self.tz)
+                if self.state.tomorrow_date != (now + timedelta(days=1)).date():
+                    wake = min(wake, time.time() + self.tomorrow_poll_s)
+                if await self._sleep_until(wake):
+                    break
+                if time.time() >= next_tick:
+                    await self.tick()
+                    next_tick = self._next_tick(time.time())
+                else:
+                    await self.check_tomorrow(datetime.now(self.tz))
+        finally:
+            if self.poller is not None:
+                self.poller.stop()
+            await aclose_http()
+            log.info("daemon gestopt na %d runs (%d fouten)", self.state.runs, self.state.errors)
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="ChargeMind headless planner-daemon")
+    ap.add_argument("--interval", type=float, default=15.0, help="herplan-interval in minuten")
+    ap.add_argument("--soc", type=float, default=None, help="fallback-SOC %% als er geen SOC-meting is")
+    ap.add_argument("--tomorrow-from", type=lambda s: dtime.fromisoformat(s), default=dtime(13, 0),
+                    help="vanaf dit tijdstip (HH:MM) pollen op prijzen van morgen")
+    ap.add_argument("--tomorrow-poll", type=float, default=5.0, help="poll-interval morgen-prijzen in minuten")
+    ap.add_argument("--out", default=None, help="laatste advies als JSON naar dit bestand schrijven")
+    ap.add_argument("--metrics-out", default=None,
+                    help="metrics na elke run naar dit bestand (.json als JSON, anders Prometheus-tekst)")
+    ap.add_argument("--metrics-port", type=int, default=None, help="metrics via HTTP op /metrics en /metrics.json")
+    ap.add_argument("--once", action="store_true", help="één ronde en stoppen")
+    ap.add_argument("--log-level", default="INFO")
+    args = ap.parse_args(argv)
+
+    logging.basicConfig(level=args.log_level.upper(), format="%(asctime)s %(levelname)s %(message)s")
+    cfg = load_or_create_config()
+    if cfg.get("metrics_enabled") or args.metrics_out or args.metrics_port:
+        metrics.enable()
+    if args.metrics_port:
+        metrics.serve(args.metrics_port)
+    daemon = PlannerDaemon(cfg, args.interval, args.soc,
+                           args.tomorrow_from, args.tomorrow_poll, args.out, args.metrics_out)
+    asyncio.run(daemon.run(once=args.once))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+import numpy as np
+
+
+def visible(x, y, x0: float, x1: float, pad: int = 1):
+    """Views van de punten binnen [x0, x1] (x oplopend), plus `pad` buren zodat lijnen tot de rand doorlopen."""
+    i0 = max(0, int(np.searchsorted(x, x0, side="left")) - pad)
+    i1 = min(len(x), int(np.searchsorted(x, x1, side="right")) + pad)
+    return x[i0:i1], y[i0:i1]
+
+
+def minmax(x, y, n_buckets: int):
+    """
+    Min/max-decimatie: per bucket het laagste en hoogste punt (in tijdsvolgorde).
+    Pieken blijven behouden — geschikt voor prijzen. Maximaal 2 × n_buckets punten, volledig gevectoriseerd.
+    """
+    x = np.asarray(x)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(x)
+    if n_buckets < 1 or n <= 2 * n_buckets:
+        return x, y
+    k = -(-n // n_buckets)                  # puntjes per bucket (laatste bucket korter)
+    rows = -(-n // k)
+    pad = rows * k - n
+    lo = np.concatenate((np.where(np.isnan(y), np.inf, y), np.full(pad, np.inf))).reshape(rows, k)
+    hi = np.concatenate((np.where(np.isnan(y), -np.inf, y), np.full(pad, -np.inf))).reshape(rows, k)
+    base = np.arange(rows) * k
+    i_min = np.minimum(base + lo.argmin(axis=1), n - 1)
+    i_max = np.minimum(base + hi.argmax(axis=1), n - 1)
+    idx = np.column_stack((np.minimum(i_min, i_max), np.maximum(i_min, i_max))).ravel()
+    return x[idx], y[idx]
+
+
+def lttb(x, y, n_out: int):
+    """
+    Largest-Triangle-Three-Buckets: n_out punten die de vorm van de curve zo goed mogelijk volgen.
+    Eerste en laatste punt blijven staan; per bucket het punt met de grootste driehoek t.o.v. het
+    vorige gekozen punt en het gemiddelde van de volgende bucket. Geschikt voor SOC-curves.
+    """
+    x = np.asarray(x)
+    y = np.asarray(y, dtype=np.float64)
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return x, y
+    xf = x.astype(np.float64)
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    # Gemiddelden van alle buckets in één keer (de 'volgende bucket' van de laatste is het eindpunt)
+    bounds = np.append(edges, n)
+    counts = np.diff(bounds)
+    avg_x = np.add.reduceat(xf, bounds[:-1]) / counts
+    avg_y = np.add.reduceat(np.nan_to_num(y), bounds[:-1]) / counts
+
+    out = np.empty(n_out, dtype=np.int64)
+    out[0], out[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        s, e = edges[i], edges[i + 1]
+        area = np.abs((xf[a] - avg_x[i + 1]) * (y[s:e] - y[a]) - (xf[a] - xf[s:e]) * (avg_y[i + 1] - y[a]))
+        a = s + int(np.argmax(np.nan_to_num(area, nan=-1.0)))
+        out[i + 1] = a
+    return x[out], y[out]
@@ -1,13 +1,24 @@
+import asyncio
+import time
 import tkinter as tk
 from tkinter import ttk, messagebox
+from datetime import datetime, timezone
 from zoneinfo import ZoneInfo
-import asyncio
 
 from config import load_or_create_config, save_config
+from downsample import visible, minmax, lttb
+import metrics
 from planner import plan_day, estimate_arbitrage
+from services import PricesNotPublished, price_store, soc_store
+from telemetry import start_soc_poller
 from utils import fmt, fmt_hhmm, fmt_date, fmt_eur, fmt_kwh, fmt_pct, ORIENTATIONS
+from worker import PlanWorker
 
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+import numpy as np
+import matplotlib.dates as mdates
+import matplotlib.patches as mpatches
+from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2Tk
+from matplotlib.collections import LineCollection, PolyCollection
 from matplotlib.figure import Figure
 
 
@@ -29,6 +40,9 @@ HELP = {
 }
 
 
+POLL_MS = 50   # interval waarmee de Tk-thread de worker-queue uitleest
+
+
 def build_advice_text(result: dict, arb: dict, tz, cfg: dict) -> str:
     """Bouw compacte adviestekst."""
     day_label = result.get("day_label", "Vandaag")
@@ -56,7 +70,8 @@ def build_advice_text(result: dict, arb: dict, tz, cfg: dict) -> str:
     L = []
     L.append(f"=== 🔋 Slim advies ({day_label}) ===")
     if day_label.lower().startswith("v"):
-        L.append(f"{fmt_date(base_dt, tz)} | Huidig SOC: {fmt_pct(soc_now)}")
+        source = " (gemeten, SolisCloud)" if result.get("soc_source") == "solis" else ""
+        L.append(f"{fmt_date(base_dt, tz)} | Huidig SOC: {fmt_pct(soc_now)}{source}")
     else:
         L.append(f"{fmt_date(base_dt, tz)} {fmt_hhmm(base_dt, tz)} | Verwachte SOC: {fmt_pct(soc_now)}")
     L.append("")
@@ -85,6 +100,17 @@ def build_advice_text(result: dict, arb: dict, tz, cfg: dict) -> str:
     else:
         L.append(f"• Ontlaad in {fmt_date(e_s, tz)} {fmt_hhmm(e_s, tz)}–{fmt_hhmm(e_e, tz)} zoveel mogelijk (limiet omvormer).")
         L.append(f"  Max. ontlaadcapaciteit dure uur: ~{fmt_pct(max_dis)} → haalbaar minimum ≈ {fmt_pct(ach_min)}.")
+    opt = result.get("optimal")
+    if opt:
+        L.append("")
+        L.append("— Optimalisatie hele horizon (DP) —")
+        for w in opt["windows"]:
+            verb = "Laad" if w["kind"] == "charge" else "Ontlaad"
+            L.append(f"• {verb} {fmt_date(w['start'], tz)} {fmt_hhmm(w['start'], tz)}–{fmt_hhmm(w['end'], tz)} "
+                     f"{w['pct']:.1f} %-pt → {fmt_pct(w['soc_end'])} (gem. € {w['avg_price']:.3f}/kWh)")
+        if not opt["windows"]:
+            L.append("• Geen winstgevende laad/ontlaadacties.")
+        L.append(f"⚖️  Verwachte marge (DP): {fmt_eur(opt['profit_eur'])}")
     L.append("")
     L.append("— Kosten & prognose (kale marktprijzen) —")
     L.append(f"PV → batterij (gratis): ~{fmt_kwh(arb['pv_stored_kwh'])}")
@@ -102,9 +128,274 @@ def build_advice_text(result: dict, arb: dict, tz, cfg: dict) -> str:
     return "\n".join(L)
 
 
+CHARGE_COLOR = "#ff6666"
+DISCHARGE_COLOR = "#66cc66"
+CAUSE_COLORS = {
+    "pv": "#2ca02c",            # groen
+    "grid_charge": "#d62728",   # rood
+    "grid_discharge": "#ff7f0e",# oranje
+    "reserve": "#9467bd",       # paars
+    "none": "#1f77b4"           # fallback
+}
+
+
+class ChartView:
+    """
+    Prijs- en SOC-grafiek met vaste artists: per berekening worden alleen de data bijgewerkt.
+    De SOC-curve is één LineCollection (kleur per segment/oorzaak), laad/ontlaadvensters één
+    PolyCollection. Blijven de aslimieten gelijk, dan wordt alleen de achtergrond hersteld en
+    worden de (animated) artists opnieuw geblit; anders volgt één volledige draw.
+    """
+
+    def __init__(self, master, tz):
+        self.tz = tz
+        self.fig = Figure(figsize=(7, 5), dpi=100)
+        self.ax_price = self.fig.add_subplot(211)
+        self.ax_soc = self.fig.add_subplot(212)
+        self.canvas = FigureCanvasTkAgg(self.fig, master=master)
+        self.canvas.get_tk_widget().pack(fill="both", expand=True)
+
+        ax_p, ax_s = self.ax_price, self.ax_soc
+        (self.price_line,) = ax_p.plot([], [], drawstyle="steps-post", animated=True)
+        self.spans = PolyCollection([], transform=ax_p.get_xaxis_transform(), alpha=0.25, animated=True)
+        ax_p.add_collection(self.spans)
+        self.soc_lines = LineCollection([], animated=True)
+        ax_s.add_collection(self.soc_lines)
+        self.reserve_line = ax_s.axhline(0.0, linestyle="--", animated=True)
+        self.price_title = ax_p.set_title("Dagprijzen (€ / kWh)", animated=True)
+        self.soc_title = ax_s.set_title("SOC-curve (simulatie)", animated=True)
+
+        for ax, ylabel in ((ax_p, "Prijs"), (ax_s, "SOC (%)")):
+            ax.set_xlabel("Tijd")
+            ax.set_ylabel(ylabel)
+            ax.xaxis_date(tz)
+            ax.xaxis.set_major_formatter(mdates.DateFormatter("%H:%M", tz=tz))
+        price_legend = ax_p.legend(handles=[
+            mpatches.Patch(color=CHARGE_COLOR, alpha=0.25, label="Laadslot"),
+            mpatches.Patch(color=DISCHARGE_COLOR, alpha=0.25, label="Ontlaadslot"),
+        ], loc="lower center")
+        soc_legend = ax_s.legend(handles=[
+            mpatches.Patch(color=CAUSE_COLORS["pv"], label="PV"),
+            mpatches.Patch(color=CAUSE_COLORS["grid_charge"], label="Net laden"),
+            mpatches.Patch(color=CAUSE_COLORS["grid_discharge"], label="Net ontladen"),
+            mpatches.Patch(color=CAUSE_COLORS["reserve"], label="Reserve"),
+        ], loc="lower center")
+        ax_s.set_ylim(0.0, 100.0)
+        # Legenda's ook animated: zo liggen ze boven de data-artists
+        price_legend.set_animated(True)
+        soc_legend.set_animated(True)
+
+        self._animated = [self.price_line, self.spans, self.price_title, price_legend,
+                          self.soc_lines, self.reserve_line, self.soc_title, soc_legend]
+        self._background = None
+        self._limits = None
+        self.canvas.mpl_connect("draw_event", self._on_draw)
+
+    def _on_draw(self, event):
+        # Na elke volledige draw: schone achtergrond bewaren en de animated artists erop tekenen
+        self._background = self.canvas.copy_from_bbox(self.fig.bbox)
+        self._draw_animated()
+
+    def _draw_animated(self):
+        for artist in self._animated:
+            (artist.axes or self.fig).draw_artist(artist)
+
+    def update(self, res: dict, cfg: dict):
+        series = res["series"]
+        t = mdates.date2num(series["times"]) if series["times"] else np.empty(0)
+        p = np.asarray(series["prices"], dtype=np.float64)
+        st = mdates.date2num(series["soc_times"]) if series["soc_times"] else np.empty(0)
+        sv = np.asarray(series["soc_values"], dtype=np.float64)
+
+        # Prijs: trap tot einde laatste blok (series bevat al het extra eindpunt)
+        self.price_line.set_data(t, p)
+        if res.get("optimal"):
+            windows = [(w["start"], w["end"], w["kind"]) for w in res["optimal"]["windows"]]
+        else:
+            windows = [(res["cheap_start"], res["cheap_end"], "charge"),
+                       (res["exp_start"], res["exp_end"], "discharge")]
+        verts = []
+        for start, end, _ in windows:
+            x0, x1 = mdates.date2num(start), mdates.date2num(end)
+            verts.append([(x0, 0.0), (x0, 1.0), (x1, 1.0), (x1, 0.0)])
+        self.spans.set_verts(verts)
+        self.spans.set_facecolor([CHARGE_COLOR if kind == "charge" else DISCHARGE_COLOR for _, _, kind in windows])
+        day = res.get("day_date", "")
+        self.price_title.set_text(f"Dagprijzen (€ / kWh) — {day}")
+
+        # SOC: één LineCollection, kleur per segment [i -> i+1] volgens oorzaak
+        if len(sv) > 1:
+            pts = np.column_stack((st, sv))
+            causes = series.get("soc_causes", [])
+            self.soc_lines.set_segments(np.stack((pts[:-1], pts[1:]), axis=1))
+            self.soc_lines.set_color([CAUSE_COLORS.get(causes[i] if i < len(causes) else "none", CAUSE_COLORS["none"])
+                                      for i in range(len(sv) - 1)])
+        else:
+            self.soc_lines.set_segments([])
+        self.reserve_line.set_ydata([cfg["min_soc_reserve"]] * 2)
+        self.soc_title.set_text(f"SOC-curve (simulatie) — {day}")
+
+        limits = self._compute_limits(t, p, st)
+        if limits != self._limits or self._background is None:
+            self._limits = limits
+            (px0, px1, py0, py1), (sx0, sx1) = limits
+            self.ax_price.set_xlim(px0, px1)
+            self.ax_price.set_ylim(py0, py1)
+            self.ax_soc.set_xlim(sx0, sx1)
+            self.fig.tight_layout()
+            self.canvas.draw()          # vult via draw_event ook de achtergrond voor blitting
+        else:
+            self.canvas.restore_region(self._background)
+            self._draw_animated()
+            self.canvas.blit(self.fig.bbox)
+
+    @staticmethod
+    def _compute_limits(t, p, st):
+        if len(t):
+            lo, hi = float(np.nanmin(p)), float(np.nanmax(p))
+            pad = max(1e-3, 0.05 * (hi - lo))
+            price = (float(t[0]), float(t[-1]), round(lo - pad, 4), round(hi + pad, 4))
+        else:
+            price = (0.0, 1.0, 0.0, 1.0)
+        soc = (float(st[0]), float(st[-1])) if len(st) > 1 else price[:2]
+        return price, soc
+
+
+_EPOCH_NUM = mdates.date2num(datetime(1970, 1, 1, tzinfo=timezone.utc))   # matplotlib-datum van epoch 0
+HISTORY_DAYS = 90
+
+
+def _history_sources(start_ts: float, end_ts: float) -> dict:
+    """Prijs- en SOC-historie uit de store (blokkerend: niet op de Tk-thread aanroepen)."""
+    return {
+        "price": price_store().history(start_ts, end_ts),
+        "planned": soc_store().history("planned", start_ts, end_ts),
+        "measured": soc_store().history("measured", start_ts, end_ts),
+    }
+
+
+class HistoryView:
+    """
+    Historie van prijzen en SOC (gepland/gemeten) uit de lokale store, met pan/zoom via de toolbar.
+    De SQLite-queries lopen op de loop van de PlanWorker (in een thread), de Tk-thread tekent zodra het
+    resultaat er is. De volledige reeksen blijven als numpy-arrays in geheugen; bij elke wijziging van het
+    zichtbare bereik wordt alleen het zichtbare deel gedownsampled tot ~de pixelbreedte van de as
+    (prijzen min/max zodat pieken zichtbaar blijven, SOC via LTTB).
+    """
+
+    def __init__(self, master, tz, worker: PlanWorker):
+        self.tz = tz
+        self.worker = worker
+        self.loaded = False
+        self.data = {}
+        self._pending = None
+        self._query = None          # lopende historie-query (concurrent Future)
+
+        bar = ttk.Frame(master)
+        bar.pack(fill="x", padx=8, pady=(8, 0))
+        tk.Label(bar, text="Periode (dagen):").pack(side="left")
+        self.days_var = tk.StringVar(value=str(HISTORY_DAYS))
+        tk.Entry(bar, textvariable=self.days_var, width=6).pack(side="left", padx=6)
+        ttk.Button(bar, text="Laden", command=self.load).pack(side="left")
+        self.info_var = tk.StringVar(value="")
+        tk.Label(bar, textvariable=self.info_var, fg="#555").pack(side="left", padx=12)
+
+        self.fig = Figure(figsize=(7, 5), dpi=100)
+        self.ax_price = self.fig.add_subplot(211)
+        self.ax_soc = self.fig.add_subplot(212, sharex=self.ax_price)
+        self.canvas = FigureCanvasTkAgg(self.fig, master=master)
+        toolbar = NavigationToolbar2Tk(self.canvas, master, pack_toolbar=False)
+        toolbar.pack(side="bottom", fill="x")
+        self.canvas.get_tk_widget().pack(fill="both", expand=True)
+
+        (price_line,) = self.ax_price.plot([], [], drawstyle="steps-post", lw=1.0)
+        (planned_line,) = self.ax_soc.plot([], [], lw=1.0, label="Gepland")
+        (measured_line,) = self.ax_soc.plot([], [], lw=1.0, color=CAUSE_COLORS["grid_discharge"], label="Gemeten")
+        # naam -> (lijn, downsampler)
+        self.lines = {"price": (price_line, minmax), "planned": (planned_line, lttb), "measured": (measured_line, lttb)}
+
+        self.ax_price.set_title("Prijshistorie (€ / kWh)")
+        self.ax_price.set_ylabel("Prijs")
+        self.ax_soc.set_title("SOC-historie")
+        self.ax_soc.set_ylabel("SOC (%)")
+        self.ax_soc.set_ylim(0.0, 100.0)
+        self.ax_soc.legend(loc="lower left")
+        for ax in (self.ax_price, self.ax_soc):
+            ax.xaxis_date(tz)
+            ax.xaxis.set_major_formatter(mdates.ConciseDateFormatter(ax.xaxis.get_major_locator(), tz=tz))
+        self.fig.tight_layout()
+        self.ax_price.callbacks.connect("xlim_changed", self._on_xlim)
+
+    def load(self):
+        try:
+            days = max(1.0, float(self.days_var.get().replace(",", ".")))
+        except ValueError:
+            days = HISTORY_DAYS
+        end_ts = time.time() + 2 * 86400                      # tot en met morgen
+        start_ts = end_ts - (days + 2) * 86400
+        if self._query is not None:
+            self._query.cancel()
+        self.loaded = True
+        self.info_var.set("Laden...")
+        self._query = self.worker.run(asyncio.to_thread(_history_sources, start_ts, end_ts))
+        self._poll_query(self._query)
+
+    def _poll_query(self, query):
+        if query is not self._query:
+            return                                            # vervangen door een nieuwere 'Laden'
+        if not query.done():
+            self.canvas.get_tk_widget().after(30, self._poll_query, query)
+            return
+        self._query = None
+        if query.cancelled():
+            return
+        if query.exception() is not None:
+            self.loaded = False
+            self.info_var.set(f"Historie laden mislukt: {query.exception()}")
+            return
+        self.show(query.result())
+
+    def show(self, sources: dict):
+        self.data = {
+            name: (np.asarray(ts, dtype=np.float64) / 86400.0 + _EPOCH_NUM, np.asarray(v, dtype=np.float64))
+            for name, (ts, v) in sources.items()
+        }
+        self.info_var.set(f"{len(self.data['price'][0])} prijsblokken, "
+                          f"{len(self.data['planned'][0]) + len(self.data['measured'][0])} SOC-punten")
+        xs = [x for x, _ in self.data.values() if len(x)]
+        if xs:
+            self.ax_price.set_xlim(min(x[0] for x in xs), max(x[-1] for x in xs))   # triggert render()
+        self.render()
+
+    def _on_xlim(self, ax):
+        # Pan/zoom vuurt veel events: bundelen tot één render per ~30 ms
+        if self._pending is None:
+            self._pending = self.canvas.get_tk_widget().after(30, self.render)
+
+    def render(self):
+        if self._pending is not None:
+            self.canvas.get_tk_widget().after_cancel(self._pending)
+            self._pending = None
+        x0, x1 = self.ax_price.get_xlim()
+        width = max(100, int(self.ax_price.bbox.width))
+        with metrics.span("stage_seconds", stage="downsample_history"):
+            for name, (line, method) in self.lines.items():
+                x, y = self.data.get(name, (np.empty(0), np.empty(0)))
+                vx, vy = visible(x, y, x0, x1)
+                line.set_data(*method(vx, vy, width))
+        self.ax_price.relim()
+        self.ax_price.autoscale_view(scalex=False)
+        self.canvas.draw_idle()
+
+
 def run_gui():
     cfg = load_or_create_config()
     tz = ZoneInfo(cfg.get("timezone", "Europe/Amsterdam"))
+    if cfg.get("metrics_enabled"):
+        metrics.enable()
+
+    worker = PlanWorker()
+    poller = start_soc_poller(cfg)   # None zonder SolisCloud; plan_day leest de meting zelf uit
 
     root = tk.Tk()
     root.title("ChargeMind 0.1")
@@ -154,8 +445,14 @@ def run_gui():
     soc_var = tk.StringVar(value="35")
     tk.Entry(frm, textvariable=soc_var, width=8).grid(row=2, column=1, sticky="w", padx=6)
 
-    # Bereken knop
-    ttk.Button(frm, text="Bereken", command=lambda: on_calc()).grid(row=0, column=4, rowspan=3, padx=12)
+    # Bereken knop (+ annuleren en voortgang tijdens een lopende berekening)
+    ttk.Button(frm, text="Bereken", command=lambda: on_calc()).grid(row=0, column=4, rowspan=2, padx=12)
+    cancel_btn = ttk.Button(frm, text="Annuleer", command=lambda: on_cancel(), state="disabled")
+    cancel_btn.grid(row=2, column=4, padx=12)
+    progress = ttk.Progressbar(frm, mode="indeterminate", length=140)
+    progress.grid(row=0, column=5, padx=6, sticky="w")
+    status_var = tk.StringVar(value="")
+    tk.Label(frm, textvariable=status_var, fg="#555").grid(row=1, column=5, rowspan=2, padx=6, sticky="nw")
 
     # Instellingen velden
     widgets = {}
@@ -208,19 +505,23 @@ def run_gui():
     r += 2
 
     def save_settings():
+        # Eerst een kopie vullen en valideren; de actieve cfg verandert alleen als alles klopt
+        new = dict(cfg)
         try:
             for k, var in widgets.items():
                 val = var.get().strip().replace(",", ".")
                 if k in ("tilt_deg",):
-                    cfg[k] = int(float(val))
+                    new[k] = int(float(val))
                 else:
-                    cfg[k] = float(val)
-            cfg["orientation_choice"] = int(cb.get().split(" - ")[0])
-            cfg["_configured"] = True
-            save_config(cfg)
-            messagebox.showinfo("OK", "Instellingen opgeslagen.")
+                    new[k] = float(val)
+            new["orientation_choice"] = int(cb.get().split(" - ")[0])
+            new["_configured"] = True
+            save_config(new)
         except Exception as e:
             messagebox.showerror("Fout", f"Onjuiste waarde: {e}")
+            return
+        cfg.update(new)
+        messagebox.showinfo("OK", "Instellingen opgeslagen.")
 
     ttk.Button(settings, text="Instellingen opslaan", command=save_settings).grid(
         row=r, column=0, columnspan=2, pady=10, padx=8, sticky="w"
@@ -232,17 +533,32 @@ def run_gui():
 
     advice_frame = ttk.Frame(nb)
     charts_frame = ttk.Frame(nb)
+    history_frame = ttk.Frame(nb)
     nb.add(advice_frame, text="Advies")
     nb.add(charts_frame, text="Grafieken")
+    nb.add(history_frame, text="Historie")
+    metrics_out = None
+    if metrics.enabled():
+        metrics_frame = ttk.Frame(nb)
+        nb.add(metrics_frame, text="Metrics")
+        metrics_out = tk.Text(metrics_frame, wrap="none", font=("Consolas", 10))
+        metrics_out.pack(fill="both", expand=True, padx=8, pady=8)
 
     out = tk.Text(advice_frame, wrap="word", font=("Consolas", 11))
     out.pack(fill="both", expand=True, padx=8, pady=8)
 
-    fig = Figure(figsize=(7, 5), dpi=100)
-    ax_price = fig.add_subplot(211)
-    ax_soc = fig.add_subplot(212)
-    canvas_plot = FigureCanvasTkAgg(fig, master=charts_frame)
-    canvas_plot.get_tk_widget().pack(fill="both", expand=True)
+    charts = ChartView(charts_frame, tz)
+    history = HistoryView(history_frame, tz, worker)
+
+    def on_tab_changed(event):
+        # Historie pas laden bij de eerste keer openen
+        if nb.select() == str(history_frame) and not history.loaded:
+            history.load()
+        elif metrics_out is not None and nb.select() == str(metrics_out.master):
+            metrics_out.delete("1.0", "end")
+            metrics_out.insert("end", metrics.prometheus_text())
+
+    nb.bind("<<NotebookTabChanged>>", on_tab_changed)
 
     def on_calc():
         if not cfg.get("_configured", False):
@@ -259,21 +575,65 @@ def run_gui():
         choice = choice_var.get()
         hhmm = time_var.get().strip()
 
-        try:
-            res = asyncio.run(plan_day(cfg, choice, soc, hhmm))
-        except Exception:
-            messagebox.showinfo(
-                "Tarieven nog niet beschikbaar",
-                "Voor de gekozen dag zijn nog geen tarieven beschikbaar.\n"
-                "Bij Frank komen tarieven voor morgen meestal rond 15:00 online."
-            )
+        # Nieuwe klik vervangt een lopende berekening; cfg als snapshot (instellingen kunnen intussen wijzigen)
+        run = plan_day(dict(cfg), choice, soc, hhmm, record_planned=True)
+        if cfg.get("profile_dir"):
+            from profiling import profiled
+            run = profiled(run, cfg["profile_dir"])
+        worker.submit(run)
+        set_busy(True)
+
+    def on_cancel():
+        worker.cancel()
+        set_busy(False, "Geannuleerd.")
+
+    poll_job = {"id": None}
+
+    def set_busy(busy: bool, msg: str = ""):
+        if busy:
+            status_var.set("Berekenen…")
+            cancel_btn.configure(state="normal")
+            progress.start(12)
+            if poll_job["id"] is None:
+                poll_job["id"] = root.after(POLL_MS, poll_worker)
+        else:
+            status_var.set(msg)
+            cancel_btn.configure(state="disabled")
+            progress.stop()
+
+    def poll_worker():
+        poll_job["id"] = None
+        item = worker.poll()
+        if item is None:
+            if worker.busy:
+                poll_job["id"] = root.after(POLL_MS, poll_worker)
+            return
+        status, value = item
+        if status == "cancelled":
+            return
+        set_busy(False)
+        if status == "error":
+            if isinstance(value, PricesNotPublished):
+                messagebox.showinfo(
+                    "Tarieven nog niet beschikbaar",
+                    "Voor de gekozen dag zijn nog geen tarieven beschikbaar.\n"
+                    "Bij Frank komen tarieven voor morgen meestal rond 15:00 online."
+                )
+            else:
+                messagebox.showerror("Fout", f"Berekening mislukt: {type(value).__name__}: {value}")
+            status_var.set("Mislukt.")
             return
+        show_result(value)
 
+    def show_result(res):
         if "note" in res:
             out.delete("1.0", "end")
             out.insert("end", res["note"])
             return
 
+        if res.get("soc_source") == "solis":
+            soc_var.set(f"{res['soc_now']:.1f}")
+
         # Tekst
         arb = estimate_arbitrage(res, cfg)
         advice_text = build_advice_text(res, arb, tz=tz, cfg=cfg)
@@ -281,71 +641,8 @@ def run_gui():
         out.insert("end", advice_text)
 
         # Grafieken
-        import matplotlib.dates as mdates
-        import matplotlib.patches as mpatches
-        from datetime import timedelta
-
-        ax_price.clear()
-        ax_soc.clear()
-
-        # Prijs: blok-uren (steps-post) + gekleurde spans voor laad/ontlaad
-        t = res["series"]["times"]
-        p = res["series"]["prices"]
-        if t and p:
-            # Maak staparrays: start van elk blok + eindpunt
-            t_step, p_step = [], []
-            for i in range(len(t)):
-                t_step.append(t[i]);           p_step.append(p[i])
-                t_end = t[i] + timedelta(hours=1)
-                t_step.append(t_end);          p_step.append(p[i])
-            ax_price.plot(t_step, p_step, drawstyle="steps-post")
-
-            date_str = res.get("day_date", t[0].date())
-            ax_price.set_title(f"Dagprijzen (€ / kWh) — {date_str}")
-            ax_price.set_xlabel("Tijd")
-            ax_price.set_ylabel("Prijs")
-            ax_price.xaxis.set_major_formatter(mdates.DateFormatter("%H:%M"))
-
-            # Spans
-            charge_patch = mpatches.Patch(color="#ff6666", alpha=0.25, label="Laadslot")
-            discharge_patch = mpatches.Patch(color="#66cc66", alpha=0.25, label="Ontlaadslot")
-            ax_price.axvspan(res["cheap_start"], res["cheap_end"], color="#ff6666", alpha=0.25)
-            ax_price.axvspan(res["exp_start"], res["exp_end"], color="#66cc66", alpha=0.25)
-            ax_price.legend(handles=[charge_patch, discharge_patch], loc="lower center")
-
-        # SOC-curve: gekleurde segmenten per oorzaak
-        st = res["series"]["soc_times"]
-        sv = res["series"]["soc_values"]
-        causes = res["series"].get("soc_causes", [])
-        color_map = {
-            "pv": "#2ca02c",            # groen
-            "grid_charge": "#d62728",   # rood
-            "grid_discharge": "#ff7f0e",# oranje
-            "reserve": "#9467bd",       # paars
-            "none": "#1f77b4"           # fallback
-        }
-        if st and sv:
-            nseg = max(0, len(sv) - 1)
-            for i in range(nseg):
-                cause = causes[i] if i < len(causes) else "none"
-                ax_soc.plot([st[i], st[i + 1]], [sv[i], sv[i + 1]], color=color_map.get(cause, "#1f77b4"))
-
-        ax_soc.set_title(f"SOC-curve (simulatie) — {res.get('day_date', '')}")
-        ax_soc.set_xlabel("Tijd")
-        ax_soc.set_ylabel("SOC (%)")
-        ax_soc.xaxis.set_major_formatter(mdates.DateFormatter("%H:%M"))
-        ax_soc.axhline(cfg["min_soc_reserve"], linestyle="--")
-
-        patches = [
-            mpatches.Patch(color=color_map["pv"], label="PV"),
-            mpatches.Patch(color=color_map["grid_charge"], label="Net laden"),
-            mpatches.Patch(color=color_map["grid_discharge"], label="Net ontladen"),
-            mpatches.Patch(color=color_map["reserve"], label="Reserve"),
-        ]
-        ax_soc.legend(handles=patches, loc="lower center")
-
-        fig.tight_layout()
-        canvas_plot.draw()
+        with metrics.span("stage_seconds", stage="render_chart"):
+            charts.update(res, cfg)
 
     # Welkomst-popup bij eerste keer (en focus direct op eerste veld)
     if not cfg.get("_configured", False):
@@ -360,4 +657,11 @@ def run_gui():
     # Zorg dat tijdveld meteen de juiste state heeft
     on_choice()
 
+    def on_close():
+        if poller is not None:
+            poller.stop(timeout=1.0)
+        worker.close()
+        root.destroy()
+
+    root.protocol("WM_DELETE_WINDOW", on_close)
     root.mainloop()
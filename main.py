@@ -1,5 +1,10 @@
-
-from gui import run_gui
+import sys
 
 if __name__ == "__main__":
-    run_gui()
+    if "--daemon" in sys.argv[1:]:
+        # Headless: geen Tk/matplotlib importeren
+        from daemon import main
+        main([a for a in sys.argv[1:] if a != "--daemon"])
+    else:
+        from gui import run_gui
+        run_gui()
@@ -0,0 +1,224 @@
+"""
+Lichte instrumentatie: tellers, latency-histogrammen en spans voor upstream-fetches, caches en planner-stappen.
+
+    with metrics.span("stage_seconds", stage="plan"):
+        ...
+    metrics.inc("cache_requests_total", cache="prices", result="hit")
+
+Standaard uit (CHARGEMIND_METRICS=1, cfg['metrics_enabled'] of enable() zet het aan). Uitgeschakeld kost
+een span één functieaanroep die een gedeeld no-op object teruggeeft; inc/observe keren direct terug.
+Export als JSON (snapshot) of Prometheus-tekst (prometheus_text), naar bestand (write) of via HTTP (serve).
+"""
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PREFIX = "chargemind_"
+LATENCY_BUCKETS_S = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_enabled = os.environ.get("CHARGEMIND_METRICS", "") not in ("", "0")
+
+
+def enable(on: bool = True) -> None:
+    global _enabled
+    _enabled = bool(on)
+
+
+def enabled() -> bool:
+    return _enabled
+
+
+class Histogram:
+    """Vaste bucket-grenzen (s); counts[i] = waarnemingen ≤ bounds[i] (niet cumulatief), laatste = +Inf."""
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds=LATENCY_BUCKETS_S):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def cumulative(self):
+        out, acc = [], 0
+        for c in self.counts:
+            acc += c
+            out.append(acc)
+        return out
+
+
+class Registry:
+    """Tellers en histogrammen per (naam, labels); labels als gesorteerde tuple van (sleutel, waarde)."""
+
+    def __init__(self):
+        self.counters = {}
+        self.histograms = {}
+        self._lock = threading.Lock()
+
+    def inc(self, name: str, n: float, labels) -> None:
+        key = (name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + n
+
+    def observe(self, name: str, value: float, labels) -> None:
+        key = (name, labels)
+        with self._lock:
+            h = self.histograms.get(key)
+            if h is None:
+                h = self.histograms[key] = Histogram()
+            h.observe(value)
+
+    def reset(self) -> None:
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            counters = [{"name": n, "labels": dict(l), "value": v} for (n, l), v in sorted(self.counters.items())]
+            histograms = [
+                {"name": n, "labels": dict(l), "count": h.count, "sum": h.sum,
+                 "buckets": dict(zip([str(b) for b in h.bounds] + ["+Inf"], h.cumulative()))}
+                for (n, l), h in sorted(self.histograms.items())
+            ]
+        return {"at": time.time(), "counters": counters, "histograms": histograms}
+
+
+_registry = Registry()
+
+
+def registry() -> Registry:
+    return _registry
+
+
+def _labels(labels: dict):
+    return tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+def inc(name: str, n: float = 1, **labels) -> None:
+    if _enabled:
+        _registry.inc(name, n, _labels(labels))
+
+
+def observe(name: str, value: float, **labels) -> None:
+    if _enabled:
+        _registry.observe(name, value, _labels(labels))
+
+
+# ---------------------------- Spans ----------------------------
+
+class _Span:
+    """Meet de duur van een with-blok; label outcome = 'ok', 'error' of 'cancelled'."""
+    __slots__ = ("name", "labels", "t0")
+
+    def __init__(self, name: str, labels: dict):
+        self.name = name
+        self.labels = labels
+        self.t0 = 0.0
+
+    def __enter__(self):
+        self.t0 = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        outcome = "ok" if exc_type is None else ("cancelled" if exc_type.__name__ == "CancelledError" else "error")
+        _registry.observe(self.name, time.perf_counter() - self.t0, _labels({**self.labels, "outcome": outcome}))
+        return False
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP = _NoopSpan()
+
+
+def span(name: str, **labels):
+    """Context manager (ook in async code) die de duur als histogram-waarneming vastlegt."""
+    return _Span(name, labels) if _enabled else _NOOP
+
+
+# ---------------------------- Export ----------------------------
+
+def snapshot() -> dict:
+    return _registry.snapshot()
+
+
+def _escape(v) -> str:
+    return str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _fmt_labels(labels: dict, **extra) -> str:
+    parts = [f'{k}="{_escape(v)}"' for k, v in {**labels, **extra}.items()]
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def prometheus_text() -> str:
+    """Prometheus exposition format (text/plain; version=0.0.4)."""
+    snap = snapshot()
+    lines, typed = [], set()
+    for c in snap["counters"]:
+        name = PREFIX + c["name"]
+        if name not in typed:
+            typed.add(name)
+            lines.append(f"# TYPE {name} counter")
+        lines.append(f"{name}{_fmt_labels(c['labels'])} {c['value']}")
+    for h in snap["histograms"]:
+        name = PREFIX + h["name"]
+        if name not in typed:
+            typed.add(name)
+            lines.append(f"# TYPE {name} histogram")
+        for le, n in h["buckets"].items():
+            lines.append(f"{name}_bucket{_fmt_labels(h['labels'], le=le)} {n}")
+        lines.append(f"{name}_sum{_fmt_labels(h['labels'])} {h['sum']:.6f}")
+        lines.append(f"{name}_count{_fmt_labels(h['labels'])} {h['count']}")
+    return "\n".join(lines) + "\n"
+
+
+def write(path: str) -> None:
+    """Snapshot naar bestand: .json als JSON, anders Prometheus-tekst (node_exporter textfile-collector)."""
+    data = json.dumps(snapshot(), indent=2) if path.endswith(".json") else prometheus_text()
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+def serve(port: int, host: str = "127.0.0.1") -> ThreadingHTTPServer:
+    """HTTP-endpoint in een achtergrondthread: /metrics (Prometheus) en /metrics.json."""
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path == "/metrics":
+                body, ctype = prometheus_text().encode(), "text/plain; version=0.0.4"
+            elif self.path == "/metrics.json":
+                body, ctype = json.dumps(snapshot()).encode(), "application/json"
+            else:
+                self.send_error(404)
+                return
+            self.send_response(200)
+            self.send_header("Content-Type", ctype)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
@@ -0,0 +1,174 @@
+# mock_solis.py
+"""
+Local stand-in for the SolisCloud API, for offline tests and load tests.
+
+    python mock_solis.py --port 13333 --inverters 200 --latency 0.05 --error-rate 0.01
+
+Every request is checked like SolisCloud does: Content-MD5 must match the body, the Date header
+must be recent, and the Authorization HMAC must match solis_client._signature for the configured
+API id/secret. Supported endpoints: inverterList, inverterDetail, atRead and control (values are
+kept in memory per inverter/cid, so control writes can be counted and read back).
+"""
+import argparse
+import json
+import random
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from solis_client import CT_JSON, _content_md5, _signature
+
+MOCK_API_ID = "mock-id"
+MOCK_API_SECRET = "mock-secret"
+
+
+class MockSolisCloud:
+    def __init__(self, api_id: str = MOCK_API_ID, api_secret: str = MOCK_API_SECRET, inverters: int = 10,
+                 latency_s: float = 0.0, error_rate: float = 0.0, max_skew_s: float = 900.0, seed: int = 0):
+        self.api_id = api_id
+        self.api_secret = api_secret
+        self.latency_s = latency_s
+        self.error_rate = error_rate
+        self.max_skew_s = max_skew_s
+        self._rng = random.Random(seed)
+        self.serials = [f"MOCK{i:05d}" for i in range(inverters)]
+        self.soc = {sn: round(self._rng.uniform(20, 95), 1) for sn in self.serials}
+        self.values = {}                    # (sn, cid) -> value
+        self.stats = {"requests": 0, "bad_signature": 0, "injected_errors": 0, "control_writes": 0, "reads": 0}
+        self._lock = threading.Lock()
+        self._server = None
+        self._thread = None
+
+    # ---------------------------- Auth ----------------------------
+
+    def verify(self, path: str, headers, body: bytes):
+        """None if the request is signed correctly, otherwise the reason."""
+        md5_b64 = headers.get("Content-MD5", "")
+        if md5_b64 != _content_md5(body):
+            return "Content-MD5 mismatch"
+        ctype = headers.get("Content-Type", "")
+        date_hdr = headers.get("Date", "")
+        try:
+            skew = abs(time.time() - parsedate_to_datetime(date_hdr).timestamp())
+        except (TypeError, ValueError):
+            return "invalid Date header"
+        if skew > self.max_skew_s:
+            return "Date header outside allowed skew"
+        auth = headers.get("Authorization", "")
+        expected = f"API {self.api_id}:{_signature(self.api_secret, 'POST', md5_b64, ctype, date_hdr, path)}"
+        if ctype != CT_JSON or auth != expected:
+            return "signature mismatch"
+        return None
+
+    # ---------------------------- Endpoints ----------------------------
+
+    def handle(self, path: str, payload: dict):
+        """(http status, json body) for an authenticated request."""
+        if path == "/v1/api/inverterList":
+            no, size = int(payload.get("pageNo", 1)), min(100, int(payload.get("pageSize", 20)))
+            page = self.serials[(no - 1) * size:no * size]
+            records = [{"sn": sn, "state": 1, "pac": 1500, "pacStr": "W", "batteryCapacitySoc": self.soc[sn]}
+                       for sn in page]
+            return 200, {"code": "0", "data": {"page": {"records": records, "total": len(self.serials)}}}
+        if path == "/v1/api/inverterDetail":
+            sn = payload.get("sn")
+            if sn not in self.soc:
+                return 200, {"code": "1", "msg": "unknown sn"}
+            return 200, {"code": "0", "data": {
+                "sn": sn, "batteryCapacitySoc": self.soc[sn], "pac": 1.5, "pacStr": "kW",
+                "batteryPower": 0.0, "batteryPowerStr": "kW", "dataTimestamp": int(time.time() * 1000),
+            }}
+        if path == "/v2/api/atRead":
+            with self._lock:
+                self.stats["reads"] += 1
+                value = self.values.get((payload.get("inverterSn"), int(payload.get("cid", -1))), "")
+            return 200, {"code": "0", "data": {"msg": value}}
+        if path == "/v2/api/control":
+            with self._lock:
+                self.stats["control_writes"] += 1
+                self.values[(payload.get("inverterSn"), int(payload.get("cid", -1)))] = str(payload.get("value"))
+            return 200, {"code": "0", "data": {}}
+        return 404, {"code": "404", "msg": f"unknown path {path}"}
+
+    def _dispatch(self, path: str, headers, body: bytes):
+        with self._lock:
+            self.stats["requests"] += 1
+            inject = self._rng.random() < self.error_rate
+        if self.latency_s:
+            time.sleep(self.latency_s)
+        reason = self.verify(path, headers, body)
+        if reason:
+            with self._lock:
+                self.stats["bad_signature"] += 1
+            return 403, {"code": "403", "msg": reason}
+        if inject:
+            with self._lock:
+                self.stats["injected_errors"] += 1
+            return 503, {"code": "503", "msg": "injected error"}
+        try:
+            payload = json.loads(body or b"{}")
+        except ValueError:
+            return 400, {"code": "400", "msg": "invalid json"}
+        return self.handle(path, payload)
+
+    # ---------------------------- Server ----------------------------
+
+    def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Serve in a background thread; returns the base URL to pass to SolisClient/FleetCollector."""
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True      # header + body as separate writes: avoid 40 ms delayed-ACK stalls
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                status, out = mock._dispatch(self.path, self.headers, body)
+                data = json.dumps(out).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", CT_JSON)
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, name="mock-solis", daemon=True)
+        self._thread.start()
+        return f"http://{host}:{self._server.server_port}"
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Local SolisCloud stand-in (HMAC-checked)")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=13333)
+    ap.add_argument("--inverters", type=int, default=10)
+    ap.add_argument("--latency", type=float, default=0.0, help="added latency per request (s)")
+    ap.add_argument("--error-rate", type=float, default=0.0, help="fraction of requests answered with 503")
+    ap.add_argument("--api-id", default=MOCK_API_ID)
+    ap.add_argument("--api-secret", default=MOCK_API_SECRET)
+    args = ap.parse_args(argv)
+
+    mock = MockSolisCloud(args.api_id, args.api_secret, args.inverters, args.latency, args.error_rate)
+    url = mock.start(args.host, args.port)
+    print(f"Mock SolisCloud on {url} (api id {args.api_id})")
+    try:
+        while True:
+            time.sleep(60)
+            print(json.dumps(mock.stats))
+    except KeyboardInterrupt:
+        mock.stop()
+
+
+if __name__ == "__main__":
+    main()
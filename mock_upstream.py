@@ -0,0 +1,317 @@
+"""
+Lokale stand-in voor de upstream-API's van de planner: Frank Energie GraphQL (marketPricesElectricity)
+en Open-Meteo (/v1/forecast en /v1/archive, hourly shortwave_radiation).
+
+    python mock_upstream.py --port 8899 --fe-latency 0.05,1.5 --error-rate 0.05 --empty-rate 0.02
+    python mock_upstream.py --plan 20 --fe-latency 0.08,0.3 --om-latency 0.15     # planner end-to-end meten
+
+Data is synthetisch (deterministisch per datum) of opgenomen uit een ChargeMind-store (--store). Per
+GraphQL-endpoint en voor Open-Meteo zijn latency, jitter, foutkans (HTTP 503) en kans op een leeg
+antwoord in te stellen. De planner gaat naar de mock via services.set_endpoints (install()) of via
+CHARGEMIND_FE_GRAPHQL / CHARGEMIND_OM_FORECAST / CHARGEMIND_OM_ARCHIVE.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import tempfile
+import threading
+import time
+from datetime import date, datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+from zoneinfo import ZoneInfo
+
+import numpy as np
+
+from store import PriceStore, RadiationStore
+
+
+class Fault:
+    """Storingsprofiel van één upstream: vaste latency + uniforme jitter (s), foutkans en kans op leeg antwoord."""
+    __slots__ = ("latency_s", "jitter_s", "error_rate", "empty_rate")
+
+    def __init__(self, latency_s: float = 0.0, jitter_s: float = 0.0, error_rate: float = 0.0, empty_rate: float = 0.0):
+        self.latency_s = latency_s
+        self.jitter_s = jitter_s
+        self.error_rate = error_rate
+        self.empty_rate = empty_rate
+
+
+# ---------------------------- Data ----------------------------
+
+def synthetic_prices(day: date, tz: ZoneInfo, step: int = 3600):
+    """Prijsblokken voor leverdag `day`: ochtend- en avondpiek, middagdal, ruis vast per datum (€/kWh)."""
+    # Via epoch-seconden: aftrekken van aware datetimes in dezelfde tz negeert de DST-wissel
+    t0 = int(datetime.combine(day, datetime.min.time(), tzinfo=tz).timestamp())
+    n = (int(datetime.combine(day + timedelta(days=1), datetime.min.time(), tzinfo=tz).timestamp()) - t0) // step
+    t = t0 + step * np.arange(n, dtype=np.int64)
+    hour = (t - t0) / 3600.0
+    rng = np.random.default_rng(day.toordinal())
+    price = (0.10 + 0.06 * np.exp(-((hour - 8.0) / 1.5) ** 2) + 0.10 * np.exp(-((hour - 19.0) / 2.0) ** 2)
+             - 0.08 * np.exp(-((hour - 13.5) / 2.0) ** 2) + rng.normal(0.0, 0.01, n))
+    return [{"start": datetime.fromtimestamp(int(a), tz), "end": datetime.fromtimestamp(int(a) + step, tz),
+             "price": round(float(p), 5)} for a, p in zip(t, price)]
+
+
+def synthetic_radiation(first: date, days: int):
+    """Uurlijkse instraling (W/m2, lokale uren) vanaf `first`: zonneboog × bewolking vast per datum."""
+    hour = np.arange(24) + 0.5
+    sun = np.clip(np.sin((hour - 5.5) / 16.0 * np.pi), 0.0, None) * 850.0
+    out = []
+    for d in range(days):
+        rng = np.random.default_rng(first.toordinal() + d)
+        out.extend(np.round(sun * rng.uniform(0.3, 1.0) * rng.uniform(0.85, 1.0, 24), 1).tolist())
+    return out
+
+
+def _utc_z(dt: datetime) -> str:
+    return dt.astimezone(timezone.utc).isoformat().replace("+00:00", "Z")
+
+
+# ---------------------------- Server ----------------------------
+
+class MockUpstream:
+    """
+    - fe_faults: één Fault per GraphQL-endpoint (paden /graphql/0, /graphql/1, ...)
+    - om_fault: Fault voor beide Open-Meteo-paden
+    - step: slotlengte van de synthetische prijzen (3600 of 900)
+    - publish_hour: prijzen voor morgen pas vanaf dit lokale uur (None = altijd)
+    - store_path: opgenomen prijzen/instraling uit een ChargeMind-store; ontbrekende dagen synthetisch
+    """
+
+    def __init__(self, fe_faults=None, om_fault: Fault = None, step: int = 3600, publish_hour: int = None,
+                 store_path: str = None, tz: str = "Europe/Amsterdam", seed: int = 0):
+        self.fe_faults = list(fe_faults or [Fault()])
+        self.om_fault = om_fault or Fault()
+        self.step = step
+        self.publish_hour = publish_hour
+        self.tz = ZoneInfo(tz)
+        self.prices = PriceStore(store_path) if store_path else None
+        self.radiation = RadiationStore(store_path) if store_path else None
+        self.stats = {"fe_requests": 0, "om_requests": 0, "errors": 0, "empty": 0}
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = None
+        self.base_url = None
+
+    # ---- storingen ----
+
+    def _inject(self, fault: Fault):
+        """Wacht de latency af; 'error', 'empty' of None."""
+        with self._lock:
+            delay = fault.latency_s + self._rng.uniform(0.0, fault.jitter_s)
+            roll = self._rng.random()
+        if delay > 0:
+            time.sleep(delay)
+        if roll < fault.error_rate:
+            outcome = "error"
+        elif roll < fault.error_rate + fault.empty_rate:
+            outcome = "empty"
+        else:
+            return None
+        with self._lock:
+            self.stats["errors" if outcome == "error" else "empty"] += 1
+        return outcome
+
+    # ---- endpoints ----
+
+    def _price_blocks(self, day: date):
+        now = datetime.now(self.tz)
+        if self.publish_hour is not None and day > now.date() and now.hour < self.publish_hour:
+            return []
+        blocks = self.prices.get_day(day, self.tz) if self.prices is not None else None
+        return blocks or synthetic_prices(day, self.tz, self.step)
+
+    def graphql(self, index: int, payload: dict):
+        with self._lock:
+            self.stats["fe_requests"] += 1
+        if index >= len(self.fe_faults):
+            return 404, {"errors": [{"message": "unknown endpoint"}]}
+        outcome = self._inject(self.fe_faults[index])
+        if outcome == "error":
+            return 503, {"errors": [{"message": "injected error"}]}
+        items = []
+        if outcome != "empty":
+            v = payload.get("variables") or {}
+            day, end = date.fromisoformat(v["startDate"]), date.fromisoformat(v["endDate"])
+            while day < end:
+                items.extend({"from": _utc_z(b["start"]), "till": _utc_z(b["end"]), "marketPrice": b["price"]}
+                             for b in self._price_blocks(day))
+                day += timedelta(days=1)
+        return 200, {"data": {"marketPricesElectricity": items}}
+
+    def _hourly(self, query: dict, first: date, days: int):
+        tz = ZoneInfo(query.get("timezone", [str(self.tz)])[0])
+        start = datetime.combine(first, datetime.min.time())
+        times = [(start + timedelta(hours=h)).isoformat(timespec="minutes") for h in range(days * 24)]
+        sw = synthetic_radiation(first, days)
+        if self.radiation is not None:
+            key = f"{float(query['latitude'][0]):.4f},{float(query['longitude'][0]):.4f},{tz}"
+            t0 = int(start.replace(tzinfo=tz).timestamp())
+            recorded = dict(zip(*self.radiation.history(key, t0, t0 + days * 86400)))
+            if recorded:
+                local = [int(datetime.fromisoformat(t).replace(tzinfo=tz).timestamp()) for t in times]
+                sw = [recorded.get(ts, w) for ts, w in zip(local, sw)]
+        return {"time": times, "shortwave_radiation": sw}
+
+    def open_meteo(self, path: str, query: dict):
+        with self._lock:
+            self.stats["om_requests"] += 1
+        outcome = self._inject(self.om_fault)
+        if outcome == "error":
+            return 503, {"error": True, "reason": "injected error"}
+        if path.endswith("/archive"):
+            first = date.fromisoformat(query["start_date"][0])
+            days = (date.fromisoformat(query["end_date"][0]) - first).days + 1
+        else:
+            tz = ZoneInfo(query.get("timezone", [str(self.tz)])[0])
+            past = int(query.get("past_days", ["0"])[0])
+            first = datetime.now(tz).date() - timedelta(days=past)
+            days = past + int(query.get("forecast_days", ["7"])[0])
+        hourly = {"time": [], "shortwave_radiation": []} if outcome == "empty" else self._hourly(query, first, days)
+        return 200, {"hourly_units": {"shortwave_radiation": "W/m²"}, "hourly": hourly}
+
+    # ---- levenscyclus ----
+
+    def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def _send(self, status: int, out: dict):
+                data = json.dumps(out).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                try:
+                    self.wfile.write(data)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass    # client heeft opgegeven (verloren hedge-race)
+
+            def do_POST(self):
+                body = self.rfile.read(int(self.headers.get("Content-Length") or 0))
+                parts = urlsplit(self.path).path.strip("/").split("/")
+                if parts[0] != "graphql":
+                    return self._send(404, {"errors": [{"message": "not found"}]})
+                try:
+                    payload = json.loads(body or b"{}")
+                    self._send(*mock.graphql(int(parts[1]) if len(parts) > 1 else 0, payload))
+                except (ValueError, KeyError) as e:
+                    self._send(400, {"errors": [{"message": str(e)}]})
+
+            def do_GET(self):
+                url = urlsplit(self.path)
+                if url.path not in ("/v1/forecast", "/v1/archive"):
+                    return self._send(404, {"error": True, "reason": "not found"})
+                try:
+                    self._send(*mock.open_meteo(url.path, parse_qs(url.query)))
+                except (ValueError, KeyError) as e:
+                    self._send(400, {"error": True, "reason": str(e)})
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer((host, port), Handler)
+        self._server.daemon_threads = True
+        threading.Thread(target=self._server.serve_forever, name="mock-upstream", daemon=True).start()
+        self.base_url = f"http://{host}:{self._server.server_port}"
+        return self.base_url
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+
+    def endpoints(self) -> dict:
+        return {
+            "fe_graphql": [f"{self.base_url}/graphql/{i}" for i in range(len(self.fe_faults))],
+            "om_forecast": f"{self.base_url}/v1/forecast",
+            "om_archive": f"{self.base_url}/v1/archive",
+        }
+
+    def install(self):
+        """Laat services (in dit proces) deze mock gebruiken."""
+        import services
+        services.set_endpoints(**self.endpoints())
+
+
+# ---------------------------- End-to-end meting ----------------------------
+
+async def bench_plan(cfg, runs: int, choice: str = "V", cold: bool = True):
+    """
+    plan_day `runs` keer tegen de geïnstalleerde upstream; retourneert de looptijden (s).
+    cold: elke run met een lege store (dus altijd over het netwerk), anders delen alle runs één store.
+    """
+    import services
+    from planner import plan_day
+
+    times, failures = [], 0
+    with tempfile.TemporaryDirectory() as tmp:
+        for i in range(runs):
+            with services.use_stores(os.path.join(tmp, f"run{i if cold else 0}.sqlite")):
+                t0 = time.perf_counter()
+                try:
+                    await plan_day(cfg, choice, 50.0, "00:00")
+                except Exception:
+                    failures += 1
+                times.append(time.perf_counter() - t0)
+        await services.aclose_http()
+    return times, failures
+
+
+def _floats(s: str):
+    return [float(x) for x in s.split(",") if x.strip()]
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Mock Frank Energie GraphQL + Open-Meteo")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8899)
+    ap.add_argument("--fe-latency", type=_floats, default=[0.05], help="latency per GraphQL-endpoint (s), kommagescheiden")
+    ap.add_argument("--om-latency", type=float, default=0.1, help="latency Open-Meteo (s)")
+    ap.add_argument("--jitter", type=float, default=0.0, help="extra uniforme latency 0..jitter (s)")
+    ap.add_argument("--error-rate", type=float, default=0.0, help="kans op HTTP 503 per verzoek")
+    ap.add_argument("--empty-rate", type=float, default=0.0, help="kans op een leeg antwoord per verzoek")
+    ap.add_argument("--step", type=int, choices=(900, 3600), default=3600, help="slotlengte synthetische prijzen (s)")
+    ap.add_argument("--publish-hour", type=int, default=None, help="prijzen voor morgen pas vanaf dit uur")
+    ap.add_argument("--store", default=None, help="opgenomen data uit deze ChargeMind-store serveren")
+    ap.add_argument("--plan", type=int, default=0, help="plan_day zo vaak draaien tegen de mock en stoppen")
+    ap.add_argument("--warm", action="store_true", help="met --plan: caches tussen runs behouden")
+    args = ap.parse_args(argv)
+
+    fault = dict(jitter_s=args.jitter, error_rate=args.error_rate, empty_rate=args.empty_rate)
+    mock = MockUpstream([Fault(lat, **fault) for lat in args.fe_latency], Fault(args.om_latency, **fault),
+                        args.step, args.publish_hour, args.store)
+    mock.start(args.host, 0 if args.plan else args.port)
+    ep = mock.endpoints()
+
+    if args.plan:
+        from config import load_or_create_config
+        mock.install()
+        times, failures = asyncio.run(bench_plan(load_or_create_config(), args.plan, cold=not args.warm))
+        ms = np.sort(np.array(times)) * 1000.0
+        print(f"plan_day × {args.plan}: p50 {np.percentile(ms, 50):.1f} ms | p95 {np.percentile(ms, 95):.1f} ms | "
+              f"max {ms[-1]:.1f} ms | mislukt {failures}")
+        print(json.dumps(mock.stats))
+        mock.stop()
+        return
+
+    print(f"export CHARGEMIND_FE_GRAPHQL={','.join(ep['fe_graphql'])}")
+    print(f"export CHARGEMIND_OM_FORECAST={ep['om_forecast']}")
+    print(f"export CHARGEMIND_OM_ARCHIVE={ep['om_archive']}")
+    try:
+        while True:
+            time.sleep(60)
+            print(json.dumps(mock.stats))
+    except KeyboardInterrupt:
+        mock.stop()
+
+
+if __name__ == "__main__":
+    main()
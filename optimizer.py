@@ -0,0 +1,147 @@
+import numpy as np
+
+from config import compiled
+
+# Kleine straf per %-punt verplaatsing (in € per €/kWh): bij gelijke waarde liever niets doen dan zinloos schuiven
+_TIE_PENALTY = 1e-9
+
+
+class DpSchedule:
+    """
+    Optimale laad/ontlaad-keuze per slot (vorm (T,), SOC-traject (T+1,)):
+    - soc: SOC op het raster aan het begin van elk slot + na het laatste slot
+    - pv_pct / charge_pct / discharge_pct: %-punten per slot door PV, netladen en ontladen
+    - cash_eur: netto opbrengst per slot (afgifte × prijs − inkoop × prijs)
+    """
+    __slots__ = ("soc", "pv_pct", "charge_pct", "discharge_pct", "cash_eur")
+
+    def __init__(self, soc, pv_pct, charge_pct, discharge_pct, cash_eur):
+        self.soc = soc
+        self.pv_pct = pv_pct
+        self.charge_pct = charge_pct
+        self.discharge_pct = discharge_pct
+        self.cash_eur = cash_eur
+
+    @property
+    def profit_eur(self) -> float:
+        return float(self.cash_eur.sum())
+
+
+def _window_argmax(f, lo, hi):
+    """
+    Per positie a de index van het maximum van f over het venster [lo[a], hi[a]] (lo <= hi).
+    Sparse table: log2(venster) verdubbelstappen over de hele vector, daarna twee lookups per venster.
+    """
+    n = len(f)
+    length = hi - lo + 1
+    levels = [np.arange(n)]
+    for k in range(1, int(length.max()).bit_length()):
+        prev = levels[-1]
+        half = 1 << (k - 1)
+        shifted = np.concatenate((prev[half:], np.repeat(prev[-1:], half)))
+        levels.append(np.where(f[shifted] > f[prev], shifted, prev))
+    table = np.stack(levels)
+    k = np.log2(length).astype(np.int64)
+    i1 = table[k, lo]
+    i2 = table[k, hi - (1 << k) + 1]
+    return np.where(f[i2] > f[i1], i2, i1)
+
+
+def optimize_soc(price, pv_pct, max_charge_pct, max_discharge_pct, soc0: float, cfg,
+                 soc_step_pct: float = 0.5, terminal_eur_per_pct: float = 0.0) -> DpSchedule:
+    """
+    Dynamisch programmeren over een gediscretiseerd SOC-raster (0–100% in stappen van soc_step_pct)
+    voor de hele horizon. Per slot: eerst PV-overschot (afgerond op het raster, tot 100%), daarna
+    laden (≤ max_charge_pct) of ontladen (≤ max_discharge_pct, niet onder min_soc_reserve).
+    Inkoop = opgeslagen / charge_eff, afgifte = SOC-daling × discharge_eff (zoals estimate_arbitrage).
+
+    Opbrengst is lineair in de SOC-verandering, dus de beste overgang per toestand is een
+    venster-maximum over (waarde − prijs × SOC); dat kost per slot O(N log K) numpy-werk
+    (N rasterpunten, K max. stappen per slot) i.p.v. een volle N × N-matrix.
+    Restlading aan het eind van de horizon is terminal_eur_per_pct waard (standaard 0).
+    """
+    price = np.asarray(price, dtype=np.float64)
+    T = len(price)
+    pv_pct = np.broadcast_to(np.asarray(pv_pct, dtype=np.float64), (T,))
+    max_ch = np.broadcast_to(np.asarray(max_charge_pct, dtype=np.float64), (T,))
+    max_dis = np.broadcast_to(np.asarray(max_discharge_pct, dtype=np.float64), (T,))
+
+    pc = compiled(cfg)
+    battery_kwh = pc.battery_kwh
+    ceff = pc.charge_eff
+    deff = pc.discharge_eff
+    reserve = pc.min_soc_reserve
+    buy_per_pct = battery_kwh / 100.0 / ceff      # kWh inkoop per %-punt laden
+    sell_per_pct = battery_kwh / 100.0 * deff     # kWh afgifte per %-punt ontladen
+
+    n = int(round(100.0 / soc_step_pct)) + 1
+    grid = np.linspace(0.0, 100.0, n)
+    idx = np.arange(n)
+    reserve_idx = min(n - 1, int(np.searchsorted(grid, reserve - 1e-9)))
+
+    pv_steps = np.rint(pv_pct / soc_step_pct).astype(np.int64)
+    k_ch = np.floor((max_ch + 1e-9) / soc_step_pct).astype(np.int64)
+    k_dis = np.floor((max_dis + 1e-9) / soc_step_pct).astype(np.int64)
+    value = terminal_eur_per_pct * grid
+    policy = np.empty((T, n), dtype=np.int32)
+
+    for t in range(T - 1, -1, -1):
+        p = price[t]
+        kc, kd = int(k_ch[t]), int(k_dis[t])
+        if np.isnan(p):
+            p, kc, kd = 0.0, 0, 0
+        # Laden (b >= a): -c·(g_b − g_a) + V(b);  ontladen (b <= a): s·(g_a − g_b) + V(b)
+        c = p * buy_per_pct + _TIE_PENALTY
+        s = p * sell_per_pct - _TIE_PENALTY
+        f_ch = value - c * grid
+        f_dis = value - s * grid
+        b_ch = _window_argmax(f_ch, idx, np.minimum(n - 1, idx + kc))
+        b_dis = _window_argmax(f_dis, np.minimum(idx, np.maximum(idx - kd, reserve_idx)), idx)
+        q_ch = f_ch[b_ch] + c * grid
+        q_dis = f_dis[b_dis] + s * grid
+        best = np.where(q_dis > q_ch, b_dis, b_ch)
+        after_pv = np.minimum(n - 1, idx + pv_steps[t])
+        policy[t] = best[after_pv]
+        value = np.maximum(q_ch, q_dis)[after_pv]
+
+    # Vooruit: pad volgen vanaf de (op het raster afgeronde) start-SOC
+    k = int(np.clip(np.rint(soc0 / soc_step_pct), 0, n - 1))
+    soc = np.empty(T + 1)
+    pv_applied = np.empty(T)
+    charge = np.zeros(T)
+    discharge = np.zeros(T)
+    cash = np.zeros(T)
+    soc[0] = grid[k]
+    for t in range(T):
+        a = min(n - 1, k + int(pv_steps[t]))
+        b = int(policy[t, k])      # policy is per SOC vóór PV (zie achterwaartse stap)
+        pv_applied[t] = grid[a] - grid[k]
+        d = grid[b] - grid[a]
+        p = 0.0 if np.isnan(price[t]) else price[t]
+        if d > 0:
+            charge[t] = d
+            cash[t] = -d * buy_per_pct * p
+        else:
+            discharge[t] = -d
+            cash[t] = -d * sell_per_pct * p
+        soc[t + 1] = grid[b]
+        k = b
+
+    return DpSchedule(soc, pv_applied, charge, discharge, cash)
+
+
+def action_windows(charge_pct, discharge_pct, eps: float = 1e-9):
+    """Aaneengesloten laad/ontlaad-slots als [(soort, i_start, i_eind_exclusief)], soort 'charge' of 'discharge'."""
+    kind = np.where(np.asarray(charge_pct) > eps, 1, np.where(np.asarray(discharge_pct) > eps, -1, 0))
+    out = []
+    i = 0
+    while i < len(kind):
+        if kind[i] == 0:
+            i += 1
+            continue
+        j = i
+        while j < len(kind) and kind[j] == kind[i]:
+            j += 1
+        out.append(("charge" if kind[i] > 0 else "discharge", i, j))
+        i = j
+    return out
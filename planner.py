@@ -1,8 +1,17 @@
+import asyncio
 from datetime import datetime, timedelta, time as dtime
 from zoneinfo import ZoneInfo
 
-from services import get_radiation_series, get_frank_day_local
-from utils import fmt, sunset_guess, ORIENTATIONS, tilt_factor
+import numpy as np
+
+import metrics
+from config import compiled
+from series import PriceSeries, RadiationSeries
+from services import get_radiation_series, get_price_day, soc_store
+from optimizer import optimize_soc, action_windows
+from simulator import simulate_soc
+from telemetry import latest_soc
+from utils import fmt, sunset_guess
 
 
 # ---------------------------- PV / Helpers ----------------------------
@@ -10,79 +19,124 @@ from utils import fmt, sunset_guess, ORIENTATIONS, tilt_factor
 def pv_kwh_from_radiation(sw_wm2: float, hours: float, cfg) -> float:
     """
     Converteer Open-Meteo shortwave_radiation (W/m2) naar PV-kWh voor jouw set-up.
-    E[kWh] = (W/m2 * h / 1000) * kWp * (PR_base * ori_factor * tilt_factor)
+    E[kWh] = (W/m2 * h / 1000) * kWp * (PR_base * ori_factor * tilt_factor); de factor staat
+    voorberekend in de gecompileerde config (kwh_per_wm2h).
     """
-    ori_factor = ORIENTATIONS[cfg["orientation_choice"]]["factor"]
-    tilt_fac = tilt_factor(cfg["tilt_deg"])
-    pr_eff = cfg["pr_base"] * ori_factor * tilt_fac
-    return (sw_wm2 * hours / 1000.0) * cfg["kwp"] * pr_eff
-
-
-def _hour_bounds(dt):
-    """Geeft (uur_begin, uur_eind) voor het uur waar dt in valt."""
-    start = dt.replace(minute=0, second=0, microsecond=0)
-    end = start + timedelta(hours=1)
-    return start, end
+    return sw_wm2 * hours * compiled(cfg).kwh_per_wm2h
 
 
-def predict_soc_gain(now_soc_pct: float, radiation_series, start_dt, end_dt, cfg) -> float:
+class PvSurplus:
+    """
+    PV-overschot per instralingsslot (%-punten SOC), één keer per plan berekend, met cumulatieve som.
+    Overschot binnen een slot is lineair in de tijd, dus deelslots volgen exact uit interpolatie
+    en elke intervalquery kost O(1).
+    """
+    __slots__ = ("t0", "step", "pct", "cum")
+
+    def __init__(self, radiation: RadiationSeries, cfg):
+        pc = compiled(cfg)
+        hours = radiation.step / 3600.0
+        pv_kwh = pv_kwh_from_radiation(radiation.sw, hours, pc)
+        surplus_kwh = np.maximum(0.0, pv_kwh - pc.house_load_kw * hours)
+        self.t0 = float(radiation.t[0]) if len(radiation) else 0.0
+        self.step = radiation.step
+        self.pct = surplus_kwh * pc.pct_per_kwh
+        self.cum = np.concatenate(([0.0], np.cumsum(self.pct)))
+
+    def _cum_at(self, ts: float) -> float:
+        n = len(self.pct)
+        pos = min(max((ts - self.t0) / self.step, 0.0), float(n))
+        i = int(pos)
+        if i >= n:
+            return float(self.cum[n])
+        return float(self.cum[i] + (pos - i) * self.pct[i])
+
+    def raw_gain(self, start_dt, end_dt) -> float:
+        """Ongecapt PV-overschot (%-punten) tussen start_dt en end_dt."""
+        s_ts, e_ts = start_dt.timestamp(), end_dt.timestamp()
+        if e_ts <= s_ts:
+            return 0.0
+        return self._cum_at(e_ts) - self._cum_at(s_ts)
+
+    def slot_gains(self, starts_ts, ends_ts):
+        """Ongecapt PV-overschot per interval [starts_ts[i], ends_ts[i]) in één gevectoriseerde stap."""
+        n = len(self.pct)
+        grid = np.arange(n + 1, dtype=np.float64)
+        pos_s = (np.asarray(starts_ts, dtype=np.float64) - self.t0) / self.step
+        pos_e = (np.asarray(ends_ts, dtype=np.float64) - self.t0) / self.step
+        return np.maximum(0.0, np.interp(pos_e, grid, self.cum) - np.interp(pos_s, grid, self.cum))
+
+    def gain(self, now_soc_pct: float, start_dt, end_dt) -> float:
+        """SOC-toename tussen start_dt en end_dt, gecapt op 100% SOC."""
+        return min(self.raw_gain(start_dt, end_dt), max(0.0, 100.0 - now_soc_pct))
+
+
+def predict_soc_gain(now_soc_pct: float, radiation, start_dt, end_dt, cfg) -> float:
     """
     SOC-toename (%-punten) door PV-overschot tussen start_dt en end_dt.
     Neemt deeluren mee: PV per uur (of fractie) minus huislast; rest naar batterij tot 100%.
+    `radiation` mag een RadiationSeries zijn of een al berekende PvSurplus (hergebruik binnen één plan).
     """
-    soc_gain_pct = 0.0
-    t_hour, t_hour_end = _hour_bounds(start_dt)
-    while t_hour < end_dt:
-        seg_start = max(start_dt, t_hour)
-        seg_end = min(end_dt, t_hour_end)
-
-        if seg_end > seg_start:
-            match = next((x for x in radiation_series if x["time"] == t_hour), None)
-            if match:
-                dur_h = (seg_end - seg_start).total_seconds() / 3600.0
-                pv_kwh = pv_kwh_from_radiation(match["sw"], dur_h, cfg)
-                house_kwh = cfg["house_load_kw"] * dur_h
-                surplus = max(0.0, pv_kwh - house_kwh)
-                gain_pct = (surplus / cfg["battery_kwh"]) * 100.0
-                cap = 100.0 - (now_soc_pct + soc_gain_pct)
-                if gain_pct > cap:
-                    gain_pct = max(0.0, cap)
-                soc_gain_pct += gain_pct
-
-        t_hour = t_hour_end
-        t_hour_end = t_hour + timedelta(hours=1)
-
-    return soc_gain_pct
+    pv = radiation if isinstance(radiation, PvSurplus) else PvSurplus(radiation, cfg)
+    return pv.gain(now_soc_pct, start_dt, end_dt)
 
 
 def max_soc_increase_in_slot(hours: float, cfg) -> float:
-    """Maximale SOC-stijging in uur-slot door laden (kWh -> %-punten)."""
-    kwh_in = cfg["inverter_charge_kw"] * cfg["roundtrip_eff"] * hours
-    return (kwh_in / cfg["battery_kwh"]) * 100.0
+    """Maximale SOC-stijging in een slot van `hours` uur door laden (kWh -> %-punten)."""
+    return compiled(cfg).charge_pct_per_h * hours
 
 
 def max_soc_decrease_in_slot(hours: float, cfg) -> float:
-    """Maximale SOC-daling in uur-slot door ontladen (kWh -> %-punten)."""
-    kwh_out = cfg.get("inverter_discharge_kw", cfg["inverter_charge_kw"]) * cfg["discharge_eff"] * hours
-    return (kwh_out / cfg["battery_kwh"]) * 100.0
+    """Maximale SOC-daling in een slot van `hours` uur door ontladen (kWh -> %-punten)."""
+    return compiled(cfg).discharge_pct_per_h * hours
 
 
 # ---------------------------- Dagplanning ----------------------------
 
-def plan(now_soc, day_prices, radiation_series, base_dt, cfg, tz: ZoneInfo):
+PLAN_WINDOW_S = 3600    # simple-planner: goedkoopste/duurste aaneengesloten uur, ook bij kwartierprijzen
+
+
+def _window_means(price, k: int):
+    """Gemiddelde prijs per venster van k opeenvolgende slots (venster i = slots i..i+k-1); NaN bij een gat."""
+    if k <= 1:
+        return price
+    return np.lib.stride_tricks.sliding_window_view(price, k).mean(axis=1)
+
+
+def plan(now_soc, day_prices: PriceSeries, radiation_series: RadiationSeries, base_dt, cfg, tz: ZoneInfo):
     """
-    Berekent laad/ontlaad-advies t.o.v. goedkoopste/duurste uur na base_dt.
+    Berekent laad/ontlaad-advies t.o.v. goedkoopste/duurste uur na base_dt (PLAN_WINDOW_S aan
+    opeenvolgende prijsslots, dus bij kwartierprijzen het goedkoopste/duurste aaneengesloten uur).
     Houdt rekening met PV-voor/na, headroom, reserve, en laad/ontlaadlimieten.
+    `radiation_series` mag ook een al berekende PvSurplus zijn.
     """
-    future_prices = [x for x in day_prices if x["end"] > base_dt]
-    if not future_prices:
+    future_prices = day_prices.slice(base_dt)
+    if not len(future_prices) or np.isnan(future_prices.price).all():
         return {"note": "Geen (toekomstige) prijsblokken meer voor de gekozen dag."}
+    cfg = compiled(cfg)
+    reserve = cfg.min_soc_reserve
+
+    k = max(1, min(len(future_prices), PLAN_WINDOW_S // future_prices.step))
+    window_price = _window_means(future_prices.price, k)
+    if np.isnan(window_price).all():
+        k, window_price = 1, future_prices.price
+    i_cheap = int(np.nanargmin(window_price))
+    i_exp = int(np.nanargmax(window_price))
+    cheap = {
+        "start": future_prices.start_dt(i_cheap),
+        "end": future_prices.end_dt(i_cheap + k - 1),
+        "price": float(window_price[i_cheap]),
+    }
+    expensive = {
+        "start": future_prices.start_dt(i_exp),
+        "end": future_prices.end_dt(i_exp + k - 1),
+        "price": float(window_price[i_exp]),
+    }
 
-    cheap = min(future_prices, key=lambda x: x["price"])
-    expensive = max(future_prices, key=lambda x: x["price"])
+    pv = radiation_series if isinstance(radiation_series, PvSurplus) else PvSurplus(radiation_series, cfg)
 
     # PV tot start laadslot
-    soc_gain_before = predict_soc_gain(now_soc, radiation_series, base_dt, cheap["start"], cfg)
+    soc_gain_before = predict_soc_gain(now_soc, pv, base_dt, cheap["start"], cfg)
     soc_at_charge_start = min(100.0, now_soc + soc_gain_before)
 
     # PV na laadslot tot zonsondergang (headroom)
@@ -90,14 +144,14 @@ def plan(now_soc, day_prices, radiation_series, base_dt, cfg, tz: ZoneInfo):
     if cheap["end"] > sunset:
         pv_after_pct = 0.0
     else:
-        pv_after_pct = predict_soc_gain(soc_at_charge_start, radiation_series, cheap["end"], sunset, cfg)
+        pv_after_pct = predict_soc_gain(soc_at_charge_start, pv, cheap["end"], sunset, cfg)
 
     headroom_pct = max(0.0, 100.0 - (soc_at_charge_start + pv_after_pct))
 
     # Reserve-eis bij dure uur
-    soc_gain_until_exp = predict_soc_gain(soc_at_charge_start, radiation_series, cheap["end"], expensive["start"], cfg)
+    soc_gain_until_exp = predict_soc_gain(soc_at_charge_start, pv, cheap["end"], expensive["start"], cfg)
     soc_pred_at_expensive = soc_at_charge_start + soc_gain_until_exp
-    deficit_pct = max(0.0, cfg["min_soc_reserve"] - soc_pred_at_expensive)
+    deficit_pct = max(0.0, reserve - soc_pred_at_expensive)
 
     # Laadslot limiet
     slot_hours = (cheap["end"] - cheap["start"]).total_seconds() / 3600.0
@@ -114,9 +168,9 @@ def plan(now_soc, day_prices, radiation_series, base_dt, cfg, tz: ZoneInfo):
     # Dure uur: kan je tot reserve ontladen binnen vermogen/duur?
     exp_hours = (expensive["end"] - expensive["start"]).total_seconds() / 3600.0
     max_discharge_pct = max_soc_decrease_in_slot(exp_hours, cfg)
-    achievable_drop_pct = min(max_discharge_pct, max(0.0, target_soc_after_charge - cfg["min_soc_reserve"]))
+    achievable_drop_pct = min(max_discharge_pct, max(0.0, target_soc_after_charge - reserve))
     achievable_min_soc = target_soc_after_charge - achievable_drop_pct
-    can_reach_reserve = achievable_min_soc <= cfg["min_soc_reserve"] + 1e-6
+    can_reach_reserve = achievable_min_soc <= reserve + 1e-6
 
     return {
         "base_dt": base_dt,
@@ -153,12 +207,17 @@ def estimate_arbitrage(plan_out: dict, cfg: dict) -> dict:
     """
     Scheid PV (gratis) en net (gekocht) in de arbitrage.
     Knijp afgifte op dure uur tot max. ontlaadvermogen x duur.
+    Gevectoriseerd als cheap_price/exp_price/add_pct arrays zijn (duur dure slot dan via 'exp_hours'):
+    alle kandidaat-paren in één pass, met onafgeronde arrays als uitkomst.
     """
-    battery_kwh = cfg["battery_kwh"]
-    cheap_price = float(plan_out["cheap_price"])
-    exp_price = float(plan_out["exp_price"])
-    ceff = max(1e-9, cfg.get("charge_eff", 1.0))
-    deff = cfg.get("discharge_eff", 1.0)
+    vector = np.ndim(plan_out["cheap_price"]) > 0
+    rnd = (lambda x, n: x) if vector else (lambda x, n: round(float(x), n))
+    pc = compiled(cfg)
+    battery_kwh = pc.battery_kwh
+    cheap_price = np.asarray(plan_out["cheap_price"], dtype=np.float64)
+    exp_price = np.asarray(plan_out["exp_price"], dtype=np.float64)
+    ceff = pc.charge_eff
+    deff = pc.discharge_eff
 
     # PV-kant (gratis)
     pv_pct = (plan_out["pv_gain_before_charge_pct"] + plan_out["pv_gain_after_charge_pct"]) / 100.0
@@ -167,7 +226,7 @@ def estimate_arbitrage(plan_out: dict, cfg: dict) -> dict:
     pv_revenue = pv_deliver_kwh * exp_price
 
     # Net-kant (bijladen in goedkoop uur)
-    net_pct = plan_out["add_pct"] / 100.0
+    net_pct = np.asarray(plan_out["add_pct"], dtype=np.float64) / 100.0
     net_stored_kwh = net_pct * battery_kwh
     grid_buy_kwh = net_stored_kwh / ceff
     net_deliver_kwh = net_stored_kwh * deff
@@ -176,141 +235,240 @@ def estimate_arbitrage(plan_out: dict, cfg: dict) -> dict:
 
     # Begrenzen op ontlaadcapaciteit in dure uur
     total_deliver = pv_deliver_kwh + net_deliver_kwh
-    exp_hours = (plan_out["exp_end"] - plan_out["exp_start"]).total_seconds() / 3600.0
-    max_kwh_out_exp = cfg.get("inverter_discharge_kw", cfg["inverter_charge_kw"]) * deff * exp_hours
+    if "exp_hours" in plan_out:
+        exp_hours = plan_out["exp_hours"]
+    else:
+        exp_hours = (plan_out["exp_end"] - plan_out["exp_start"]).total_seconds() / 3600.0
+    max_kwh_out_exp = pc.inverter_discharge_kw * deff * exp_hours
 
-    if total_deliver > max_kwh_out_exp:
-        scale = max_kwh_out_exp / total_deliver if total_deliver > 0 else 1.0
-        pv_deliver_kwh *= scale
-        net_deliver_kwh *= scale
-        pv_revenue = pv_deliver_kwh * exp_price
-        net_revenue = net_deliver_kwh * exp_price
+    over = (total_deliver > max_kwh_out_exp) & (total_deliver > 0)
+    scale = np.where(over, max_kwh_out_exp / np.where(over, total_deliver, 1.0), 1.0)
+    pv_deliver_kwh = pv_deliver_kwh * scale
+    net_deliver_kwh = net_deliver_kwh * scale
+    pv_revenue = pv_deliver_kwh * exp_price
+    net_revenue = net_deliver_kwh * exp_price
 
     total_revenue = pv_revenue + net_revenue
     total_cost = net_cost
     profit = total_revenue - total_cost
 
     return {
-        "pv_stored_kwh": round(pv_stored_kwh, 3),
-        "net_buy_kwh": round(grid_buy_kwh, 3),
-        "deliver_kwh_total": round(pv_deliver_kwh + net_deliver_kwh, 3),
-        "buy_allin_eur_kwh": round(cheap_price, 4),
-        "sell_allin_eur_kwh": round(exp_price, 4),
-        "cost_eur": round(total_cost, 2),
-        "revenue_eur": round(total_revenue, 2),
-        "profit_eur": round(profit, 2),
+        "pv_stored_kwh": rnd(pv_stored_kwh, 3),
+        "net_buy_kwh": rnd(grid_buy_kwh, 3),
+        "deliver_kwh_total": rnd(pv_deliver_kwh + net_deliver_kwh, 3),
+        "buy_allin_eur_kwh": rnd(cheap_price, 4),
+        "sell_allin_eur_kwh": rnd(exp_price, 4),
+        "cost_eur": rnd(total_cost, 2),
+        "revenue_eur": rnd(total_revenue, 2),
+        "profit_eur": rnd(profit, 2),
         "remarks": "PV (gratis) + net (gekocht) apart; gelimiteerd op ontlaadvermogen tijdens dure uur."
     }
 
 
+def score_arbitrage_pairs(day_prices: PriceSeries, cfg, base_dt=None, now_soc=None):
+    """
+    Scoor alle paren (laadslot i, later ontlaadslot j) na base_dt met één gevectoriseerde estimate_arbitrage.
+    Bijladen per paar: max. laadvermogen van slot i, tot 100% vanaf now_soc (standaard min_soc_reserve);
+    PV buiten beschouwing. Retourneert (prijsreeks na base_dt, winstmatrix € [i, j], NaN waar j <= i).
+    """
+    future = day_prices.slice(base_dt) if base_dt is not None else day_prices
+    n = len(future)
+    profit = np.full((n, n), np.nan)
+    if n < 2:
+        return future, profit
+    i, j = np.triu_indices(n, k=1)
+    slot_hours = future.step / 3600.0
+    soc = compiled(cfg).min_soc_reserve if now_soc is None else now_soc
+    add_pct = min(max_soc_increase_in_slot(slot_hours, cfg), max(0.0, 100.0 - soc))
+    arb = estimate_arbitrage({
+        "cheap_price": future.price[i],
+        "exp_price": future.price[j],
+        "add_pct": np.full(len(i), add_pct),
+        "pv_gain_before_charge_pct": 0.0,
+        "pv_gain_after_charge_pct": 0.0,
+        "exp_hours": slot_hours,
+    }, cfg)
+    profit[i, j] = arb["profit_eur"]
+    return future, profit
+
+
+def soc_curve(now_soc, pv: PvSurplus, plan_out: dict, base_dt, cfg, tz: ZoneInfo, step: int = 3600):
+    """
+    SOC-curve met oorzaken per segment: slots van `step` s (de prijsslotlengte) vanaf het slot van
+    base_dt t/m het laatste slot van die dag, plus het eindpunt van dat slot (zoals de DP-curve).
+    Retourneert (tijden, SOC-waarden, oorzaak van segment [i -> i+1]).
+    """
+    day_ts = int(base_dt.replace(hour=0, minute=0, second=0, microsecond=0).timestamp())
+    t0 = day_ts + (int(base_dt.timestamp()) - day_ts) // step * step
+    end_ts = base_dt.replace(hour=23, minute=59, second=59, microsecond=0).timestamp()
+    slot_ts = np.arange(t0, end_ts + 1, step, dtype=np.int64)
+    if not len(slot_ts):
+        return [], [], []
+    cheap_s, cheap_e = plan_out["cheap_start"].timestamp(), plan_out["cheap_end"].timestamp()
+    exp_s, exp_e = plan_out["exp_start"].timestamp(), plan_out["exp_end"].timestamp()
+    hours = step / 3600.0
+
+    sim = simulate_soc(
+        now_soc,
+        pv.slot_gains(slot_ts, slot_ts + step),
+        (slot_ts >= cheap_s) & (slot_ts < cheap_e),
+        (slot_ts >= exp_s) & (slot_ts < exp_e),
+        plan_out["target_soc_after_charge"],
+        compiled(cfg).min_soc_reserve,
+        max_soc_increase_in_slot(hours, cfg),
+        max_soc_decrease_in_slot(hours, cfg),
+    )
+    # n slotstarts plus het einde van het laatste slot: n+1 punten, n oorzaken
+    times = [datetime.fromtimestamp(x, tz) for x in slot_ts.tolist() + [int(slot_ts[-1]) + step]]
+    return times, sim.soc.tolist(), sim.cause_labels()
+
+
+# ---------------------------- Optimalisatie (DP) ----------------------------
+
+def plan_optimal(now_soc, day_prices: PriceSeries, radiation_series, base_dt, cfg, tz: ZoneInfo):
+    """
+    Optimaliseer de hele horizon na base_dt (alle prijsslots) met DP over een SOC-raster:
+    meerdere laad/ontlaadvensters, in de juiste volgorde, binnen vermogens, rendementen en reserve.
+    Rasterresolutie via cfg['dp_soc_step_pct'].
+    """
+    cfg = compiled(cfg)
+    pv = radiation_series if isinstance(radiation_series, PvSurplus) else PvSurplus(radiation_series, cfg)
+    future = day_prices.slice(base_dt)
+    if not len(future):
+        return {"note": "Geen (toekomstige) prijsblokken meer voor de gekozen dag."}
+
+    starts = np.maximum(future.t, base_dt.timestamp())
+    ends = future.ends.astype(np.float64)
+    hours = (ends - starts) / 3600.0
+    sched = optimize_soc(
+        future.price,
+        pv.slot_gains(starts, ends),
+        max_soc_increase_in_slot(hours, cfg),
+        max_soc_decrease_in_slot(hours, cfg),
+        now_soc,
+        cfg,
+        soc_step_pct=cfg.dp_soc_step_pct,
+    )
+
+    windows = []
+    for kind, i0, i1 in action_windows(sched.charge_pct, sched.discharge_pct):
+        moved = sched.charge_pct[i0:i1] if kind == "charge" else sched.discharge_pct[i0:i1]
+        windows.append({
+            "kind": kind,
+            "start": datetime.fromtimestamp(float(starts[i0]), tz),
+            "end": future.end_dt(i1 - 1),
+            "soc_end": round(float(sched.soc[i1]), 1),
+            "pct": round(float(moved.sum()), 1),
+            "avg_price": round(float(np.average(future.price[i0:i1], weights=moved)), 4),
+        })
+
+    reserve = cfg.min_soc_reserve
+    causes = []
+    for t in range(len(future)):
+        if sched.discharge_pct[t] > 0:
+            cause = "grid_discharge"
+        elif sched.charge_pct[t] > 0:
+            cause = "grid_charge"
+        elif sched.pv_pct[t] > 0:
+            cause = "pv"
+        else:
+            cause = "none"
+        if abs(sched.soc[t + 1] - reserve) < 1e-6:
+            cause = "reserve"
+        causes.append(cause)
+
+    return {
+        "windows": windows,
+        "profit_eur": round(sched.profit_eur, 2),
+        "soc_times": [datetime.fromtimestamp(float(x), tz) for x in starts] + [future.end_dt(len(future) - 1)],
+        "soc_values": sched.soc.tolist(),
+        "soc_causes": causes,
+    }
+
+
 # ---------------------------- Orchestratie voor GUI/CLI ----------------------------
 
-async def plan_day(cfg, choice, soc, hhmm):
+async def plan_day(cfg, choice, soc, hhmm, now: datetime = None, record_planned: bool = False):
     """
     - choice: 'V' (vandaag) of 'M' (morgen)
-    - soc: SOC % op het basismoment
+    - soc: SOC % op het basismoment (bij 'V' vervangen door een verse meting uit de SOC-telemetrie,
+      als use_solis_soc_today aan staat)
     - hhmm: alleen gebruikt bij 'M' (morgen) als 'HH:MM'
+    - now: plannen alsof het dit moment is (replays/profielen); standaard de wandklok
+    - record_planned: geplande SOC-curve in de historie-store bewaren (GUI en daemon; benchmarks,
+      profielen en mocks laten de store ongemoeid)
     Retourneert advies + series voor grafieken.
     """
     tz = ZoneInfo(cfg["timezone"])
-    now = datetime.now(tz)
-    radiation_series = get_radiation_series(cfg, tz)
+    now = datetime.now(tz) if now is None else now.astimezone(tz)
 
     if choice.upper() == "V":
         base_dt = now
-        day_prices = await get_frank_day_local('today', tz)
+        which = 'today'
         label = "Vandaag"
         day_date = base_dt.date()
     else:
         hh, mm = map(int, hhmm.split(":"))
         tomorrow = (now + timedelta(days=1)).date()
         base_dt = datetime.combine(tomorrow, dtime(hour=hh, minute=mm), tzinfo=tz)
-        day_prices = await get_frank_day_local('tomorrow', tz)
+        which = 'tomorrow'
         label = "Morgen"
         day_date = tomorrow
 
-    future = [x for x in day_prices if x["end"] > base_dt]
-    if not future:
+    soc_source = "invoer"
+    if which == "today" and cfg.get("use_solis_soc_today", False):
+        measured = latest_soc(cfg)
+        if measured is not None:
+            soc, soc_source = measured, "solis"
+
+    # Instraling en prijzen tegelijk ophalen: wachttijd = de traagste van de twee i.p.v. de som
+    with metrics.span("stage_seconds", stage="fetch"):
+        radiation_series, day_prices = await asyncio.gather(
+            get_radiation_series(cfg, tz), get_price_day(day_date, tz)
+        )
+
+    if not len(day_prices.slice(base_dt)):
         return {
             "note": "Geen (toekomstige) prijsblokken voor het gekozen moment. "
                     "Tarieven voor morgen zijn meestal rond 15:00 beschikbaar."
         }
 
-    result = plan(soc, day_prices, radiation_series, base_dt, cfg, tz)
+    with metrics.span("stage_seconds", stage="plan"):
+        # Instraling op het prijsraster (uur of kwartier): slotgrenzen vallen samen, PV per slot is één verschil
+        pv = PvSurplus(radiation_series.resample(day_prices.step, day_prices.t[0]), cfg)
+        result = plan(soc, day_prices, pv, base_dt, cfg, tz)
     result["day_label"] = label
+    result["soc_source"] = soc_source
 
     # --- Series voor grafieken ---
     # Dagprijzen van de gekozen dag
-    day_prices_full = [x for x in day_prices if x["start"].date() == day_date]
-    times = [x["start"] for x in day_prices_full]
-    prices = [x["price"] for x in day_prices_full]
+    day_start = datetime.combine(day_date, dtime(0), tzinfo=tz)
+    day_prices_full = day_prices.slice(day_start, day_start + timedelta(days=1))
+    times = day_prices_full.datetimes()
+    prices = day_prices_full.price.tolist()
     # Extra eindpunt toevoegen voor nette trap tot einde laatste blok
-    if day_prices_full:
-        times_plot = times + [day_prices_full[-1]["end"]]
+    if len(day_prices_full):
+        times_plot = times + [day_prices_full.end_dt(len(day_prices_full) - 1)]
         prices_plot = prices + [prices[-1]]
     else:
         times_plot, prices_plot = [], []
 
-    # SOC-curve met oorzaken per segment
-    t = base_dt.replace(minute=0, second=0, microsecond=0)
-    end = base_dt.replace(hour=23, minute=59, second=59, microsecond=0)
-    soc_curve_t = []
-    soc_curve_v = []
-    soc_causes = []  # oorzaak segment [i -> i+1]
-    soc_now = soc
-
-    ceff = cfg.get("charge_eff", 0.95)
-    deff = cfg.get("discharge_eff", 0.95)
-    ch_kw = cfg["inverter_charge_kw"]
-    dis_kw = cfg.get("inverter_discharge_kw", ch_kw)
-
-    while t <= end:
-        soc_curve_t.append(t)
-        soc_curve_v.append(max(0.0, min(100.0, soc_now)))
-
-        t_next = t + timedelta(hours=1)
-        cause = "none"
-
-        # PV bijdrage dit uur
-        rad = next((r["sw"] for r in radiation_series if r["time"] == t), 0.0)
-        pv_kwh = pv_kwh_from_radiation(rad, 1.0, cfg)
-        surplus = max(0.0, pv_kwh - cfg["house_load_kw"] * 1.0)
-        if surplus > 0:
-            pv_add = (surplus / cfg["battery_kwh"]) * 100.0
-            if soc_now + pv_add > 100.0:
-                pv_add = max(0.0, 100.0 - soc_now)
-            if pv_add > 0:
-                soc_now += pv_add
-                cause = "pv"
-
-        # Laden in goedkoopste uur richting target
-        if result["cheap_start"] <= t < result["cheap_end"] and soc_now < result["target_soc_after_charge"] - 1e-6:
-            headroom_pct = max(0.0, result["target_soc_after_charge"] - soc_now)
-            max_pct_this_hour = (ch_kw * cfg["roundtrip_eff"]) / cfg["battery_kwh"] * 100.0
-            add = min(headroom_pct, max_pct_this_hour)
-            if add > 0:
-                soc_now = min(100.0, soc_now + add)
-                cause = "grid_charge"
-
-        # Ontladen in dure uur richting reserve
-        if result["exp_start"] <= t < result["exp_end"] and soc_now > cfg["min_soc_reserve"] + 1e-6:
-            floor = cfg["min_soc_reserve"]
-            max_drop_pct = (dis_kw * deff) / cfg["battery_kwh"] * 100.0
-            drop = min(max_drop_pct, max(0.0, soc_now - floor))
-            if drop > 0:
-                soc_now = max(floor, soc_now - drop)
-                cause = "grid_discharge"
-
-        # Plateau op reserve (handig voor kleur)
-        if abs(soc_now - cfg["min_soc_reserve"]) < 1e-6:
-            cause = "reserve"
-
-        soc_causes.append(cause)
-        t = t_next
-
-    # Zorg dat causes exact per segment is (len = len(points)-1)
-    if len(soc_causes) >= len(soc_curve_v):
-        soc_causes = soc_causes[:len(soc_curve_v) - 1]
+    with metrics.span("stage_seconds", stage="soc_curve"):
+        soc_curve_t, soc_curve_v, soc_causes = soc_curve(soc, pv, result, base_dt, cfg, tz, day_prices.step)
+
+    if cfg.get("planner_mode", "simple") == "dp":
+        with metrics.span("stage_seconds", stage="plan_optimal"):
+            opt = plan_optimal(soc, day_prices, pv, base_dt, cfg, tz)
+        if "note" not in opt:
+            result["optimal"] = opt
+            soc_curve_t, soc_curve_v, soc_causes = opt["soc_times"], opt["soc_values"], opt["soc_causes"]
+
+    # Geplande curve bewaren voor de historieweergave (nieuwste plan wint per tijdstip)
+    if record_planned:
+        with metrics.span("stage_seconds", stage="record_history"):
+            await asyncio.to_thread(
+                soc_store().record, "planned", [int(x.timestamp()) for x in soc_curve_t], soc_curve_v
+            )
 
     # Voor titels in grafieken
     result["day_date"] = day_date
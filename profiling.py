@@ -0,0 +1,234 @@
+"""
+Profielmodus voor één volledige plan_day-run.
+
+    python profiling.py --choice V --soc 50 --out profiles                  # live (lege tijdelijke store)
+    python profiling.py --choice M --soc 40 --time 00:00 --record slow.json # run + invoerbundel bewaren
+    python profiling.py --bundle slow.json --out profiles                   # exact dezelfde run, zonder netwerk
+
+Per run drie bestanden in --out: <label>.pstats (cProfile, te openen met pstats/snakeviz),
+<label>.collapsed (stack-samples in collapsed-formaat voor flamegraph.pl/speedscope) en <label>.json
+(samenvatting). Wachttijd en CPU-tijd worden gescheiden: CPU = thread_time van de event-loop-thread,
+wachten = wandklok − CPU (netwerk en naar threads uitbestede store-I/O); de samples markeren dezelfde
+splitsing per stack ('[wacht op I/O]' als de loop in de selector staat).
+
+Een bundel bevat cfg, invoer, het 'nu'-moment en de ruwe upstream-antwoorden van de opgenomen run;
+bij afspelen beantwoordt een httpx.MockTransport dezelfde verzoeken, met een lege tijdelijke store.
+In de GUI zet profile_dir (config) het profileren van elke berekening aan.
+"""
+import argparse
+import asyncio
+import cProfile
+import io
+import json
+import os
+import pstats
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+import httpx
+
+import services
+from config import load_or_create_config
+
+SAMPLE_INTERVAL_S = 0.001
+WAIT_FRAME = "[wacht op I/O]"
+
+
+# ---------------------------- Sampler ----------------------------
+
+class StackSampler:
+    """Achtergrondthread die de stack van één thread elke interval_s vastlegt (collapsed: 'a;b;c' -> aantal)."""
+
+    def __init__(self, thread_id: int, interval_s: float = SAMPLE_INTERVAL_S):
+        self.thread_id = thread_id
+        self.interval_s = interval_s
+        self.stacks = Counter()
+        self.wait_samples = 0
+        self.cpu_samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stop.wait(self.interval_s):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            code = frame.f_code
+            waiting = code.co_name == "select" and code.co_filename.endswith("selectors.py")
+            names = []
+            while frame is not None:
+                c = frame.f_code
+                names.append(f"{c.co_name} ({os.path.basename(c.co_filename)}:{c.co_firstlineno})")
+                frame = frame.f_back
+            names.reverse()
+            if waiting:
+                names.append(WAIT_FRAME)
+                self.wait_samples += 1
+            else:
+                self.cpu_samples += 1
+            self.stacks[";".join(names)] += 1
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {n}\n" for stack, n in self.stacks.most_common())
+
+
+# ---------------------------- Profiel ----------------------------
+
+def _top(stats: pstats.Stats, n: int = 15):
+    rows = sorted(stats.stats.items(), key=lambda kv: kv[1][3], reverse=True)[:n]
+    return [{"function": f"{os.path.basename(f)}:{line}({name})", "calls": nc, "tottime_s": round(tt, 6),
+             "cumtime_s": round(ct, 6)} for (f, line, name), (cc, nc, tt, ct, _) in rows]
+
+
+async def profiled(coro, out_dir: str, label: str = None, interval_s: float = SAMPLE_INTERVAL_S):
+    """
+    Draai `coro` onder cProfile + stack-sampler (beide op de thread van de lopende event loop) en schrijf
+    <label>.pstats/.collapsed/.json naar out_dir. Retourneert het resultaat van `coro`.
+    """
+    label = label or datetime.now().strftime("plan-%Y%m%d-%H%M%S")
+    os.makedirs(out_dir, exist_ok=True)
+    sampler = StackSampler(threading.get_ident(), interval_s).start()
+    prof = cProfile.Profile()
+    wall0, cpu0, proc0 = time.perf_counter(), time.thread_time(), time.process_time()
+    prof.enable()
+    try:
+        return await coro
+    finally:
+        prof.disable()
+        wall, cpu, proc = time.perf_counter() - wall0, time.thread_time() - cpu0, time.process_time() - proc0
+        sampler.stop()
+        base = os.path.join(out_dir, label)
+        prof.dump_stats(base + ".pstats")
+        with open(base + ".collapsed", "w", encoding="utf-8") as f:
+            f.write(sampler.collapsed())
+        stats = pstats.Stats(prof, stream=io.StringIO())
+        summary = {
+            "label": label,
+            "wall_s": round(wall, 6),
+            "cpu_loop_s": round(cpu, 6),            # event-loop-thread
+            "cpu_process_s": round(proc, 6),        # incl. asyncio.to_thread-werk
+            "wait_s": round(max(0.0, wall - cpu), 6),
+            "samples": {"cpu": sampler.cpu_samples, "wait": sampler.wait_samples},
+            "top_cumulative": _top(stats),
+        }
+        with open(base + ".json", "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+
+
+# ---------------------------- Bundels ----------------------------
+
+def _request_key(request: httpx.Request) -> str:
+    """GraphQL: op variabelen (elk endpoint gelijk); Open-Meteo: op pad + query."""
+    if request.method == "POST":
+        return "POST " + json.dumps((json.loads(request.content or b"{}").get("variables") or {}), sort_keys=True)
+    return f"GET {request.url.path}?{request.url.query.decode()}"
+
+
+async def record(cfg, choice: str, soc: float, hhmm: str, bundle_path: str, out_dir: str = None, label: str = None):
+    """Run plan_day over het netwerk (lege tijdelijke store) en bewaar invoer + upstream-antwoorden als bundel."""
+    from planner import plan_day
+
+    tz = ZoneInfo(cfg["timezone"])
+    now = datetime.now(tz)
+    responses = {}
+
+    async def keep(response: httpx.Response):
+        await response.aread()
+        if response.status_code == 200:
+            responses[_request_key(response.request)] = response.text
+
+    client = services.http_client()
+    client.event_hooks["response"].append(keep)
+    # SOC komt uit de bundel, niet uit de telemetrie; API-sleutels horen niet in een deelbaar bestand
+    cfg = {**{k: v for k, v in cfg.items() if k not in ("solis_api_id", "solis_api_secret")},
+           "use_solis_soc_today": False}
+    try:
+        with tempfile.TemporaryDirectory() as tmp, services.use_stores(os.path.join(tmp, "record.sqlite")):
+            run = plan_day(cfg, choice, soc, hhmm, now=now)
+            result = await (profiled(run, out_dir, label) if out_dir else run)
+    finally:
+        client.event_hooks["response"].remove(keep)
+    bundle = {"cfg": cfg, "choice": choice, "soc": soc, "hhmm": hhmm, "now": now.isoformat(), "responses": responses}
+    with open(bundle_path, "w", encoding="utf-8") as f:
+        json.dump(bundle, f)
+    return result
+
+
+async def replay(bundle_path: str, out_dir: str = None, label: str = None):
+    """Speel een bundel af: zelfde cfg/invoer/'nu', upstream-antwoorden uit de bundel, lege tijdelijke store."""
+    from planner import plan_day
+
+    with open(bundle_path, "r", encoding="utf-8") as f:
+        bundle = json.load(f)
+    responses = bundle["responses"]
+
+    def handler(request: httpx.Request):
+        body = responses.get(_request_key(request))
+        if body is None:
+            return httpx.Response(404, json={"errors": [{"message": "niet in bundel"}]})
+        return httpx.Response(200, content=body.encode(), headers={"Content-Type": "application/json"})
+
+    loop = asyncio.get_running_loop()
+    saved = services._clients.get(loop)
+    services._clients[loop] = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    try:
+        with tempfile.TemporaryDirectory() as tmp, services.use_stores(os.path.join(tmp, "replay.sqlite")):
+            run = plan_day(bundle["cfg"], bundle["choice"], bundle["soc"], bundle["hhmm"],
+                           now=datetime.fromisoformat(bundle["now"]))
+            return await (profiled(run, out_dir, label) if out_dir else run)
+    finally:
+        await services._clients.pop(loop).aclose()
+        if saved is not None:
+            services._clients[loop] = saved
+
+
+def main(argv=None):
+    from planner import plan_day
+
+    ap = argparse.ArgumentParser(description="Profiel van één plan_day-run")
+    ap.add_argument("--choice", choices=("V", "M"), default="V")
+    ap.add_argument("--soc", type=float, default=50.0)
+    ap.add_argument("--time", default="00:00", help="basismoment bij 'M' (HH:MM)")
+    ap.add_argument("--out", default="profiles", help="map voor .pstats/.collapsed/.json")
+    ap.add_argument("--label", default=None)
+    ap.add_argument("--record", default=None, help="invoer + upstream-antwoorden als bundel bewaren")
+    ap.add_argument("--bundle", default=None, help="bundel afspelen i.p.v. live plannen")
+    args = ap.parse_args(argv)
+    label = args.label or datetime.now().strftime("plan-%Y%m%d-%H%M%S")
+
+    async def run():
+        try:
+            if args.bundle:
+                return await replay(args.bundle, args.out, label)
+            cfg = load_or_create_config()
+            if args.record:
+                return await record(cfg, args.choice, args.soc, args.time, args.record, args.out, label)
+            with tempfile.TemporaryDirectory() as tmp, services.use_stores(os.path.join(tmp, "profile.sqlite")):
+                return await profiled(plan_day(cfg, args.choice, args.soc, args.time), args.out, label)
+        finally:
+            await services.aclose_http()
+
+    asyncio.run(run())
+    with open(os.path.join(args.out, label + ".json"), "r", encoding="utf-8") as f:
+        s = json.load(f)
+    print(f"{s['label']}: wandklok {s['wall_s'] * 1000:.1f} ms | CPU loop {s['cpu_loop_s'] * 1000:.1f} ms | "
+          f"wachten {s['wait_s'] * 1000:.1f} ms | samples cpu/wacht {s['samples']['cpu']}/{s['samples']['wait']}")
+    for row in s["top_cumulative"][:10]:
+        print(f"  {row['cumtime_s'] * 1000:9.2f} ms  {row['calls']:6d}×  {row['function']}")
+
+
+if __name__ == "__main__":
+    main()
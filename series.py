@@ -0,0 +1,159 @@
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+import numpy as np
+
+
+def _ts(when) -> float:
+    """Epoch-seconden voor een tz-aware datetime of een getal."""
+    if isinstance(when, datetime):
+        return when.timestamp()
+    return float(when)
+
+
+class TimeSeries:
+    """
+    Regelmatige tijdreeks: slot-starttijden als epoch-seconden (int64) plus float64-waarden.
+    Slot i loopt van t[i] tot t[i] + step. Opzoeken per tijdstip is O(1) (rekenkundig),
+    slicen op tijdsbereik geeft numpy-views (zero-copy).
+    """
+    __slots__ = ("t", "v", "step", "tz")
+
+    def __init__(self, t, v, step: int, tz: ZoneInfo):
+        self.t = np.asarray(t, dtype=np.int64)
+        self.v = np.asarray(v, dtype=np.float64)
+        self.step = int(step)
+        self.tz = tz
+
+    @classmethod
+    def from_points(cls, ts, values, step: int, tz: ZoneInfo, fill: float = np.nan):
+        """Bouw een regelmatig raster uit (starttijd, waarde)-paren; ontbrekende slots krijgen `fill`."""
+        ts = np.asarray(ts, dtype=np.int64)
+        values = np.asarray(values, dtype=np.float64)
+        if len(ts) == 0:
+            return cls(ts, values, step, tz)
+        if len(ts) > 1 and np.all(np.diff(ts) == step):
+            return cls(ts, values, step, tz)
+        t0 = int(ts.min())
+        n = int((ts.max() - t0) // step) + 1
+        v = np.full(n, fill, dtype=np.float64)
+        v[(ts - t0) // step] = values
+        return cls(t0 + step * np.arange(n, dtype=np.int64), v, step, tz)
+
+    def __len__(self):
+        return len(self.t)
+
+    @property
+    def t_end(self) -> int:
+        """Eindtijd (epoch s) van het laatste slot."""
+        return int(self.t[-1]) + self.step if len(self.t) else 0
+
+    @property
+    def ends(self):
+        return self.t + self.step
+
+    def index(self, when) -> int:
+        """Index van het slot waar `when` in valt, of -1 buiten de reeks."""
+        if not len(self.t):
+            return -1
+        i = int((_ts(when) - self.t[0]) // self.step)
+        return i if 0 <= i < len(self.t) else -1
+
+    def at(self, when, default: float = np.nan) -> float:
+        i = self.index(when)
+        return float(self.v[i]) if i >= 0 else default
+
+    def index_range(self, start=None, end=None):
+        """(i0, i1) van de slots die [start, end) overlappen."""
+        n = len(self.t)
+        if not n:
+            return 0, 0
+        t0 = self.t[0]
+        i0 = 0 if start is None else int(np.clip((_ts(start) - t0) // self.step, 0, n))
+        i1 = n if end is None else int(np.clip(-((t0 - _ts(end)) // self.step), 0, n))
+        return i0, max(i0, i1)
+
+    def slice(self, start=None, end=None):
+        """Deelreeks (views, geen kopie) van de slots die [start, end) overlappen."""
+        i0, i1 = self.index_range(start, end)
+        return type(self)(self.t[i0:i1], self.v[i0:i1], self.step, self.tz)
+
+    def start_dt(self, i: int) -> datetime:
+        return datetime.fromtimestamp(int(self.t[i]), self.tz)
+
+    def end_dt(self, i: int) -> datetime:
+        return datetime.fromtimestamp(int(self.t[i]) + self.step, self.tz)
+
+    def datetimes(self):
+        return [datetime.fromtimestamp(x, self.tz) for x in self.t.tolist()]
+
+
+class PriceSeries(TimeSeries):
+    """Day-ahead prijzen (€/kWh) per marktslot."""
+    __slots__ = ()
+
+    @classmethod
+    def from_blocks(cls, blocks, tz: ZoneInfo):
+        """
+        Uit [{start, end, price}]; de slotlengte is die van het kortste blok (60 of 15 min). Langere blokken
+        (bijv. uurprijzen uit de store naast kwartierprijzen) worden over de kortere slots herhaald.
+        """
+        if not blocks:
+            return cls([], [], 3600, tz)
+        starts = np.array([int(b["start"].timestamp()) for b in blocks], dtype=np.int64)
+        ends = np.array([int(b["end"].timestamp()) for b in blocks], dtype=np.int64)
+        prices = np.array([b["price"] for b in blocks], dtype=np.float64)
+        step = int((ends - starts).min())
+        reps = (ends - starts) // step
+        if (reps > 1).any():
+            starts = np.repeat(starts, reps) + step * (np.arange(int(reps.sum())) - np.repeat(np.cumsum(reps) - reps, reps))
+            prices = np.repeat(prices, reps)
+        return cls.from_points(starts, prices, step, tz)
+
+    @property
+    def price(self):
+        return self.v
+
+    def blocks(self):
+        """Terug naar [{start, end, price}] (lokale tijd), lege slots overgeslagen."""
+        return [
+            {"start": self.start_dt(i), "end": self.end_dt(i), "price": float(self.v[i])}
+            for i in range(len(self.t)) if not np.isnan(self.v[i])
+        ]
+
+
+class RadiationSeries(TimeSeries):
+    """Open-Meteo shortwave_radiation (W/m2) per uur (of na resample per prijsslot)."""
+    __slots__ = ()
+
+    @classmethod
+    def from_hourly(cls, hourly: dict, tz: ZoneInfo):
+        """Uit de Open-Meteo 'hourly' payload (lokale tijden zonder offset); gaten tellen als 0 W/m2."""
+        ts = [int(datetime.fromisoformat(t).replace(tzinfo=tz).timestamp()) for t in hourly["time"]]
+        sw = [float(w or 0.0) for w in hourly["shortwave_radiation"]]
+        return cls.from_points(ts, sw, 3600, tz, fill=0.0)
+
+    @property
+    def sw(self):
+        return self.v
+
+    def resample(self, step: int, origin=None):
+        """
+        Zelfde instraling op een raster van `step` s, uitgelijnd op `origin` (bijv. het prijsraster).
+        Waarde per nieuw slot = tijdgewogen gemiddelde van de overlappende uurslots, dus de energie blijft gelijk;
+        bij kwartieren binnen een uur is dat gewoon de uurwaarde.
+        """
+        step = int(step)
+        if not len(self.t):
+            return type(self)([], [], step, self.tz)
+        first = int(self.t[0])
+        o = first if origin is None else int(_ts(origin))
+        if step == self.step and (first - o) % step == 0:
+            return self
+        t0 = o + ((first - o) // step) * step
+        n = -((t0 - self.t_end) // step)
+        t = t0 + step * np.arange(n, dtype=np.int64)
+        edges = first + self.step * np.arange(len(self.t) + 1, dtype=np.int64)
+        cum = np.concatenate(([0.0], np.cumsum(self.v * self.step)))
+        energy = np.interp(t + step, edges, cum) - np.interp(t, edges, cum)
+        return type(self)(t, energy / step, step, self.tz)
@@ -1,13 +1,50 @@
 
-import requests
-from datetime import datetime, timedelta
+import asyncio
+import os
+import statistics
+import threading
+import time
+import weakref
+from contextlib import contextmanager
+
+import httpx
+from datetime import date, datetime, timedelta, timezone
 from zoneinfo import ZoneInfo
 
-FE_GRAPHQL_ENDPOINTS = [
+import metrics
+from series import PriceSeries, RadiationSeries
+from store import PriceStore, RadiationStore, SocStore, covers_day
+
+# Upstream-URL's; via de omgeving (of set_endpoints) om te zetten naar bijv. mock_upstream.py
+FE_GRAPHQL_ENDPOINTS = [u.strip() for u in os.environ.get("CHARGEMIND_FE_GRAPHQL", "").split(",") if u.strip()] or [
     "https://graphql.frankenergie.nl",
     "https://frank-graphql-prod.graphcdn.app/",
     "https://frank-api.nl/graphql",
 ]
+OM_FORECAST_URL = os.environ.get("CHARGEMIND_OM_FORECAST", "https://api.open-meteo.com/v1/forecast")
+OM_ARCHIVE_URL = os.environ.get("CHARGEMIND_OM_ARCHIVE", "https://archive-api.open-meteo.com/v1/archive")
+
+HTTP_TIMEOUT_S = 20.0
+HTTP_LIMITS = httpx.Limits(max_connections=20, max_keepalive_connections=10, keepalive_expiry=60.0)
+
+_clients = weakref.WeakKeyDictionary()   # event loop -> httpx.AsyncClient
+
+def http_client() -> httpx.AsyncClient:
+    """Gedeelde AsyncClient (connection pool, keep-alive) voor de lopende event loop."""
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(
+            timeout=HTTP_TIMEOUT_S, limits=HTTP_LIMITS, headers={"User-Agent": "fe-planner/1.0"}
+        )
+        _clients[loop] = client
+    return client
+
+async def aclose_http():
+    """Sluit de pool van de lopende event loop (bijv. vóór afsluiten van een langlevende loop)."""
+    client = _clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
 
 def to_local(dt_str_or_dt, tz: ZoneInfo):
     if isinstance(dt_str_or_dt, datetime):
@@ -18,61 +55,293 @@ def to_local(dt_str_or_dt, tz: ZoneInfo):
 
 def om_url(lat, lon, tzname):
     return (
-        f"https://api.open-meteo.com/v1/forecast?latitude={lat}&longitude={lon}"
+        f"{OM_FORECAST_URL}?latitude={lat}&longitude={lon}"
         f"&hourly=shortwave_radiation&timezone={tzname}"
     )
 
-def get_radiation_series(cfg, tz: ZoneInfo):
+# Open-Meteo draait nieuwe modelruns een paar keer per dag; een run is pas na enige vertraging via de API beschikbaar.
+OM_MODEL_RUN_HOURS_UTC = (0, 3, 6, 9, 12, 15, 18, 21)
+OM_RUN_AVAILABLE_DELAY_H = 2.0
+OM_DEFAULT_MAX_AGE_MIN = 180
+
+_radiation_mem = {}          # locatie-sleutel -> (fetched_at epoch s, RadiationSeries)
+_radiation_store = None
+
+def radiation_store() -> RadiationStore:
+    global _radiation_store
+    if _radiation_store is None:
+        _radiation_store = RadiationStore()
+    return _radiation_store
+
+def location_key(cfg) -> str:
+    return f"{float(cfg['lat']):.4f},{float(cfg['lon']):.4f},{cfg['timezone']}"
+
+def latest_model_run_available(now_ts: float) -> float:
+    """Epoch-tijd van de meest recente modelrun die (naar verwachting) al via de API beschikbaar is."""
+    avail = datetime.fromtimestamp(now_ts - OM_RUN_AVAILABLE_DELAY_H * 3600.0, timezone.utc)
+    run_hour = max((h for h in OM_MODEL_RUN_HOURS_UTC if h <= avail.hour), default=None)
+    if run_hour is None:
+        run = (avail - timedelta(days=1)).replace(hour=OM_MODEL_RUN_HOURS_UTC[-1], minute=0, second=0, microsecond=0)
+    else:
+        run = avail.replace(hour=run_hour, minute=0, second=0, microsecond=0)
+    return run.timestamp() + OM_RUN_AVAILABLE_DELAY_H * 3600.0
+
+def radiation_is_fresh(fetched_at: float, now_ts: float, max_age_min: float) -> bool:
+    """Vers = jonger dan max_age_min én opgehaald nadat de laatste modelrun beschikbaar kwam."""
+    return now_ts - fetched_at < max_age_min * 60.0 and fetched_at >= latest_model_run_available(now_ts)
+
+async def _fetch_radiation_hourly(cfg) -> dict:
     url = om_url(cfg["lat"], cfg["lon"], cfg["timezone"])
-    r = requests.get(url, timeout=20)
+    with metrics.span("upstream_request_seconds", upstream="open_meteo", endpoint=OM_FORECAST_URL):
+        r = await http_client().get(url)
     r.raise_for_status()
-    j = r.json()
-    times = j["hourly"]["time"]
-    rad = j["hourly"]["shortwave_radiation"]
-    series = []
-    for t, w in zip(times, rad):
-        dt = datetime.fromisoformat(t).replace(tzinfo=tz)
-        series.append({"time": dt, "sw": float(w)})
+    hourly = r.json()["hourly"]
+    return {"time": hourly["time"], "shortwave_radiation": hourly["shortwave_radiation"]}
+
+async def get_radiation_series(cfg, tz: ZoneInfo):
+    """
+    Uurlijkse instraling uit cache (geheugen → schijf) zolang die vers is; anders opnieuw ophalen.
+    Bij een netwerkfout wordt een verouderde cache-versie teruggegeven als die er is.
+    """
+    key = location_key(cfg)
+    now_ts = time.time()
+    max_age = float(cfg.get("radiation_max_age_min", OM_DEFAULT_MAX_AGE_MIN))
+    hit = _radiation_mem.get(key)
+    if hit is None:
+        disk = await asyncio.to_thread(radiation_store().get, key)
+        if disk is not None:
+            hit = _radiation_mem[key] = (disk[0], RadiationSeries.from_hourly(disk[1], tz))
+    if hit is not None and radiation_is_fresh(hit[0], now_ts, max_age):
+        metrics.inc("cache_requests_total", cache="radiation", result="hit")
+        return hit[1]
+    try:
+        hourly = await _fetch_radiation_hourly(cfg)
+    except Exception:
+        if hit is None:
+            raise
+        metrics.inc("cache_requests_total", cache="radiation", result="stale")
+        return hit[1]
+    metrics.inc("cache_requests_total", cache="radiation", result="miss")
+    series = RadiationSeries.from_hourly(hourly, tz)
+    _radiation_mem[key] = (now_ts, series)
+    await asyncio.to_thread(_store_radiation, key, now_ts, hourly, series)
     return series
 
-def fetch_graphql_day(start_date_str: str, end_date_str: str, tz: ZoneInfo):
-    q = """
-    query MarketPrices($startDate: Date!, $endDate: Date!) {
-      marketPricesElectricity(startDate: $startDate, endDate: $endDate) {
-        from
-        till
-        marketPrice
-      }
-    }
+def _store_radiation(key: str, fetched_at: float, hourly: dict, series: RadiationSeries):
+    store = radiation_store()
+    store.put(key, fetched_at, hourly)
+    store.archive(key, series.t.tolist(), series.sw.tolist())
+
+FE_GRAPHQL_QUERY = """
+query MarketPrices($startDate: Date!, $endDate: Date!) {
+  marketPricesElectricity(startDate: $startDate, endDate: $endDate) {
+    from
+    till
+    marketPrice
+  }
+}
+"""
+
+FE_TIMEOUT_S = HTTP_TIMEOUT_S
+FE_HEDGE_DELAY_S = 1.5      # na deze wachttijd zonder antwoord wordt het volgende endpoint ook gestart
+_HEALTH_ALPHA = 0.3         # EWMA-gewicht voor nieuwe latency-metingen
+_HEALTH_MAX_AGE_S = 1800.0  # oudere gezondheid vervalt: het endpoint krijgt weer de neutrale score
+
+_endpoint_health = {}       # url -> (EWMA latency s, monotonic tijd laatste meting); fouten tellen als FE_TIMEOUT_S
+_health_lock = threading.Lock()
+
+class PricesNotPublished(RuntimeError):
+    """Frank geeft (nog) geen prijzen voor de gevraagde dag; voor morgen normaal tot ~15:00."""
+
+def set_endpoints(fe_graphql=None, om_forecast: str = None, om_archive: str = None):
+    """
+    Upstream-URL's omzetten (None = ongewijzigd). Wist de endpoint-gezondheid en de instralingscache
+    in geheugen, zodat metingen en data van de vorige upstream niet meetellen.
+    """
+    global OM_FORECAST_URL, OM_ARCHIVE_URL
+    if fe_graphql is not None:
+        FE_GRAPHQL_ENDPOINTS[:] = list(fe_graphql)
+    if om_forecast is not None:
+        OM_FORECAST_URL = om_forecast
+    if om_archive is not None:
+        OM_ARCHIVE_URL = om_archive
+    with _health_lock:
+        _endpoint_health.clear()
+    _radiation_mem.clear()
+
+def _record_endpoint(url: str, latency_s: float, ok: bool, outcome: str = None):
+    metrics.observe("upstream_request_seconds", latency_s, upstream="frank", endpoint=url,
+                    outcome=outcome or ("ok" if ok else "error"))
+    sample = latency_s if ok else FE_TIMEOUT_S
+    now = time.monotonic()
+    with _health_lock:
+        prev = _endpoint_health.get(url)
+        if prev is not None and now - prev[1] >= _HEALTH_MAX_AGE_S:
+            prev = None
+        if outcome == "cancelled" and (prev is None or prev[0] >= sample):
+            # Verloren race: de latency is alleen een ondergrens; telt pas als die boven de schatting ligt
+            return
+        _endpoint_health[url] = (sample if prev is None else prev[0] + _HEALTH_ALPHA * (sample - prev[0]), now)
+
+def endpoint_order():
     """
-    payload = {"query": q, "variables": {"startDate": start_date_str, "endDate": end_date_str}}
-    headers = {"Content-Type": "application/json", "User-Agent": "fe-planner/1.0"}
+    Endpoints op volgorde van gezondheid (EWMA-latency). Ongemeten of verlopen endpoints krijgen een neutrale
+    score (mediaan van de gemeten endpoints, anders FE_HEDGE_DELAY_S), zodat een eerder traag endpoint
+    na _HEALTH_MAX_AGE_S weer een kans krijgt; bij gelijke score geldt de lijstvolgorde.
+    """
+    now = time.monotonic()
+    with _health_lock:
+        health = {u: ewma for u, (ewma, ts) in _endpoint_health.items() if now - ts < _HEALTH_MAX_AGE_S}
+    prior = statistics.median(health.values()) if health else FE_HEDGE_DELAY_S
+    return sorted(FE_GRAPHQL_ENDPOINTS, key=lambda u: health.get(u, prior))
+
+async def _query_endpoint(url: str, payload: dict, tz: ZoneInfo):
+    t0 = time.monotonic()
+    try:
+        r = await http_client().post(url, json=payload, timeout=FE_TIMEOUT_S)
+        r.raise_for_status()
+        j = r.json()
+        if j.get("errors"):
+            raise RuntimeError(f"GraphQL error @ {url}: {j['errors']}")
+        data = (j.get("data") or {}).get("marketPricesElectricity") or []
+        out = []
+        for item in data:
+            start = to_local(item["from"], tz)
+            end = to_local(item["till"], tz)
+            out.append({"start": start, "end": end, "price": float(item["marketPrice"])})
+        if not out:
+            raise PricesNotPublished(f"Lege data @ {url}")
+    except PricesNotPublished:
+        # Geldig (leeg) antwoord: het endpoint zelf is gezond
+        _record_endpoint(url, time.monotonic() - t0, True, "empty")
+        raise
+    except asyncio.CancelledError:
+        # Verloren race: de echte latency is onbekend, alleen een ondergrens ('≥ verstreken tijd')
+        _record_endpoint(url, time.monotonic() - t0, True, "cancelled")
+        raise
+    except Exception:
+        _record_endpoint(url, time.monotonic() - t0, False)
+        raise
+    _record_endpoint(url, time.monotonic() - t0, True)
+    return out
+
+async def fetch_graphql_day(start_date_str: str, end_date_str: str, tz: ZoneInfo):
+    """
+    Race de GraphQL-endpoints 'hedged': start het gezondste endpoint, en elke FE_HEDGE_DELAY_S zonder
+    antwoord (of direct na een fout) het volgende. Eerste geldige, niet-lege antwoord wint; de rest wordt afgebroken.
+    Geven alle endpoints een leeg antwoord, dan volgt PricesNotPublished (nog niet gepubliceerd, geen storing).
+    """
+    payload = {"query": FE_GRAPHQL_QUERY, "variables": {"startDate": start_date_str, "endDate": end_date_str}}
+    queue = endpoint_order()
+    pending = set()
     last_err = None
-    for url in FE_GRAPHQL_ENDPOINTS:
-        try:
-            r = requests.post(url, headers=headers, json=payload, timeout=20)
-            r.raise_for_status()
-            j = r.json()
-            if j.get("errors"):
-                last_err = RuntimeError(f"GraphQL error @ {url}: {j['errors']}"); continue
-            data = (j.get("data") or {}).get("marketPricesElectricity") or []
-            out = []
-            for item in data:
-                start = to_local(item["from"], tz)
-                end = to_local(item["till"], tz)
-                out.append({"start": start, "end": end, "price": float(item["marketPrice"])})
-            if out:
-                return out
-            last_err = RuntimeError(f"Lege data @ {url}")
-        except Exception as e:
-            last_err = e
+    all_empty = True
+    try:
+        pending.add(asyncio.create_task(_query_endpoint(queue.pop(0), payload, tz)))
+        while pending:
+            done, pending = await asyncio.wait(
+                pending, timeout=FE_HEDGE_DELAY_S if queue else None, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                try:
+                    return task.result()
+                except Exception as e:
+                    last_err = e
+                    all_empty = all_empty and isinstance(e, PricesNotPublished)
+            # Hedge (nog geen antwoord) of fout: start het volgende endpoint erbij
+            if queue:
+                pending.add(asyncio.create_task(_query_endpoint(queue.pop(0), payload, tz)))
+    finally:
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+    if all_empty:
+        raise PricesNotPublished(f"Nog geen Frank Energie prijzen voor {start_date_str}")
     raise RuntimeError(f"Kon Frank Energie prijzen niet ophalen: {last_err}")
 
+_price_store = None
+
+def price_store() -> PriceStore:
+    global _price_store
+    if _price_store is None:
+        _price_store = PriceStore()
+    return _price_store
+
+_soc_store = None
+
+def soc_store() -> SocStore:
+    global _soc_store
+    if _soc_store is None:
+        _soc_store = SocStore()
+    return _soc_store
+
+@contextmanager
+def use_stores(path: str):
+    """
+    Tijdelijk een ander store-bestand voor prijzen, instraling en SOC (plus lege instralingscache in geheugen),
+    bijv. een tijdelijke map voor metingen en replays die de echte store niet mogen raken.
+    """
+    global _price_store, _radiation_store, _soc_store
+    saved = (_price_store, _radiation_store, _soc_store)
+    _price_store, _radiation_store, _soc_store = PriceStore(path), RadiationStore(path), SocStore(path)
+    _radiation_mem.clear()
+    try:
+        yield
+    finally:
+        _price_store, _radiation_store, _soc_store = saved
+        _radiation_mem.clear()
+
+async def get_price_day(day: date, tz: ZoneInfo) -> PriceSeries:
+    """Prijzen voor leverdag `day`: eerst uit de lokale store, anders via GraphQL (complete dagen worden bewaard)."""
+    store = price_store()
+    cached = await asyncio.to_thread(store.get_day, day, tz)
+    if cached is not None:
+        metrics.inc("cache_requests_total", cache="prices", result="hit")
+        return PriceSeries.from_blocks(cached, tz)
+    metrics.inc("cache_requests_total", cache="prices", result="miss")
+    with metrics.span("fetch_seconds", source="frank"):
+        out = await fetch_graphql_day(day.isoformat(), (day+timedelta(days=1)).isoformat(), tz)
+    if covers_day(out, day, tz):
+        await asyncio.to_thread(store.put_day, day, out)
+    return PriceSeries.from_blocks(out, tz)
+
 async def get_frank_day_local(which: str, tz: ZoneInfo):
-    from datetime import datetime, timedelta
     today = datetime.now(tz).date()
-    if which == "today":
-        return fetch_graphql_day(today.isoformat(), (today+timedelta(days=1)).isoformat(), tz)
-    else:
-        tomorrow = today + timedelta(days=1)
-        return fetch_graphql_day(tomorrow.isoformat(), (tomorrow+timedelta(days=1)).isoformat(), tz)
+    day = today if which == "today" else today + timedelta(days=1)
+    # Gepubliceerde dagprijzen veranderen niet: eerst lokaal, alleen naar het net voor onbekende dagen
+    # (of voor morgen zolang de prijzen rond 15:00 nog niet compleet gepubliceerd zijn).
+    return await get_price_day(day, tz)
+
+# ---------------------------- Historie (backtests) ----------------------------
+
+def om_archive_url(lat, lon, tzname, start_date: date, end_date: date):
+    return (
+        f"{OM_ARCHIVE_URL}?latitude={lat}&longitude={lon}"
+        f"&start_date={start_date.isoformat()}&end_date={end_date.isoformat()}"
+        f"&hourly=shortwave_radiation&timezone={tzname}"
+    )
+
+async def backfill_radiation_history(cfg, tz: ZoneInfo, start_date: date, end_date: date) -> int:
+    """Haal gemeten instraling (Open-Meteo archive) op voor [start_date, end_date] en zet die in het archief."""
+    url = om_archive_url(cfg["lat"], cfg["lon"], cfg["timezone"], start_date, end_date)
+    r = await http_client().get(url)
+    r.raise_for_status()
+    series = RadiationSeries.from_hourly(r.json()["hourly"], tz)
+    await asyncio.to_thread(radiation_store().archive, location_key(cfg), series.t.tolist(), series.sw.tolist())
+    return len(series)
+
+async def backfill_prices(days, tz: ZoneInfo, concurrency: int = 4):
+    """Haal ontbrekende leverdagen op in de lokale store; retourneert de dagen die niet lukten."""
+    known = set(await asyncio.to_thread(price_store().days))
+    sem = asyncio.Semaphore(concurrency)
+    failed = []
+
+    async def one(day):
+        async with sem:
+            try:
+                await get_price_day(day, tz)
+            except Exception:
+                failed.append(day)
+
+    await asyncio.gather(*(one(d) for d in days if d not in known))
+    return sorted(failed)
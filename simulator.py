@@ -0,0 +1,148 @@
+import numpy as np
+
+from config import compiled
+
+# Oorzaak per segment (codes in de cause-array); labels zoals de GUI ze kleurt
+CAUSES = ("none", "pv", "grid_charge", "grid_discharge", "reserve")
+NONE, PV, GRID_CHARGE, GRID_DISCHARGE, RESERVE = range(len(CAUSES))
+
+_EPS = 1e-6
+
+
+class SocSimulation:
+    """
+    Uitkomst van simulate_soc. Vorm (B, T) voor een batch, (T,) voor één run:
+    - soc: SOC-traject, T+1 punten (start + na elk slot), geklemd op 0–100
+    - cause: oorzaakcode per slot (zie CAUSES)
+    - charged_pct / discharged_pct: SOC-%-punten die per slot van/naar het net gingen
+    """
+    __slots__ = ("soc", "cause", "charged_pct", "discharged_pct")
+
+    def __init__(self, soc, cause, charged_pct, discharged_pct):
+        self.soc = soc
+        self.cause = cause
+        self.charged_pct = charged_pct
+        self.discharged_pct = discharged_pct
+
+    def cause_labels(self):
+        """Oorzaken als labels (alleen voor één run)."""
+        return [CAUSES[c] for c in self.cause.tolist()]
+
+
+def simulate_soc(soc0, pv_pct, charge, discharge, target_pct, floor_pct,
+                 max_charge_pct, max_discharge_pct) -> SocSimulation:
+    """
+    Simuleer het SOC-verloop slot voor slot, gevectoriseerd over de batch-as.
+    Per slot: eerst PV-overschot (tot 100%), dan netladen richting target_pct (als `charge`),
+    dan ontladen richting floor_pct (als `discharge`); op de vloer telt het slot als 'reserve'.
+
+    pv_pct, charge, discharge en de target/floor/max-waarden: scalair, (T,) of (B, T) (per run: (B, 1));
+    soc0: scalair of (B,). Eén batch-aanroep doet T numpy-stappen, ongeacht het aantal runs B
+    (what-ifs, backtests, ensembles).
+    """
+    args = [np.asarray(pv_pct, dtype=np.float64), np.asarray(charge, dtype=bool), np.asarray(discharge, dtype=bool),
+            np.asarray(target_pct, dtype=np.float64), np.asarray(floor_pct, dtype=np.float64),
+            np.asarray(max_charge_pct, dtype=np.float64), np.asarray(max_discharge_pct, dtype=np.float64)]
+    shape = np.broadcast_shapes(*(a.shape for a in args))
+    single = len(shape) == 1 and np.ndim(soc0) == 0
+    B = max(shape[0] if len(shape) == 2 else 1, np.size(soc0))
+    T = shape[-1]
+    pv, ch, dis, target, floor, max_ch, max_dis = (np.broadcast_to(a, (B, T)) for a in args)
+
+    soc = np.broadcast_to(np.asarray(soc0, dtype=np.float64), (B,)).copy()
+    if B == 1:
+        # Eén run (soc_curve): per slot een paar float-bewerkingen; numpy-aanroepen per slot kosten daar
+        # meer dan ze opleveren, zeker met 96 kwartierslots per dag (zie bench.py, simulate_soc/*)
+        rows = _simulate_one(float(soc[0]), *(a[0].tolist() for a in (pv, ch, dis, target, floor, max_ch, max_dis)))
+        soc_out, cause, charged, discharged = (
+            np.array([row], dtype=dt) for row, dt in zip(rows, (np.float64, np.int8, np.float64, np.float64)))
+    else:
+        soc_out, cause, charged, discharged = _simulate_batch(soc, pv, ch, dis, target, floor, max_ch, max_dis)
+
+    np.clip(soc_out, 0.0, 100.0, out=soc_out)
+    if single:
+        return SocSimulation(soc_out[0], cause[0], charged[0], discharged[0])
+    return SocSimulation(soc_out, cause, charged, discharged)
+
+
+def _simulate_batch(soc, pv, ch, dis, target, floor, max_ch, max_dis):
+    """De gevectoriseerde lus van simulate_soc: invoer (B, T), soc (B,) wordt bijgewerkt; T numpy-stappen."""
+    B, T = pv.shape
+    soc_out = np.empty((B, T + 1))
+    cause = np.empty((B, T), dtype=np.int8)
+    charged = np.empty((B, T))
+    discharged = np.empty((B, T))
+    soc_out[:, 0] = soc
+    for j in range(T):
+        # PV-overschot tot 100%
+        pv_add = np.minimum(pv[:, j], np.maximum(0.0, 100.0 - soc))
+        soc += pv_add
+        c = np.where(pv_add > 0.0, PV, NONE)
+
+        # Laden richting target
+        add = np.where(ch[:, j] & (soc < target[:, j] - _EPS),
+                       np.minimum(np.maximum(0.0, target[:, j] - soc), max_ch[:, j]), 0.0)
+        new = np.minimum(100.0, soc + add)
+        charged[:, j] = new - soc
+        soc = new
+        c = np.where(add > 0.0, GRID_CHARGE, c)
+
+        # Ontladen richting vloer (reserve)
+        fl = floor[:, j]
+        drop = np.where(dis[:, j] & (soc > fl + _EPS), np.minimum(max_dis[:, j], np.maximum(0.0, soc - fl)), 0.0)
+        new = np.where(drop > 0.0, np.maximum(fl, soc - drop), soc)
+        discharged[:, j] = soc - new
+        soc = new
+        c = np.where(drop > 0.0, GRID_DISCHARGE, c)
+
+        # Plateau op reserve
+        c = np.where(np.abs(soc - fl) < _EPS, RESERVE, c)
+
+        cause[:, j] = c
+        soc_out[:, j + 1] = soc
+    return soc_out, cause, charged, discharged
+
+
+def _simulate_one(soc, pv, ch, dis, target, floor, max_ch, max_dis):
+    """Dezelfde stappen als _simulate_batch, voor één run in gewone floats (lijsten per slot)."""
+    soc_out, cause, charged, discharged = [soc], [], [], []
+    for j in range(len(pv)):
+        pv_add = min(pv[j], max(0.0, 100.0 - soc))
+        soc += pv_add
+        c = PV if pv_add > 0.0 else NONE
+
+        add = min(max(0.0, target[j] - soc), max_ch[j]) if ch[j] and soc < target[j] - _EPS else 0.0
+        new = min(100.0, soc + add)
+        charged.append(new - soc)
+        soc = new
+        if add > 0.0:
+            c = GRID_CHARGE
+
+        fl = floor[j]
+        drop = min(max_dis[j], max(0.0, soc - fl)) if dis[j] and soc > fl + _EPS else 0.0
+        new = max(fl, soc - drop) if drop > 0.0 else soc
+        discharged.append(soc - new)
+        soc = new
+        if drop > 0.0:
+            c = GRID_DISCHARGE
+
+        if abs(soc - fl) < _EPS:
+            c = RESERVE
+        cause.append(c)
+        soc_out.append(soc)
+    return soc_out, cause, charged, discharged
+
+
+def cashflow_eur(price, sim: SocSimulation, cfg) -> np.ndarray:
+    """
+    Netto opbrengst (€) per run: afgifte × prijs minus netinkoop × prijs.
+    Inkoop = opgeslagen / charge_eff, afgifte = SOC-daling × discharge_eff (zoals estimate_arbitrage).
+    """
+    pc = compiled(cfg)
+    battery_kwh = pc.battery_kwh
+    ceff = pc.charge_eff
+    deff = pc.discharge_eff
+    price = np.asarray(price, dtype=np.float64)
+    buy_kwh = sim.charged_pct / 100.0 * battery_kwh / ceff
+    sell_kwh = sim.discharged_pct / 100.0 * battery_kwh * deff
+    return ((sell_kwh - buy_kwh) * price).sum(axis=-1)
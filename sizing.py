@@ -0,0 +1,145 @@
+"""
+Dimensionering: sweep batterij/omvormer/reserve over een raster en backtest elke kandidaat.
+
+    python sizing.py --start 2025-01-01 --end 2025-12-31 --battery 30,50 --charge 6,12 --reserve 20,35
+
+Eerst wordt een steekproef van dagen doorgerekend; kandidaten die duidelijk gedomineerd worden
+(meer hardware of minder reserve én op de steekproef minstens PRUNE_MARGIN minder winst dan een andere
+kandidaat) vallen af. Gelijke of bijna gelijke winst snoeit niet: die kandidaten rekenen, net als de rest,
+de volledige periode door. Uitvoer: winst per configuratie als CSV-tabel.
+"""
+import argparse
+import csv
+from datetime import date
+from itertools import product
+
+from backtest import backtest_rows, _day_range
+from config import load_or_create_config
+from store import STORE_PATH
+
+SIZING_KEYS = ("battery_kwh", "inverter_charge_kw", "inverter_discharge_kw", "min_soc_reserve")
+_HARDWARE_KEYS = ("battery_kwh", "inverter_charge_kw", "inverter_discharge_kw")
+PRUNE_MARGIN = 0.05     # snoeien pas bij > 5% meer steekproefwinst (vlakke dagen geven vaak gelijke winst)
+
+
+def candidate_grid(battery_kwh, charge_kw, discharge_kw=None, reserve_pct=None, base_cfg=None):
+    """
+    Alle combinaties als [{SIZING_KEYS: waarde}]. Zonder discharge_kw is ontladen gelijk aan laden
+    (één omvormer); zonder reserve_pct geldt de reserve uit base_cfg.
+    """
+    reserve_pct = reserve_pct or [(base_cfg or {}).get("min_soc_reserve", 35.0)]
+    out = []
+    for bat, ch, res in product(battery_kwh, charge_kw, reserve_pct):
+        for dis in (discharge_kw or [ch]):
+            out.append({"battery_kwh": float(bat), "inverter_charge_kw": float(ch),
+                        "inverter_discharge_kw": float(dis), "min_soc_reserve": float(res)})
+    return out
+
+
+def _name(cand) -> str:
+    return "b{battery_kwh:g}_c{inverter_charge_kw:g}_d{inverter_discharge_kw:g}_r{min_soc_reserve:g}".format(**cand)
+
+
+def _dominates(a, b, pa: float, pb: float, margin: float) -> bool:
+    """
+    a domineert b: niet meer hardware, niet minder reserve (en ergens zuiniger), en strikt meer winst,
+    met minstens `margin` (fractie van |pb|) verschil. Gelijke winst domineert nooit.
+    """
+    return (all(a[k] <= b[k] for k in _HARDWARE_KEYS) and a["min_soc_reserve"] >= b["min_soc_reserve"]
+            and any(a[k] != b[k] for k in SIZING_KEYS)
+            and pa > pb + margin * abs(pb))
+
+
+def _profits(rows, metric: str):
+    out = {}
+    for row in rows:
+        if "note" not in row:
+            out[row["variant"]] = out.get(row["variant"], 0.0) + (row.get(metric) or 0.0)
+    return out
+
+
+def sweep(cfg, candidates, days, workers=None, mode: str = "simple", sample_every: int = 4,
+          prune_margin: float = PRUNE_MARGIN, store_path: str = STORE_PATH):
+    """
+    Evalueer alle kandidaten parallel over `days`, met vroegtijdig snoeien na een steekproef
+    (elke sample_every-de dag). Alleen strikt gedomineerde kandidaten met meer dan prune_margin (fractie)
+    winstverschil vallen af; alles binnen de marge rekent de volledige dagenreeks door. Retourneert tabelregels, gesorteerd op winst (hoogste eerst).
+    """
+    metric = "dp_profit_eur" if mode == "dp" else "sim_profit_eur"
+    variants = [(_name(c), c) for c in candidates]
+    by_name = dict(variants)
+
+    sample = days[::sample_every] if sample_every > 1 else []
+    pruned = {}
+    sample_profit = {}
+    if sample and len(variants) > 1:
+        sample_profit = _profits(backtest_rows(cfg, sample, variants, workers, mode, store_path), metric)
+        for name, cand in variants:
+            p = sample_profit.get(name, 0.0)
+            winner = next((other for other, oc in variants
+                           if other != name and other not in pruned
+                           and _dominates(oc, cand, sample_profit.get(other, 0.0), p, prune_margin)), None)
+            if winner:
+                pruned[name] = winner
+
+    survivors = [(n, c) for n, c in variants if n not in pruned]
+    sampled = set(sample) if sample_profit else set()
+    rest = [d for d in days if d not in sampled]
+    profit = _profits(backtest_rows(cfg, rest, survivors, workers, mode, store_path), metric) if rest else {}
+
+    table = []
+    for name, cand in variants:
+        row = dict(cand)
+        if name in pruned:
+            row.update(status=f"gesnoeid (gedomineerd door {pruned[name]})", days=len(sample),
+                       profit_eur=round(sample_profit.get(name, 0.0), 2))
+        else:
+            total = profit.get(name, 0.0) + sample_profit.get(name, 0.0)
+            row.update(status="volledig", days=len(days), profit_eur=round(total, 2))
+        row["profit_per_kwh_battery"] = round(row["profit_eur"] / max(by_name[name]["battery_kwh"], 1e-9), 3)
+        table.append(row)
+    table.sort(key=lambda r: (r["status"] != "volledig", -r["profit_eur"]))
+    return table
+
+
+def write_csv(table, path: str):
+    fields = list(SIZING_KEYS) + ["days", "profit_eur", "profit_per_kwh_battery", "status"]
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        w = csv.DictWriter(f, fieldnames=fields)
+        w.writeheader()
+        w.writerows(table)
+
+
+def _floats(text):
+    return [float(x) for x in text.split(",")] if text else None
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="ChargeMind dimensionering: batterij/omvormer-sweep over historie")
+    ap.add_argument("--start", required=True, type=date.fromisoformat)
+    ap.add_argument("--end", required=True, type=date.fromisoformat)
+    ap.add_argument("--battery", required=True, help="batterij kWh, bv. 30,40,50")
+    ap.add_argument("--charge", required=True, help="laadvermogen kW, bv. 6,9,12")
+    ap.add_argument("--discharge", default=None, help="ontlaadvermogen kW (standaard gelijk aan laden)")
+    ap.add_argument("--reserve", default=None, help="min. SOC-reserve %%, bv. 20,35")
+    ap.add_argument("--mode", choices=("simple", "dp"), default="simple")
+    ap.add_argument("--workers", type=int, default=None)
+    ap.add_argument("--sample-every", type=int, default=4)
+    ap.add_argument("--prune-margin", type=float, default=PRUNE_MARGIN,
+                    help="min. relatief winstverschil op de steekproef voor snoeien (standaard 0.05)")
+    ap.add_argument("--out", default="sizing.csv")
+    args = ap.parse_args(argv)
+
+    cfg = load_or_create_config()
+    candidates = candidate_grid(_floats(args.battery), _floats(args.charge), _floats(args.discharge),
+                                _floats(args.reserve), cfg)
+    table = sweep(cfg, candidates, _day_range(args.start, args.end), args.workers, args.mode,
+                  args.sample_every, args.prune_margin)
+    write_csv(table, args.out)
+    for r in table:
+        print(f"{r['battery_kwh']:>6g} kWh | {r['inverter_charge_kw']:>5g}/{r['inverter_discharge_kw']:<5g} kW | "
+              f"reserve {r['min_soc_reserve']:>4g}% | {r['profit_eur']:>9.2f} € ({r['days']} d) | {r['status']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,22 @@
 # solis_client.py
-import base64, hashlib, hmac, json, requests
+import base64, hashlib, hmac, json, random, threading, time, requests
 from datetime import datetime, timezone
 from typing import Optional
 
+from requests.adapters import HTTPAdapter
+
 SOLIS_BASE = "https://www.soliscloud.com:13333"
 CT_JSON = "application/json"
 
+# SolisCloud allows ~2 requests/s per account (all endpoints together)
+SOLIS_RATE_PER_S = 2.0
+SOLIS_BURST = 2
+SOLIS_MAX_RETRIES = 3
+SOLIS_BACKOFF_BASE_S = 0.5
+SOLIS_BACKOFF_MAX_S = 8.0
+SOLIS_POOL_SIZE = 10
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
 def _rfc1123_now() -> str:
     # e.g. 'Tue, 19 Aug 2025 18:10:00 GMT'
     return datetime.now(timezone.utc).strftime("%a, %d %b %Y %H:%M:%S GMT")
@@ -20,35 +31,115 @@ def _signature(secret: str, method: str, md5_b64: str, content_type: str, date_h
     dig = hmac.new(secret.encode(), msg.encode(), hashlib.sha1).digest()
     return base64.b64encode(dig).decode()
 
+class TokenBucket:
+    """
+    Thread-safe token bucket: `rate` tokens per second, at most `burst` saved up.
+    reserve() claims a token and returns how long the caller must wait before using it,
+    so both blocking (acquire) and asyncio callers (await asyncio.sleep(reserve())) can share one bucket.
+    """
+    def __init__(self, rate: float, burst: int):
+        self.rate = float(rate)
+        self.burst = float(burst)
+        self._tokens = float(burst)
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+            self._last = now
+            self._tokens -= 1.0
+            return 0.0 if self._tokens >= 0 else -self._tokens / self.rate
+
+    def acquire(self) -> None:
+        wait = self.reserve()
+        if wait > 0:
+            time.sleep(wait)
+
+
+_account_buckets = {}
+_account_lock = threading.Lock()
+
+def account_bucket(api_id: str, rate: float = SOLIS_RATE_PER_S, burst: int = SOLIS_BURST) -> TokenBucket:
+    """One shared bucket per API account, so all clients/threads for that account respect the same limit."""
+    with _account_lock:
+        bucket = _account_buckets.get(api_id)
+        if bucket is None:
+            bucket = _account_buckets[api_id] = TokenBucket(rate, burst)
+        return bucket
+
+def backoff_delay(attempt: int, base: float = SOLIS_BACKOFF_BASE_S, cap: float = SOLIS_BACKOFF_MAX_S) -> float:
+    """Exponential backoff with full jitter: uniform in [0, min(cap, base * 2^attempt)]."""
+    return random.uniform(0.0, min(cap, base * (2 ** attempt)))
+
+def signed_headers(api_id: str, api_secret: str, path: str, body: bytes) -> dict:
+    md5_b64 = _content_md5(body)
+    date_hdr = _rfc1123_now()
+    sign = _signature(api_secret, "POST", md5_b64, CT_JSON, date_hdr, path)
+    return {
+        "Content-Type": CT_JSON,
+        "Content-MD5": md5_b64,
+        "Date": date_hdr,
+        "Authorization": f"API {api_id}:{sign}",
+        "User-Agent": "ChargeMind/0.1"
+    }
+
+def check_response(j: dict) -> dict:
+    if j.get("code") not in (0, "0", 200):  # Solis returns {code:0} on success
+        raise RuntimeError(f"Solis API error: {j}")
+    return j
+
 class SolisClient:
     """
     Minimal SolisCloud Platform API v2 client (read-only).
     For write/control you need Device Control API enablement from Solis.
+
+    Requests go through one pooled keep-alive session (no TLS handshake per call), are rate limited
+    per account with a token bucket, and are retried with jittered backoff on 429/5xx, timeouts and
+    connection errors. Every attempt is signed again, so the Date header stays fresh.
     """
-    def __init__(self, api_id: str, api_secret: str, timeout: int = 20):
+    def __init__(self, api_id: str, api_secret: str, timeout: int = 20, base_url: str = SOLIS_BASE,
+                 max_retries: int = SOLIS_MAX_RETRIES, bucket: Optional[TokenBucket] = None,
+                 pool_size: int = SOLIS_POOL_SIZE):
         self.api_id = api_id
         self.api_secret = api_secret
         self.timeout = timeout
+        self.base_url = base_url.rstrip("/")
+        self.max_retries = max_retries
+        self.bucket = bucket or account_bucket(api_id)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def close(self) -> None:
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
 
     def _post(self, path: str, payload: dict) -> dict:
-        url = SOLIS_BASE + path
+        url = self.base_url + path
         body = json.dumps(payload, separators=(",", ":")).encode()
-        md5_b64 = _content_md5(body)
-        date_hdr = _rfc1123_now()
-        sign = _signature(self.api_secret, "POST", md5_b64, CT_JSON, date_hdr, path)
-        headers = {
-            "Content-Type": CT_JSON,
-            "Content-MD5": md5_b64,
-            "Date": date_hdr,
-            "Authorization": f"API {self.api_id}:{sign}",
-            "User-Agent": "ChargeMind/0.1"
-        }
-        r = requests.post(url, headers=headers, data=body, timeout=self.timeout)
-        r.raise_for_status()
-        j = r.json()
-        if j.get("code") not in (0, "0", 200):  # Solis returns {code:0} on success
-            raise RuntimeError(f"Solis API error: {j}")
-        return j
+        attempt = 0
+        while True:
+            self.bucket.acquire()
+            headers = signed_headers(self.api_id, self.api_secret, path, body)
+            try:
+                r = self.session.post(url, headers=headers, data=body, timeout=self.timeout)
+            except (requests.Timeout, requests.ConnectionError):
+                if attempt >= self.max_retries:
+                    raise
+            else:
+                if r.status_code not in RETRY_STATUS or attempt >= self.max_retries:
+                    r.raise_for_status()
+                    return check_response(r.json())
+            time.sleep(backoff_delay(attempt))
+            attempt += 1
 
     def inverter_detail(self, sn: str, day_str: str) -> dict:
         """
@@ -81,14 +172,32 @@ class SolisClient:
             return None
 
     # --------- OPTIONAL (requires Device Control API enablement) ----------
+    def at_read(self, sn: str, cid: int) -> str:
+        """/v2/api/atRead: current value of one control parameter (cid) as string."""
+        j = self._post("/v2/api/atRead", {"inverterSn": sn, "cid": int(cid)})
+        data = j.get("data") or {}
+        return str(data.get("msg", data.get("value", "")))
+
+    def control(self, sn: str, cid: int, value: str) -> dict:
+        """/v2/api/control: set one control parameter (cid) to `value`."""
+        return self._post("/v2/api/control", {"inverterSn": sn, "cid": int(cid), "value": str(value)})
+
     def push_time_of_use(self, sn: str, charge_start_hhmm: str, charge_end_hhmm: str,
                          discharge_start_hhmm: str, discharge_end_hhmm: str,
-                         target_soc_pct: float, reserve_soc_pct: float) -> None:
+                         target_soc_pct: float, reserve_soc_pct: float, cids: Optional[dict] = None) -> None:
         """
-        Stub: Device Control API has different endpoints/params and must be explicitly enabled.
-        Without that enablement this will fail server-side.
+        Set one charge and one discharge time-of-use slot (slot 0 of each) via the Device Control API.
+        cids: the per-slot control cid's from config (cfg["solis_tou_cids"]); they differ per model/firmware.
+        Only changed parameters are written; see tou.TouPipeline for full schedules.
+        Without Device Control enablement this fails server-side.
         """
-        raise NotImplementedError(
-            "Device Control API niet geactiveerd voor dit account. "
-            "Vraag 'Device Control API' rechten aan bij Solis support."
-        )
+        if not cids or not any(cids.values()):
+            raise NotImplementedError(
+                "Geen solis_tou_cids geconfigureerd: vul de Device Control cid's per TOU-slot in de config in "
+                "(en vraag 'Device Control API' rechten aan bij Solis support)."
+            )
+        from tou import TouPipeline, TouSlot
+        TouPipeline(self, sn, cids, verify=True).apply([
+            TouSlot("charge", 0, charge_start_hhmm, charge_end_hhmm, target_soc_pct),
+            TouSlot("discharge", 0, discharge_start_hhmm, discharge_end_hhmm, reserve_soc_pct),
+        ])
@@ -0,0 +1,219 @@
+# solis_fleet.py
+"""
+Async fleet-wide telemetry for all inverters of a SolisCloud account.
+
+    python solis_fleet.py [--detail always|missing|never] [--concurrency 8]
+
+One poll cycle = /v1/api/inverterList (all pages) + /v1/api/inverterDetail for every inverter,
+concurrently with bounded parallelism. The account token bucket from solis_client is shared,
+so the fleet poll and any other SolisClient for the same account stay within SolisCloud's limit
+together; that limit (not the network) is what bounds the cycle time. At SOLIS_RATE_PER_S = 2 a
+full cycle over N inverters takes about N / 2 s: 200 inverters ~ 100 s. detail='missing' only
+calls inverterDetail where the list record has no SOC, so a fleet whose list pages carry the SOC
+polls in ~pages / 2 s (seconds) instead.
+"""
+import argparse
+import asyncio
+import json
+import time
+from typing import Optional
+
+import httpx
+
+from solis_client import (
+    SOLIS_BASE, SOLIS_MAX_RETRIES, RETRY_STATUS, TokenBucket, account_bucket, backoff_delay,
+    check_response, signed_headers,
+)
+
+LIST_PAGE_SIZE = 100          # max page size of inverterList
+DEFAULT_CONCURRENCY = 8       # in flight; at 2 req/s this hides ~4 s of latency, more only queues on the bucket
+
+
+def _kw(value, unit) -> Optional[float]:
+    """Solis reports power as value + unit string ('W' / 'kW'); normalise to kW."""
+    if value is None or value == "":
+        return None
+    try:
+        v = float(value)
+    except (TypeError, ValueError):
+        return None
+    return v / 1000.0 if str(unit or "kW").strip().lower() == "w" else v
+
+
+def _float(value) -> Optional[float]:
+    try:
+        return None if value is None or value == "" else float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+class InverterSnapshot:
+    """Compact per-inverter state: SOC %, AC power kW, battery power kW (+ = charging, per Solis sign)."""
+    __slots__ = ("sn", "ts", "soc", "power_kw", "battery_power_kw", "state", "source")
+
+    def __init__(self, sn, ts, soc, power_kw, battery_power_kw, state, source):
+        self.sn = sn
+        self.ts = ts
+        self.soc = soc
+        self.power_kw = power_kw
+        self.battery_power_kw = battery_power_kw
+        self.state = state
+        self.source = source
+
+    @classmethod
+    def from_record(cls, rec: dict, source: str, fetched_at: float):
+        soc = _float(rec.get("batteryCapacitySoc"))
+        if soc is None and isinstance(rec.get("storage"), dict):
+            soc = _float(rec["storage"].get("batteryCapacitySoc"))
+        ts = _float(rec.get("dataTimestamp"))
+        return cls(
+            sn=str(rec.get("sn", "")),
+            ts=ts / 1000.0 if ts else fetched_at,          # dataTimestamp is in ms
+            soc=soc,
+            power_kw=_kw(rec.get("pac"), rec.get("pacStr")),
+            battery_power_kw=_kw(rec.get("batteryPower"), rec.get("batteryPowerStr")),
+            state=rec.get("state"),
+            source=source,
+        )
+
+    def as_dict(self) -> dict:
+        return {k: getattr(self, k) for k in self.__slots__}
+
+
+class FleetCollector:
+    """
+    Async SolisCloud client for many inverters: one pooled httpx.AsyncClient, a semaphore for
+    bounded parallelism, the shared per-account token bucket and jittered retries (as SolisClient).
+    """
+
+    def __init__(self, api_id: str, api_secret: str, base_url: str = SOLIS_BASE,
+                 concurrency: int = DEFAULT_CONCURRENCY, timeout: float = 20.0,
+                 bucket: Optional[TokenBucket] = None, max_retries: int = SOLIS_MAX_RETRIES):
+        self.api_id = api_id
+        self.api_secret = api_secret
+        self.base_url = base_url.rstrip("/")
+        self.concurrency = concurrency
+        self.timeout = timeout
+        self.bucket = bucket or account_bucket(api_id)
+        self.max_retries = max_retries
+        self._client = None
+        self._sem = None
+
+    async def __aenter__(self):
+        self._client = httpx.AsyncClient(
+            timeout=self.timeout,
+            limits=httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency),
+        )
+        self._sem = asyncio.Semaphore(self.concurrency)
+        return self
+
+    async def __aexit__(self, *exc):
+        await self._client.aclose()
+        self._client = None
+
+    async def _post(self, path: str, payload: dict) -> dict:
+        body = json.dumps(payload, separators=(",", ":")).encode()
+        attempt = 0
+        async with self._sem:
+            while True:
+                wait = self.bucket.reserve()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                headers = signed_headers(self.api_id, self.api_secret, path, body)
+                try:
+                    r = await self._client.post(self.base_url + path, headers=headers, content=body)
+                except (httpx.TimeoutException, httpx.TransportError):
+                    if attempt >= self.max_retries:
+                        raise
+                else:
+                    if r.status_code not in RETRY_STATUS or attempt >= self.max_retries:
+                        r.raise_for_status()
+                        return check_response(r.json())
+                await asyncio.sleep(backoff_delay(attempt))
+                attempt += 1
+
+    async def list_inverters(self):
+        """All inverter records of the account (first page, then remaining pages concurrently)."""
+        async def page(no: int):
+            j = await self._post("/v1/api/inverterList", {"pageNo": no, "pageSize": LIST_PAGE_SIZE})
+            p = (j.get("data") or {}).get("page") or {}
+            return p.get("records") or [], int(p.get("total") or 0)
+
+        records, total = await page(1)
+        pages = -(-total // LIST_PAGE_SIZE)
+        for more, _ in await asyncio.gather(*(page(no) for no in range(2, pages + 1))):
+            records.extend(more)
+        return records
+
+    async def detail(self, sn: str, day_str: Optional[str] = None) -> dict:
+        day_str = day_str or time.strftime("%Y-%m-%d", time.gmtime())
+        j = await self._post("/v1/api/inverterDetail", {"sn": sn, "time": day_str})
+        return j.get("data") or {}
+
+    async def at_read(self, sn: str, cid: int) -> str:
+        """/v2/api/atRead (as SolisClient.at_read); requires Device Control API enablement."""
+        j = await self._post("/v2/api/atRead", {"inverterSn": sn, "cid": int(cid)})
+        data = j.get("data") or {}
+        return str(data.get("msg", data.get("value", "")))
+
+    async def control(self, sn: str, cid: int, value: str) -> dict:
+        """/v2/api/control (as SolisClient.control)."""
+        return await self._post("/v2/api/control", {"inverterSn": sn, "cid": int(cid), "value": str(value)})
+
+    async def poll(self, detail: str = "always"):
+        """
+        One cycle over the whole fleet. detail:
+        - 'always' : inverterDetail for every inverter (default; ~N / rate seconds, see module doc)
+        - 'missing': inverterDetail only for inverters whose list record has no SOC
+        - 'never'  : snapshots only from inverterList
+        Returns ({sn: InverterSnapshot}, {sn: error message}).
+        """
+        fetched_at = time.time()
+        records = await self.list_inverters()
+        by_sn = {str(rec.get("sn", "")): rec for rec in records}
+        snaps = {sn: InverterSnapshot.from_record(rec, "list", fetched_at) for sn, rec in by_sn.items()}
+        if detail == "never":
+            return snaps, {}
+        todo = [sn for sn, s in snaps.items() if detail == "always" or s.soc is None]
+
+        async def one(sn):
+            data = await self.detail(sn)
+            # detail fields win; fields only present in the list record (e.g. state) are kept
+            return InverterSnapshot.from_record({**by_sn[sn], **data, "sn": sn}, "detail", time.time())
+
+        errors = {}
+        for sn, res in zip(todo, await asyncio.gather(*(one(sn) for sn in todo), return_exceptions=True)):
+            if isinstance(res, BaseException):
+                errors[sn] = repr(res)
+            else:
+                snaps[sn] = res
+        return snaps, errors
+
+
+async def collect(cfg, detail: str = "always", concurrency: int = DEFAULT_CONCURRENCY):
+    """
+    Poll the fleet of the account configured in cfg (solis_api_id/solis_api_secret).
+    With detail='always' this takes ~len(fleet) / SOLIS_RATE_PER_S seconds (200 inverters ~ 100 s).
+    """
+    async with FleetCollector(cfg["solis_api_id"], cfg["solis_api_secret"], concurrency=concurrency) as fleet:
+        return await fleet.poll(detail)
+
+
+def main(argv=None):
+    from config import load_or_create_config
+
+    ap = argparse.ArgumentParser(description="SolisCloud fleet snapshot")
+    ap.add_argument("--detail", choices=("always", "missing", "never"), default="always",
+                    help="inverterDetail per inverter: always (~N/2 s), missing (only without SOC) or never")
+    ap.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY)
+    args = ap.parse_args(argv)
+
+    t0 = time.perf_counter()
+    snaps, errors = asyncio.run(collect(load_or_create_config(), args.detail, args.concurrency))
+    for s in snaps.values():
+        print(json.dumps(s.as_dict()))
+    print(f"# {len(snaps)} inverters, {len(errors)} errors, {time.perf_counter() - t0:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
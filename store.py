@@ -0,0 +1,168 @@
+import json
+import sqlite3
+from contextlib import closing
+from datetime import date, datetime, timedelta, time as dtime, timezone
+from zoneinfo import ZoneInfo
+
+STORE_PATH = "chargemind_store.sqlite"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS price_days (
+    delivery_date TEXT PRIMARY KEY,
+    fetched_at    INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS prices (
+    delivery_date TEXT NOT NULL,
+    start_ts      INTEGER NOT NULL,
+    end_ts        INTEGER NOT NULL,
+    price         REAL NOT NULL,
+    PRIMARY KEY (delivery_date, start_ts)
+);
+CREATE INDEX IF NOT EXISTS prices_by_start ON prices (start_ts);
+CREATE TABLE IF NOT EXISTS radiation_forecasts (
+    location   TEXT PRIMARY KEY,
+    fetched_at INTEGER NOT NULL,
+    hourly     TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS radiation_history (
+    location TEXT NOT NULL,
+    ts       INTEGER NOT NULL,
+    sw       REAL NOT NULL,
+    PRIMARY KEY (location, ts)
+);
+CREATE TABLE IF NOT EXISTS soc_history (
+    kind TEXT NOT NULL,
+    ts   INTEGER NOT NULL,
+    soc  REAL NOT NULL,
+    PRIMARY KEY (kind, ts)
+);
+"""
+
+
+def covers_day(blocks, day: date, tz: ZoneInfo) -> bool:
+    """True als de prijsblokken de hele leverdag (lokale middernacht → middernacht) dekken."""
+    if not blocks:
+        return False
+    day_start = datetime.combine(day, dtime(0), tzinfo=tz)
+    day_end = datetime.combine(day + timedelta(days=1), dtime(0), tzinfo=tz)
+    return min(b["start"] for b in blocks) <= day_start and max(b["end"] for b in blocks) >= day_end
+
+
+class _SqliteStore:
+    def __init__(self, path: str = STORE_PATH):
+        self.path = path
+        self._ready = False
+
+    def _connect(self):
+        con = sqlite3.connect(self.path, timeout=10)
+        if not self._ready:
+            con.executescript(_SCHEMA)
+            self._ready = True
+        return con
+
+
+class PriceStore(_SqliteStore):
+    """
+    Lokale SQLite-opslag van day-ahead prijzen per leverdatum.
+    Gepubliceerde dagprijzen wijzigen niet meer, dus een complete dag hoeft maar één keer opgehaald te worden.
+    """
+
+    def get_day(self, day: date, tz: ZoneInfo):
+        """Opgeslagen blokken voor `day` als [{start, end, price}] (lokale tijd), of None."""
+        key = day.isoformat()
+        with closing(self._connect()) as con:
+            if con.execute("SELECT 1 FROM price_days WHERE delivery_date = ?", (key,)).fetchone() is None:
+                return None
+            rows = con.execute(
+                "SELECT start_ts, end_ts, price FROM prices WHERE delivery_date = ? ORDER BY start_ts", (key,)
+            ).fetchall()
+        return [
+            {
+                "start": datetime.fromtimestamp(s, tz),
+                "end": datetime.fromtimestamp(e, tz),
+                "price": float(p),
+            }
+            for s, e, p in rows
+        ]
+
+    def put_day(self, day: date, blocks) -> None:
+        """Sla een (complete) leverdag op; bestaande rijen voor die dag worden vervangen."""
+        key = day.isoformat()
+        rows = [(key, int(b["start"].timestamp()), int(b["end"].timestamp()), float(b["price"])) for b in blocks]
+        now_ts = int(datetime.now(timezone.utc).timestamp())
+        with closing(self._connect()) as con, con:
+            con.execute("DELETE FROM prices WHERE delivery_date = ?", (key,))
+            con.executemany("INSERT INTO prices VALUES (?, ?, ?, ?)", rows)
+            con.execute("INSERT OR REPLACE INTO price_days VALUES (?, ?)", (key, now_ts))
+
+    def history(self, start_ts: int, end_ts: int):
+        """Opgeslagen prijsblokken met start in [start_ts, end_ts) als ([epoch s], [€/kWh]), over dagen heen."""
+        with closing(self._connect()) as con:
+            rows = con.execute(
+                "SELECT start_ts, price FROM prices WHERE start_ts >= ? AND start_ts < ? ORDER BY start_ts",
+                (int(start_ts), int(end_ts)),
+            ).fetchall()
+        return [r[0] for r in rows], [r[1] for r in rows]
+
+    def days(self):
+        """Alle opgeslagen leverdata (oplopend)."""
+        with closing(self._connect()) as con:
+            rows = con.execute("SELECT delivery_date FROM price_days ORDER BY delivery_date").fetchall()
+        return [date.fromisoformat(r[0]) for r in rows]
+
+
+class RadiationStore(_SqliteStore):
+    """
+    Laatst opgehaalde Open-Meteo 'hourly' payload per locatie, met ophaalmoment (epoch s),
+    plus een archief per uur (laatste prognose wint) voor backtests.
+    """
+
+    def get(self, location: str):
+        """(fetched_at, hourly-dict) of None."""
+        with closing(self._connect()) as con:
+            row = con.execute(
+                "SELECT fetched_at, hourly FROM radiation_forecasts WHERE location = ?", (location,)
+            ).fetchone()
+        if row is None:
+            return None
+        return int(row[0]), json.loads(row[1])
+
+    def put(self, location: str, fetched_at: float, hourly: dict) -> None:
+        with closing(self._connect()) as con, con:
+            con.execute(
+                "INSERT OR REPLACE INTO radiation_forecasts VALUES (?, ?, ?)",
+                (location, int(fetched_at), json.dumps(hourly, separators=(",", ":"))),
+            )
+
+    def archive(self, location: str, ts, sw) -> None:
+        """Uurwaarden (epoch s, W/m2) in het archief zetten; bestaande uren worden overschreven."""
+        rows = [(location, int(t), float(w)) for t, w in zip(ts, sw)]
+        with closing(self._connect()) as con, con:
+            con.executemany("INSERT OR REPLACE INTO radiation_history VALUES (?, ?, ?)", rows)
+
+    def history(self, location: str, start_ts: int, end_ts: int):
+        """Gearchiveerde uren in [start_ts, end_ts) als ([epoch s], [W/m2])."""
+        with closing(self._connect()) as con:
+            rows = con.execute(
+                "SELECT ts, sw FROM radiation_history WHERE location = ? AND ts >= ? AND ts < ? ORDER BY ts",
+                (location, int(start_ts), int(end_ts)),
+            ).fetchall()
+        return [r[0] for r in rows], [r[1] for r in rows]
+
+
+class SocStore(_SqliteStore):
+    """SOC-verloop per soort ('planned' = laatst geplande curve, 'measured' = gemeten); nieuwste waarde per tijdstip wint."""
+
+    def record(self, kind: str, ts, soc) -> None:
+        rows = [(kind, int(t), float(v)) for t, v in zip(ts, soc)]
+        with closing(self._connect()) as con, con:
+            con.executemany("INSERT OR REPLACE INTO soc_history VALUES (?, ?, ?)", rows)
+
+    def history(self, kind: str, start_ts: int, end_ts: int):
+        """SOC-punten in [start_ts, end_ts) als ([epoch s], [%])."""
+        with closing(self._connect()) as con:
+            rows = con.execute(
+                "SELECT ts, soc FROM soc_history WHERE kind = ? AND ts >= ? AND ts < ? ORDER BY ts",
+                (kind, int(start_ts), int(end_ts)),
+            ).fetchall()
+        return [r[0] for r in rows], [r[1] for r in rows]
@@ -0,0 +1,156 @@
+import threading
+import time
+
+import numpy as np
+
+from services import soc_store
+
+SOC_RING_SIZE = 4096            # ~2,8 dagen bij één sample per minuut
+
+
+class SocRing:
+    """
+    Ringbuffer met vaste grootte voor (epoch s, SOC %)-samples op numpy-arrays: geheugen blijft
+    constant, ook na weken polling. Thread-safe (één schrijver, meerdere lezers).
+    """
+    __slots__ = ("ts", "soc", "_head", "_count", "_lock")
+
+    def __init__(self, capacity: int = SOC_RING_SIZE):
+        self.ts = np.zeros(capacity, dtype=np.float64)
+        self.soc = np.zeros(capacity, dtype=np.float64)
+        self._head = 0          # volgende schrijfpositie
+        self._count = 0
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._count
+
+    def append(self, ts: float, soc: float) -> None:
+        with self._lock:
+            self.ts[self._head] = ts
+            self.soc[self._head] = soc
+            self._head = (self._head + 1) % len(self.ts)
+            self._count = min(self._count + 1, len(self.ts))
+
+    def latest(self):
+        """(ts, soc) van het nieuwste sample, of None."""
+        with self._lock:
+            if not self._count:
+                return None
+            i = (self._head - 1) % len(self.ts)
+            return float(self.ts[i]), float(self.soc[i])
+
+    def window(self, since_ts: float = None):
+        """Samples (oud → nieuw) als kopie-arrays (ts, soc), optioneel vanaf since_ts."""
+        with self._lock:
+            n, cap = self._count, len(self.ts)
+            idx = np.arange(self._head - n, self._head) % cap
+            ts, soc = self.ts[idx], self.soc[idx]
+        if since_ts is not None:
+            keep = ts >= since_ts
+            ts, soc = ts[keep], soc[keep]
+        return ts, soc
+
+
+_soc_ring = None
+
+def soc_ring() -> SocRing:
+    global _soc_ring
+    if _soc_ring is None:
+        _soc_ring = SocRing()
+    return _soc_ring
+
+
+def latest_soc(cfg, now_ts: float = None):
+    """Gemeten SOC als die niet ouder is dan solis_soc_max_age_min, anders None."""
+    hit = soc_ring().latest()
+    if hit is None:
+        return None
+    now_ts = time.time() if now_ts is None else now_ts
+    return hit[1] if now_ts - hit[0] <= cfg.get("solis_soc_max_age_min", 10) * 60.0 else None
+
+
+# ---------------------------- Poller ----------------------------
+
+class SocPoller:
+    """
+    Achtergrondthread die periodiek get_battery_soc aanroept en samples in de ring zet
+    (en als 'measured' in de SOC-historie van de store).
+    """
+
+    def __init__(self, client, sn: str, ring: SocRing = None, interval_s: float = 60.0, record: bool = True):
+        self.client = client
+        self.sn = sn
+        self.ring = soc_ring() if ring is None else ring
+        self.interval_s = interval_s
+        self.record = record
+        self.errors = 0
+        self.last_error = None
+        self.first_read = threading.Event()     # gezet na de eerste leespoging, gelukt of niet
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="soc-poller", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self, timeout: float = 5.0):
+        self._stop.set()
+        self._thread.join(timeout)
+
+    def poll_once(self):
+        soc = self.client.get_battery_soc(self.sn)
+        if soc is None:
+            return None
+        ts = time.time()
+        self.ring.append(ts, soc)
+        if self.record:
+            soc_store().record("measured", [ts], [soc])
+        return soc
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.poll_once()
+            except Exception as e:   # netwerk/API: volgende ronde opnieuw
+                self.errors += 1
+                self.last_error = e
+            self.first_read.set()
+            self._stop.wait(self.interval_s)
+
+
+def start_soc_poller(cfg):
+    """Start de poller als SolisCloud ingeschakeld is en use_solis_soc_today aan staat; anders None."""
+    if not (cfg.get("solis_enabled") and cfg.get("use_solis_soc_today") and cfg.get("solis_inverter_sn")):
+        return None
+    from solis_client import SolisClient
+    client = SolisClient(cfg["solis_api_id"], cfg["solis_api_secret"])
+    return SocPoller(client, cfg["solis_inverter_sn"], interval_s=cfg.get("solis_poll_interval_s", 60)).start()
+
+
+# ---------------------------- Drift ----------------------------
+
+def planned_soc_at(series: dict, when_ts: float):
+    """Geplande SOC op when_ts (lineair tussen de curvepunten), of None buiten de curve."""
+    times, values = series.get("soc_times") or [], series.get("soc_values") or []
+    if len(times) < 1:
+        return None
+    t = np.array([x.timestamp() for x in times])
+    if when_ts < t[0] or when_ts > t[-1]:
+        return None
+    return float(np.interp(when_ts, t, values))
+
+
+def soc_drift(result: dict, ring: SocRing = None):
+    """Gemeten − geplande SOC (%-punten) op het moment van het laatste sample, of None."""
+    hit = (soc_ring() if ring is None else ring).latest()
+    if hit is None or "series" not in result:
+        return None
+    planned = planned_soc_at(result["series"], hit[0])
+    return None if planned is None else hit[1] - planned
+
+
+def needs_replan(result: dict, cfg, ring: SocRing = None) -> bool:
+    """True als de gemeten SOC meer dan replan_drift_pct van het plan afwijkt."""
+    drift = soc_drift(result, ring)
+    return drift is not None and abs(drift) >= cfg.get("replan_drift_pct", 5.0)
@@ -0,0 +1,56 @@
+import math
+import os
+import sys
+from datetime import date, datetime, timedelta
+from zoneinfo import ZoneInfo
+
+import pytest
+
+# Platte modules in de repo-root importeerbaar maken, ook bij `pytest` vanuit een andere map
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import DEFAULTS                     # noqa: E402
+import services                                 # noqa: E402
+from services import location_key               # noqa: E402
+from store import PriceStore, RadiationStore, SocStore  # noqa: E402
+
+# Gedeelde backtest-opslag: BACKTEST_DAYS dagen vanaf BACKTEST_FIRST, de vierde dag zonder prijzen
+BACKTEST_FIRST = date(2025, 6, 2)
+BACKTEST_DAYS = 6
+BACKTEST_CFG = {**DEFAULTS, "orientation_choice": 5, "battery_kwh": 10.0, "min_soc_reserve": 20.0}
+
+
+@pytest.fixture(scope="session")
+def backtest_store(tmp_path_factory):
+    """Pad naar een SQLite-opslag met uurprijzen (piek 's avonds) en gearchiveerde instraling."""
+    path = str(tmp_path_factory.mktemp("bt") / "store.sqlite")
+    tz = ZoneInfo(BACKTEST_CFG["timezone"])
+    prices, radiation = PriceStore(path), RadiationStore(path)
+    for d in range(BACKTEST_DAYS):
+        day = BACKTEST_FIRST + timedelta(days=d)
+        start = datetime(day.year, day.month, day.day, tzinfo=tz)
+        hours = [start + timedelta(hours=h) for h in range(25)]
+        radiation.archive(location_key(BACKTEST_CFG), [int(t.timestamp()) for t in hours[:24]],
+                          [max(0.0, 800.0 * math.sin(math.pi * (h - 6) / 15)) for h in range(24)])
+        if d == 3:
+            continue
+        prices.put_day(day, [
+            {"start": hours[h], "end": hours[h + 1],
+             "price": 0.12 + 0.1 * math.sin(2 * math.pi * (h - 12 + d) / 24) + 0.01 * (h % 3)}
+            for h in range(24)
+        ])
+    return path
+
+
+@pytest.fixture
+def isolated_services(tmp_path, monkeypatch):
+    """Endpoints, stores en caches van services per test; set_endpoints wijzigt dus alleen kopieën."""
+    path = str(tmp_path / "store.sqlite")
+    monkeypatch.setattr(services, "FE_GRAPHQL_ENDPOINTS", list(services.FE_GRAPHQL_ENDPOINTS))
+    monkeypatch.setattr(services, "OM_FORECAST_URL", services.OM_FORECAST_URL)
+    monkeypatch.setattr(services, "OM_ARCHIVE_URL", services.OM_ARCHIVE_URL)
+    monkeypatch.setattr(services, "_endpoint_health", {})
+    monkeypatch.setattr(services, "_radiation_mem", {})
+    monkeypatch.setattr(services, "_price_store", PriceStore(path))
+    monkeypatch.setattr(services, "_radiation_store", RadiationStore(path))
+    monkeypatch.setattr(services, "_soc_store", SocStore(path))
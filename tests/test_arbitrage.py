@@ -0,0 +1,71 @@
+from itertools import combinations
+
+import numpy as np
+import pytest
+
+from arbitrage import _buy_sell, best_pair, top_k_pairs
+from config import DEFAULTS
+
+CFG = {**DEFAULTS, "charge_eff": 0.9, "discharge_eff": 0.95}
+
+
+def _prices(seed, n):
+    rng = np.random.default_rng(seed)
+    price = np.round(rng.uniform(-0.05, 0.4, n), 3)
+    price[rng.random(n) < 0.1] = np.nan
+    return price
+
+
+def _brute_best(price):
+    buy, sell = _buy_sell(price, CFG)
+    best = max((sell[j] - buy[i] for i, j in combinations(range(len(price)), 2)), default=-np.inf)
+    return best if best > 0 else None
+
+
+def _brute_top_k(price, k):
+    """Hoogste totale marge over ≤ k cycli i₁ < j₁ < i₂ < j₂ … (alle deelverzamelingen van tijdstippen)."""
+    buy, sell = _buy_sell(price, CFG)
+    n = len(price)
+    best = 0.0
+    for m in range(1, k + 1):
+        for idx in combinations(range(n), 2 * m):
+            total = sum(sell[idx[2 * c + 1]] - buy[idx[2 * c]] for c in range(m))
+            best = max(best, total)
+    return best
+
+
+@pytest.mark.parametrize("seed", range(30))
+def test_best_pair_matches_brute_force(seed):
+    price = _prices(seed, 12)
+    expect = _brute_best(price)
+    got = best_pair(price, CFG)
+    if expect is None:
+        assert got is None
+        return
+    i, j, margin = got
+    buy, sell = _buy_sell(price, CFG)
+    assert i < j
+    assert margin == pytest.approx(expect)
+    assert sell[j] - buy[i] == pytest.approx(expect)
+
+
+@pytest.mark.parametrize("seed", range(30))
+@pytest.mark.parametrize("k", (1, 2, 3))
+def test_top_k_pairs_matches_brute_force(seed, k):
+    price = _prices(seed, 9)
+    pairs = top_k_pairs(price, CFG, k)
+    buy, sell = _buy_sell(price, CFG)
+
+    assert len(pairs) <= k
+    times = [t for i, j, _ in pairs for t in (i, j)]
+    assert times == sorted(times) and len(set(times)) == len(times)     # niet-overlappend, op volgorde
+    for i, j, margin in pairs:
+        assert margin == pytest.approx(sell[j] - buy[i])
+    assert sum(m for _, _, m in pairs) == pytest.approx(_brute_top_k(price, k))
+
+
+def test_no_profit_without_spread():
+    flat = np.full(24, 0.2)
+    assert best_pair(flat, CFG) is None
+    assert top_k_pairs(flat, CFG, 3) == []
+    assert best_pair(np.array([0.1]), CFG) is None
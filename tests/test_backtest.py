@@ -0,0 +1,59 @@
+import json
+from datetime import timedelta
+
+import pytest
+
+from backtest import backtest_rows, parse_variant, run_backtest
+from conftest import BACKTEST_CFG as CFG, BACKTEST_DAYS as DAYS, BACKTEST_FIRST as FIRST
+
+
+def _run(backtest_store, tmp_path, **kw):
+    out = tmp_path / f"bt_{len(list(tmp_path.iterdir()))}.jsonl"
+    summary = run_backtest(CFG, FIRST, FIRST + timedelta(days=DAYS - 1), str(out),
+                           variants=[("base", {}), ("klein", {"battery_kwh": 5.0})], store_path=backtest_store, **kw)
+    rows = [json.loads(line) for line in out.read_text(encoding="utf-8").splitlines()]
+    return summary, rows
+
+
+def test_rows_and_summary(backtest_store, tmp_path):
+    summary, rows = _run(backtest_store, tmp_path, workers=1)
+    assert len(rows) == 2 * DAYS
+    skipped = [r for r in rows if "note" in r]
+    assert {r["date"] for r in skipped} == {(FIRST + timedelta(days=3)).isoformat()}
+    for name in ("base", "klein"):
+        assert summary[name]["days"] == DAYS - 1 and summary[name]["skipped"] == 1
+        mine = [r for r in rows if r["variant"] == name and "note" not in r]
+        assert summary[name]["sim_profit_eur"] == pytest.approx(sum(r["sim_profit_eur"] for r in mine), abs=0.011)
+    assert summary["base"]["sim_profit_eur"] != summary["klein"]["sim_profit_eur"]
+
+
+def test_summary_independent_of_workers(backtest_store, tmp_path):
+    one, _ = _run(backtest_store, tmp_path, workers=1)
+    many, rows = _run(backtest_store, tmp_path, workers=4)
+    assert many == one
+    assert len(rows) == 2 * DAYS
+
+
+def test_soc_carries_over_every_day(backtest_store, tmp_path):
+    _, rows = _run(backtest_store, tmp_path, workers=4)
+    for name in ("base", "klein"):
+        mine = [r for r in rows if r["variant"] == name]
+        assert [r["date"] for r in mine] == sorted(r["date"] for r in mine)     # per variant in datumvolgorde
+        assert mine[0]["start_soc"] == CFG.get("backtest_start_soc", CFG["min_soc_reserve"])
+        soc = mine[0]["start_soc"]
+        for r in mine:
+            assert r["start_soc"] == soc
+            soc = r.get("sim_end_soc", soc)                 # dag zonder prijzen: SOC blijft staan
+
+
+def test_rows_stream_per_day(backtest_store):
+    rows = backtest_rows(CFG, [FIRST + timedelta(days=d) for d in range(DAYS)], workers=1, store_path=backtest_store)
+    first = next(rows)
+    assert first["date"] == FIRST.isoformat() and first["variant"] == "base"
+    rows.close()                                            # vroegtijdig stoppen blijft niet hangen
+
+
+def test_parse_variant():
+    assert parse_variant("klein:battery_kwh=30,inverter_charge_kw=6") == (
+        "klein", {"battery_kwh": 30.0, "inverter_charge_kw": 6.0})
+    assert parse_variant("base") == ("base", {})
@@ -0,0 +1,70 @@
+import json
+
+import bench
+
+
+def _result(us, peak=1000):
+    return {"us_per_call": us, "items_per_s": 1.0, "peak_bytes": peak, "net_bytes": 0}
+
+
+def test_all_cases_run():
+    cases = bench.build_cases()
+    assert len({name for name, _, _ in cases}) == len(cases)
+    for _, fn, items in cases:
+        fn()
+        assert items >= 1
+
+
+def test_compare():
+    baseline = {"a": _result(10.0), "b": _result(10.0)}
+    assert bench.compare({"a": _result(12.0), "b": _result(10.0, peak=1000 + bench._ALLOC_SLACK_BYTES)}, baseline, 0.25) == []
+    bad = bench.compare({"a": _result(13.0), "b": _result(10.0, peak=5000 + bench._ALLOC_SLACK_BYTES)}, baseline, 0.25)
+    assert [name for name, _ in bad] == ["a", "b"]
+    assert bench.compare({"new": _result(99.0)}, baseline, 0.25) == []
+
+
+def test_main_save_then_check(tmp_path):
+    path = str(tmp_path / "baseline.json")
+    args = ["-k", "tilt_factor", "--repeat", "1", "--min-time", "0.001", "--baseline", path]
+    assert bench.main(args + ["--save"]) == 0
+    with open(path, encoding="utf-8") as f:
+        saved = json.load(f)
+    assert list(saved["results"]) == ["tilt_factor"]
+
+    # Baseline 1000× sneller maken: de volgende run is een regressie
+    saved["results"]["tilt_factor"]["us_per_call"] /= 1000.0
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(saved, f)
+    assert bench.main(args) == 1
+
+
+def test_main_without_baseline(tmp_path):
+    args = ["-k", "tilt_factor", "--repeat", "1", "--min-time", "0.001", "--baseline", str(tmp_path / "geen.json")]
+    assert bench.main(args) == 2
+    assert bench.main(args + ["--allow-missing-baseline"]) == 0
+
+
+def test_save_replaces_stale_entries(tmp_path):
+    path = tmp_path / "baseline.json"
+    path.write_text(json.dumps({"results": {"tilt_factor": _result(1e-3), "verdwenen/case": _result(1.0),
+                                            "linear_interp": _result(1.0)}}), encoding="utf-8")
+    args = ["-k", "tilt_factor", "--repeat", "1", "--min-time", "0.001", "--baseline", str(path)]
+    assert bench.main(args + ["--save"]) == 0
+    saved = json.loads(path.read_text(encoding="utf-8"))
+    assert list(saved["results"]) == ["tilt_factor"] and saved["machine"] == bench.machine_id()
+    assert saved["results"]["tilt_factor"]["us_per_call"] > 1e-3
+
+
+def test_save_if_missing_then_compare(tmp_path):
+    path = tmp_path / "sub" / "baseline.json"
+    args = ["-k", "tilt_factor", "--repeat", "1", "--min-time", "0.001", "--baseline", str(path), "--save-if-missing"]
+    assert bench.main(args) == 0
+    first = json.loads(path.read_text(encoding="utf-8"))
+    assert list(first["results"]) == ["tilt_factor"]
+    assert bench.main(args + ["--tolerance", "1000"]) == 0
+    assert json.loads(path.read_text(encoding="utf-8")) == first          # bestaande baseline blijft staan
+
+
+def test_default_baseline_is_per_machine():
+    path = bench.default_baseline_path()
+    assert path.startswith(bench.BASELINE_DIR) and bench.machine_id() in path
@@ -0,0 +1,84 @@
+import json
+
+import pytest
+
+import config
+from config import DEFAULTS, compiled
+from utils import ORIENTATIONS, TILT_TABLE, linear_interp, tilt_factor
+
+
+def test_derived_constants():
+    pc = compiled(dict(DEFAULTS))
+    pr = DEFAULTS["pr_base"] * ORIENTATIONS[DEFAULTS["orientation_choice"]]["factor"] * tilt_factor(DEFAULTS["tilt_deg"])
+    assert pc.pr_eff == pytest.approx(pr)
+    assert pc.kwh_per_wm2h == pytest.approx(DEFAULTS["kwp"] * pr / 1000.0)
+    assert pc.pct_per_kwh == pytest.approx(100.0 / DEFAULTS["battery_kwh"])
+    assert pc.charge_pct_per_h == pytest.approx(
+        DEFAULTS["inverter_charge_kw"] * DEFAULTS["roundtrip_eff"] * 100.0 / DEFAULTS["battery_kwh"])
+
+
+def test_discharge_defaults_to_charge_power():
+    cfg = {k: v for k, v in DEFAULTS.items() if k != "inverter_discharge_kw"}
+    cfg["inverter_charge_kw"] = 7.0
+    assert compiled(cfg).inverter_discharge_kw == 7.0
+
+
+@pytest.mark.parametrize("key, value, fragment", [
+    ("battery_kwh", 0, "battery_kwh"),
+    ("battery_kwh", "veel", "geen getal"),
+    ("lat", 91, "buiten bereik"),
+    ("min_soc_reserve", -1, "min_soc_reserve"),
+    ("charge_eff", 0.0, "charge_eff"),
+    ("orientation_choice", 99, "orientation_choice"),
+    ("planner_mode", "greedy", "planner_mode"),
+    ("tilt_deg", [18], "tilt_deg"),           # onhashbaar: omzeilt de cache, toch een nette fout
+])
+def test_validation_names_the_field(key, value, fragment):
+    with pytest.raises(ValueError, match=fragment):
+        compiled({**DEFAULTS, key: value})
+
+
+def test_immutable_and_passthrough():
+    pc = compiled(dict(DEFAULTS))
+    with pytest.raises(AttributeError):
+        pc.battery_kwh = 1.0
+    assert compiled(pc) is pc
+
+
+def test_cached_by_content():
+    cfg = dict(DEFAULTS)
+    pc = compiled(cfg)
+    assert compiled(dict(cfg)) is pc                # kopie deelt de compilatie
+    assert compiled({**cfg, "solis_enabled": True}) is pc   # niet-plannervelden tellen niet mee
+    cfg["battery_kwh"] = 20.0                       # ter plekke gewijzigd: opnieuw compileren
+    assert compiled(cfg) is not pc and compiled(cfg).battery_kwh == 20.0
+
+
+def test_cache_is_bounded():
+    for kwh in range(1, 3 * config._COMPILED_MAX):
+        compiled({**DEFAULTS, "battery_kwh": float(kwh)})
+    assert len(config._compiled) <= config._COMPILED_MAX
+
+
+def test_save_config_validates_before_writing(tmp_path, monkeypatch):
+    path = tmp_path / "cfg.json"
+    monkeypatch.setattr(config, "CONFIG_PATH", str(path))
+    config.save_config({**DEFAULTS, "battery_kwh": 30.0})
+    assert json.loads(path.read_text(encoding="utf-8"))["battery_kwh"] == 30.0
+    with pytest.raises(ValueError, match="kwp"):
+        config.save_config({**DEFAULTS, "kwp": -1})
+    assert json.loads(path.read_text(encoding="utf-8"))["battery_kwh"] == 30.0
+
+
+def test_load_tolerates_invalid_values(tmp_path, monkeypatch):
+    path = tmp_path / "cfg.json"
+    path.write_text(json.dumps({**DEFAULTS, "battery_kwh": 0}), encoding="utf-8")
+    monkeypatch.setattr(config, "CONFIG_PATH", str(path))
+    assert config.load_or_create_config()["battery_kwh"] == 0
+
+
+def test_linear_interp_accepts_unsorted_table():
+    shuffled = list(reversed(TILT_TABLE))
+    for x in (-5, 0, 7, 18, 33, 90, 120):
+        assert linear_interp(x, shuffled) == linear_interp(x, TILT_TABLE)
+    assert linear_interp(5, [(10, 1.0), (0, 0.0)]) == 0.5
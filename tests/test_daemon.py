@@ -0,0 +1,131 @@
+import asyncio
+import json
+from datetime import datetime, time as dtime, timedelta
+from zoneinfo import ZoneInfo
+
+import pytest
+
+import daemon
+from config import DEFAULTS
+from daemon import DaemonState, PlannerDaemon, summarize_result
+from services import PricesNotPublished
+
+TZ = ZoneInfo("Europe/Amsterdam")
+NOW = datetime(2025, 6, 2, 14, 7, tzinfo=TZ)
+
+
+def _result(soc_values=(50.0, 60.0, 40.0)):
+    t0 = datetime(2025, 6, 2, 0, 0, tzinfo=TZ)
+    return {
+        "cheap_start": t0 + timedelta(hours=3), "cheap_end": t0 + timedelta(hours=4), "cheap_price": 0.05,
+        "exp_start": t0 + timedelta(hours=19), "exp_end": t0 + timedelta(hours=20), "exp_price": 0.3,
+        "add_pct": 10.0, "target_soc_after_charge": 60.0,
+        "series": {"soc_times": [t0 + timedelta(hours=h) for h in range(len(soc_values))], "soc_values": list(soc_values)},
+    }
+
+
+@pytest.fixture
+def fake_planning(monkeypatch):
+    """plan_day en de prijscheck vervangen; retourneert de lijst met aanroepen."""
+    calls = []
+    state = {"tomorrow": [], "fail": False}
+
+    async def plan_day(cfg, choice, soc, hhmm, record_planned=False):
+        assert record_planned                       # daemon bewaart de geplande curve voor de historie
+        calls.append((choice, soc, hhmm))
+        if state["fail"]:
+            raise RuntimeError("upstream weg")
+        return _result()
+
+    async def prices(which, tz):
+        if isinstance(state["tomorrow"], Exception):
+            raise state["tomorrow"]
+        return state["tomorrow"]
+
+    monkeypatch.setattr(daemon, "plan_day", plan_day)
+    monkeypatch.setattr(daemon, "get_frank_day_local", prices)
+    return calls, state
+
+
+def test_summarize_result():
+    out = summarize_result(_result())
+    assert out["cheap_start"] == "2025-06-02T03:00:00+02:00" and out["target_soc_after_charge"] == 60.0
+    json.dumps(out)
+    assert summarize_result({"note": "geen prijzen"}) == {"note": "geen prijzen"}
+
+
+def test_state_is_bounded_and_tracks_curve():
+    state = DaemonState(history_len=3)
+    for i in range(5):
+        state.record("today", 40.0 + i, _result())
+    assert state.runs == 5 and len(state.history) == 3
+    assert state.history[-1]["soc"] == 44.0
+    assert state.soc_at(datetime(2025, 6, 2, 1, 30, tzinfo=TZ)) == 60.0
+    assert state.soc_at(datetime(2025, 6, 1, 23, 0, tzinfo=TZ)) is None
+    assert state.end_of_day_soc() == 40.0
+
+
+def test_next_tick_is_wall_clock_aligned():
+    d = PlannerDaemon(dict(DEFAULTS), interval_min=15)
+    ts = NOW.timestamp()
+    assert d._next_tick(ts) == datetime(2025, 6, 2, 14, 15, tzinfo=TZ).timestamp()
+    assert d._next_tick(datetime(2025, 6, 2, 14, 15, tzinfo=TZ).timestamp()) == datetime(2025, 6, 2, 14, 30, tzinfo=TZ).timestamp()
+
+
+def test_tomorrow_planned_once_when_published(fake_planning):
+    calls, state = fake_planning
+    d = PlannerDaemon(dict(DEFAULTS), tomorrow_from=dtime(13, 0))
+    assert not asyncio.run(d.check_tomorrow(NOW.replace(hour=12)))          # te vroeg: niet eens kijken
+    assert not asyncio.run(d.check_tomorrow(NOW))                            # nog niet gepubliceerd
+    state["tomorrow"] = [{"price": 0.1}]
+    assert asyncio.run(d.check_tomorrow(NOW))
+    assert not asyncio.run(d.check_tomorrow(NOW + timedelta(minutes=5)))     # al gepland voor deze datum
+    assert calls == [("M", d.fallback_soc, "00:00")]
+    assert d.state.tomorrow_date == (NOW + timedelta(days=1)).date()
+
+
+def test_unpublished_tomorrow_is_not_an_error(fake_planning):
+    calls, state = fake_planning
+    d = PlannerDaemon(dict(DEFAULTS), tomorrow_from=dtime(13, 0))
+    state["tomorrow"] = PricesNotPublished("leeg")
+    assert not asyncio.run(d.check_tomorrow(NOW))
+    assert d.state.errors == 0
+    state["tomorrow"] = RuntimeError("alle endpoints weg")
+    assert not asyncio.run(d.check_tomorrow(NOW))
+    assert d.state.errors == 1 and calls == []
+
+
+def test_tick_survives_errors_and_writes_snapshot(fake_planning, tmp_path):
+    calls, state = fake_planning
+    out = str(tmp_path / "advice.json")
+    d = PlannerDaemon({**DEFAULTS, "solis_enabled": False}, fallback_soc=42.0, out_path=out,
+                      tomorrow_from=dtime(23, 59, 59))
+    state["fail"] = True
+    asyncio.run(d.tick())
+    assert d.state.errors == 1 and d.state.runs == 0
+    state["fail"] = False
+    asyncio.run(d.tick())
+    assert calls[-1] == ("V", 42.0, None)
+    with open(out, encoding="utf-8") as f:
+        snap = json.load(f)
+    assert snap["runs"] == 1 and snap["errors"] == 1 and snap["today"]["exp_price"] == 0.3
+
+
+def test_replan_today_only_on_drift_with_telemetry(monkeypatch):
+    import telemetry
+
+    ring = telemetry.SocRing()
+    monkeypatch.setattr(telemetry, "_soc_ring", ring)
+    d = PlannerDaemon({**DEFAULTS, "replan_drift_pct": 5.0})
+    now = datetime(2025, 6, 2, 1, 30, tzinfo=TZ)
+    assert d.should_replan_today(now)                   # geen telemetrie: elke ronde
+
+    d.poller = object()
+    d.state.record("today", 50.0, _result())
+    d.state.today_date = now.date()
+    assert not d.should_replan_today(now)               # nog geen meting
+    ring.append(now.timestamp(), 52.0)                  # gepland 50: binnen de marge
+    assert not d.should_replan_today(now)
+    ring.append(now.timestamp() + 60, 42.0)
+    assert d.should_replan_today(now)
+    assert d.should_replan_today(now + timedelta(days=1))
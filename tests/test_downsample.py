@@ -0,0 +1,58 @@
+import numpy as np
+import pytest
+
+from downsample import lttb, minmax, visible
+
+
+def _series(seed, n=5000):
+    rng = np.random.default_rng(seed)
+    x = np.cumsum(rng.uniform(0.5, 1.5, n))
+    y = np.cumsum(rng.normal(0.0, 1.0, n))
+    return x, y
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("buckets", (1, 7, 100, 999))
+def test_minmax_keeps_extremes_per_bucket(seed, buckets):
+    x, y = _series(seed)
+    xs, ys = minmax(x, y, buckets)
+    assert len(xs) <= 2 * buckets
+    assert np.all(np.diff(xs) >= 0)                       # tijdsvolgorde
+    assert ys.max() == y.max() and ys.min() == y.min()    # pieken en dalen blijven
+    # Elk gekozen punt is een echt punt van de reeks
+    idx = np.searchsorted(x, xs)
+    assert np.array_equal(x[idx], xs) and np.array_equal(y[idx], ys)
+
+
+def test_minmax_ignores_nan_and_short_input():
+    x = np.arange(10.0)
+    y = np.array([1, np.nan, 5, 2, np.nan, -3, 4, 0, 1, 2], dtype=float)
+    xs, ys = minmax(x, y, 2)
+    assert 5.0 in ys and -3.0 in ys
+    assert minmax(x, y, 5)[0] is x                         # niets te decimeren
+
+
+@pytest.mark.parametrize("seed", range(5))
+@pytest.mark.parametrize("n_out", (3, 50, 400))
+def test_lttb_keeps_endpoints(seed, n_out):
+    x, y = _series(seed)
+    xs, ys = lttb(x, y, n_out)
+    assert len(xs) == n_out
+    assert xs[0] == x[0] and xs[-1] == x[-1]
+    assert ys[0] == y[0] and ys[-1] == y[-1]
+    assert np.all(np.diff(xs) > 0)
+    idx = np.searchsorted(x, xs)
+    assert np.array_equal(y[idx], ys)
+
+
+def test_lttb_keeps_isolated_spike():
+    x = np.arange(1000.0)
+    y = np.zeros(1000)
+    y[537] = 50.0
+    assert 50.0 in lttb(x, y, 40)[1]
+
+
+def test_visible_pads_one_neighbour():
+    x = np.arange(10.0)
+    xs, ys = visible(x, x * 2, 3.5, 6.0)
+    assert xs.tolist() == [3.0, 4.0, 5.0, 6.0, 7.0]
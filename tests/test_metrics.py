@@ -0,0 +1,88 @@
+import asyncio
+import json
+import urllib.request
+
+import pytest
+
+import metrics
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    reg = metrics.Registry()
+    monkeypatch.setattr(metrics, "_registry", reg)
+    monkeypatch.setattr(metrics, "_enabled", True)
+    return reg
+
+
+def test_disabled_is_noop(monkeypatch):
+    reg = metrics.Registry()
+    monkeypatch.setattr(metrics, "_registry", reg)
+    monkeypatch.setattr(metrics, "_enabled", False)
+    assert metrics.span("x") is metrics._NOOP
+    with metrics.span("x"):
+        metrics.inc("c")
+        metrics.observe("h", 1.0)
+    assert reg.snapshot()["counters"] == [] and reg.snapshot()["histograms"] == []
+
+
+def test_histogram_buckets_are_upper_inclusive():
+    h = metrics.Histogram(bounds=(0.1, 1.0))
+    for v in (0.05, 0.1, 0.5, 1.0, 3.0):
+        h.observe(v)
+    assert h.counts == [2, 2, 1] and h.cumulative() == [2, 4, 5]
+    assert h.sum == pytest.approx(4.65) and h.count == 5
+
+
+def test_span_outcomes(registry):
+    with metrics.span("stage_seconds", stage="plan"):
+        pass
+    with pytest.raises(ValueError):
+        with metrics.span("stage_seconds", stage="plan"):
+            raise ValueError
+
+    async def cancelled():
+        async def inner():
+            with metrics.span("stage_seconds", stage="plan"):
+                await asyncio.sleep(10)
+        task = asyncio.create_task(inner())
+        await asyncio.sleep(0)
+        task.cancel()
+        await asyncio.gather(task, return_exceptions=True)
+
+    asyncio.run(cancelled())
+    outcomes = sorted(h["labels"]["outcome"] for h in metrics.snapshot()["histograms"])
+    assert outcomes == ["cancelled", "error", "ok"]
+
+
+def test_prometheus_text(registry):
+    metrics.inc("cache_requests_total", cache="prices", result="hit")
+    metrics.inc("cache_requests_total", 2, cache="prices", result="hit")
+    metrics.observe("upstream_request_seconds", 0.2, endpoint='http://x/"q"')
+    lines = metrics.prometheus_text().splitlines()
+    assert "# TYPE chargemind_cache_requests_total counter" in lines
+    assert 'chargemind_cache_requests_total{cache="prices",result="hit"} 3' in lines
+    assert "# TYPE chargemind_upstream_request_seconds histogram" in lines
+    assert 'chargemind_upstream_request_seconds_bucket{endpoint="http://x/\\"q\\"",le="0.1"} 0' in lines
+    assert 'chargemind_upstream_request_seconds_bucket{endpoint="http://x/\\"q\\"",le="0.25"} 1' in lines
+    assert 'chargemind_upstream_request_seconds_bucket{endpoint="http://x/\\"q\\"",le="+Inf"} 1' in lines
+    assert 'chargemind_upstream_request_seconds_count{endpoint="http://x/\\"q\\""} 1' in lines
+
+
+def test_write_and_serve(registry, tmp_path):
+    metrics.inc("runs_total")
+    metrics.write(str(tmp_path / "m.json"))
+    metrics.write(str(tmp_path / "m.prom"))
+    assert json.loads((tmp_path / "m.json").read_text())["counters"][0]["value"] == 1
+    assert (tmp_path / "m.prom").read_text() == metrics.prometheus_text()
+
+    server = metrics.serve(0)
+    try:
+        base = f"http://127.0.0.1:{server.server_address[1]}"
+        with urllib.request.urlopen(base + "/metrics") as r:
+            assert r.read().decode() == metrics.prometheus_text()
+        with urllib.request.urlopen(base + "/metrics.json") as r:
+            assert json.loads(r.read())["counters"][0]["name"] == "runs_total"
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,72 @@
+import asyncio
+from datetime import date, datetime, timedelta
+from zoneinfo import ZoneInfo
+
+import pytest
+
+import services
+from config import DEFAULTS
+from mock_upstream import Fault, MockUpstream, synthetic_prices, synthetic_radiation
+from planner import plan_day
+
+TZ = ZoneInfo("Europe/Amsterdam")
+
+
+@pytest.fixture
+def upstream(isolated_services):
+    servers = []
+
+    def start(**kw):
+        mock = MockUpstream(**kw)
+        mock.start()
+        mock.install()
+        servers.append(mock)
+        return mock
+
+    yield start
+    for mock in servers:
+        mock.stop()
+
+
+def test_synthetic_data_is_deterministic_and_covers_the_day():
+    dst = date(2025, 3, 30)
+    assert len(synthetic_prices(dst, TZ)) == 23
+    quarters = synthetic_prices(date(2025, 6, 2), TZ, step=900)
+    assert len(quarters) == 96 and quarters[0]["start"] == datetime(2025, 6, 2, tzinfo=TZ)
+    assert synthetic_prices(date(2025, 6, 2), TZ) == synthetic_prices(date(2025, 6, 2), TZ)
+    rad = synthetic_radiation(date(2025, 6, 2), 2)
+    assert len(rad) == 48 and rad[0] == 0.0 and max(rad) > 0
+
+
+def test_plan_day_end_to_end(upstream):
+    mock = upstream(fe_faults=[Fault(), Fault()])
+    result = asyncio.run(plan_day(dict(DEFAULTS), "M", 50.0, "00:00"))
+    assert "note" not in result and result["cheap_price"] <= result["exp_price"]
+    assert mock.stats["fe_requests"] >= 1 and mock.stats["om_requests"] >= 1
+
+
+def test_planned_curve_recorded_only_on_request(upstream):
+    upstream()
+    asyncio.run(plan_day(dict(DEFAULTS), "M", 50.0, "00:00"))
+    assert services.soc_store().history("planned", 0, 2 ** 40) == ([], [])
+    result = asyncio.run(plan_day(dict(DEFAULTS), "M", 50.0, "00:00", record_planned=True))
+    ts, values = services.soc_store().history("planned", 0, 2 ** 40)
+    assert values == result["series"]["soc_values"]
+
+
+def test_failing_endpoint_is_overtaken(upstream):
+    mock = upstream(fe_faults=[Fault(error_rate=1.0), Fault(latency_s=0.01)])
+    day = date.today() + timedelta(days=1)
+    blocks = asyncio.run(services.fetch_graphql_day(day.isoformat(), (day + timedelta(days=1)).isoformat(), TZ))
+    assert len(blocks) >= 23 and mock.stats["errors"] == 1
+    bad, good = mock.endpoints()["fe_graphql"]
+    assert services.endpoint_order() == [good, bad]
+
+
+def test_tomorrow_unpublished_before_publish_hour(upstream):
+    upstream(publish_hour=24)                       # morgen nooit gepubliceerd
+    day = datetime.now(TZ).date()
+    tomorrow = day + timedelta(days=1)
+    assert asyncio.run(services.fetch_graphql_day(day.isoformat(), tomorrow.isoformat(), TZ))
+    with pytest.raises(services.PricesNotPublished):
+        asyncio.run(services.fetch_graphql_day(tomorrow.isoformat(), (tomorrow + timedelta(days=1)).isoformat(), TZ))
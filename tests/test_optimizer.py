@@ -0,0 +1,84 @@
+import numpy as np
+import pytest
+
+from config import DEFAULTS
+from optimizer import action_windows, optimize_soc
+
+STEP = 10.0     # grof raster (11 punten) zodat alle paden uit te proberen zijn
+
+
+def _cfg(**over):
+    return {**DEFAULTS, "battery_kwh": 10.0, "charge_eff": 0.9, "discharge_eff": 0.95, "min_soc_reserve": 20.0, **over}
+
+
+def _brute(price, pv_pct, max_ch, max_dis, soc0, cfg):
+    """Alle toegestane paden over het raster; hoogste opbrengst (zelfde regels als optimize_soc, zonder tie-straf)."""
+    n = int(round(100.0 / STEP)) + 1
+    grid = np.linspace(0.0, 100.0, n)
+    reserve_idx = min(n - 1, int(np.searchsorted(grid, cfg["min_soc_reserve"] - 1e-9)))
+    buy_per_pct = cfg["battery_kwh"] / 100.0 / cfg["charge_eff"]
+    sell_per_pct = cfg["battery_kwh"] / 100.0 * cfg["discharge_eff"]
+    pv_steps = np.rint(np.asarray(pv_pct) / STEP).astype(int)
+    kc = int(np.floor((max_ch + 1e-9) / STEP))
+    kd = int(np.floor((max_dis + 1e-9) / STEP))
+
+    def best(t, k):
+        if t == len(price):
+            return 0.0
+        a = min(n - 1, k + pv_steps[t])
+        p = 0.0 if np.isnan(price[t]) else price[t]
+        up, down = (0, 0) if np.isnan(price[t]) else (kc, kd)
+        out = -np.inf
+        for b in range(a, min(n - 1, a + up) + 1):
+            out = max(out, -(grid[b] - grid[a]) * buy_per_pct * p + best(t + 1, b))
+        for b in range(min(a, max(a - down, reserve_idx)), a):
+            out = max(out, (grid[a] - grid[b]) * sell_per_pct * p + best(t + 1, b))
+        return out
+
+    return best(0, int(np.clip(np.rint(soc0 / STEP), 0, n - 1)))
+
+
+@pytest.mark.parametrize("seed", range(40))
+def test_matches_brute_force(seed):
+    rng = np.random.default_rng(seed)
+    T = int(rng.integers(1, 6))
+    price = rng.uniform(-0.05, 0.4, T)
+    price[rng.random(T) < 0.15] = np.nan
+    pv = np.where(rng.random(T) < 0.4, rng.uniform(0.0, 25.0, T), 0.0)
+    max_ch, max_dis = float(rng.choice([10.0, 20.0, 30.0])), float(rng.choice([10.0, 20.0, 40.0]))
+    soc0 = float(rng.uniform(0.0, 100.0))
+    cfg = _cfg()
+
+    sched = optimize_soc(price, pv, max_ch, max_dis, soc0, cfg, soc_step_pct=STEP)
+    assert sched.profit_eur == pytest.approx(_brute(price, pv, max_ch, max_dis, soc0, cfg), abs=1e-6)
+
+
+def test_schedule_respects_limits():
+    rng = np.random.default_rng(7)
+    T = 48
+    price = rng.uniform(0.0, 0.4, T)
+    pv = np.where(np.arange(T) % 24 > 8, 6.0, 0.0)
+    cfg = _cfg()
+    sched = optimize_soc(price, pv, 15.0, 12.5, 50.0, cfg, soc_step_pct=2.5)
+    assert np.all(sched.charge_pct <= 15.0 + 1e-9)
+    assert np.all(sched.discharge_pct <= 12.5 + 1e-9)
+    assert np.all((sched.charge_pct == 0) | (sched.discharge_pct == 0))
+    assert np.all(sched.soc >= 0.0) and np.all(sched.soc <= 100.0)
+    # Traject sluit: SOC na een slot = ervoor + PV + laden − ontladen
+    steps = sched.pv_pct + sched.charge_pct - sched.discharge_pct
+    assert np.allclose(sched.soc[1:], sched.soc[:-1] + steps)
+    # Ontladen eindigt nooit onder de reserve
+    after = sched.soc[1:][sched.discharge_pct > 0]
+    assert np.all(after >= cfg["min_soc_reserve"] - 1e-9)
+
+
+def test_flat_price_from_reserve_does_nothing():
+    sched = optimize_soc(np.full(24, 0.2), 0.0, 20.0, 20.0, 20.0, _cfg(), soc_step_pct=5.0)
+    assert sched.profit_eur == 0.0
+    assert not sched.charge_pct.any() and not sched.discharge_pct.any()
+
+
+def test_action_windows():
+    ch = np.array([0, 5, 5, 0, 0, 0, 3])
+    dis = np.array([0, 0, 0, 4, 4, 0, 0])
+    assert action_windows(ch, dis) == [("charge", 1, 3), ("discharge", 3, 5), ("charge", 6, 7)]
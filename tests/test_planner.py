@@ -0,0 +1,70 @@
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+import numpy as np
+import pytest
+
+from config import DEFAULTS
+from planner import PvSurplus, plan, predict_soc_gain, pv_kwh_from_radiation, soc_curve
+from series import PriceSeries
+from series import RadiationSeries
+
+TZ = ZoneInfo("Europe/Amsterdam")
+DAY = datetime(2025, 6, 2, tzinfo=TZ)
+T0 = int(DAY.timestamp())
+
+
+def _cfg(**over):
+    return {**DEFAULTS, "kwp": 8.0, "battery_kwh": 10.0, "house_load_kw": 0.4, **over}
+
+
+def _reference_gain(now_soc_pct, radiation, start_dt, end_dt, cfg):
+    """De oorspronkelijke lus per instralingsslot (deelslots naar rato, cap op 100% per stap)."""
+    soc_gain_pct = 0.0
+    s_ts, e_ts = start_dt.timestamp(), end_dt.timestamp()
+    view = radiation.slice(start_dt, end_dt)
+    for slot_start, sw in zip(view.t.tolist(), view.v.tolist()):
+        seg_start = max(s_ts, slot_start)
+        seg_end = min(e_ts, slot_start + view.step)
+        if seg_end > seg_start:
+            dur_h = (seg_end - seg_start) / 3600.0
+            surplus = max(0.0, pv_kwh_from_radiation(sw, dur_h, cfg) - cfg["house_load_kw"] * dur_h)
+            gain_pct = min(surplus / cfg["battery_kwh"] * 100.0, max(0.0, 100.0 - (now_soc_pct + soc_gain_pct)))
+            soc_gain_pct += gain_pct
+    return soc_gain_pct
+
+
+def test_pv_surplus_matches_reference_loop():
+    rng = np.random.default_rng(6)
+    cfg = _cfg()
+    radiation = RadiationSeries(T0 + 3600 * np.arange(48), rng.uniform(0.0, 900.0, 48) * (rng.random(48) > 0.3), 3600, TZ)
+    pv = PvSurplus(radiation, cfg)
+    for _ in range(300):
+        a, b = sorted(rng.uniform(-3 * 3600, 51 * 3600, 2))      # ook deels buiten de reeks
+        start, end = DAY + timedelta(seconds=float(a)), DAY + timedelta(seconds=float(b))
+        soc = float(rng.uniform(0.0, 100.0))
+        expected = _reference_gain(soc, radiation, start, end, cfg)
+        assert pv.gain(soc, start, end) == pytest.approx(expected, abs=1e-9)
+        assert predict_soc_gain(soc, radiation, start, end, cfg) == pytest.approx(expected, abs=1e-9)
+
+
+def test_pv_surplus_edges():
+    radiation = RadiationSeries(T0 + 3600 * np.arange(3), [800.0, 800.0, 800.0], 3600, TZ)
+    pv = PvSurplus(radiation, _cfg())
+    assert pv.raw_gain(DAY + timedelta(hours=2), DAY + timedelta(hours=1)) == 0.0
+    half = pv.raw_gain(DAY, DAY + timedelta(minutes=30))
+    assert pv.raw_gain(DAY, DAY + timedelta(hours=1)) == pytest.approx(2 * half)
+    assert pv.gain(99.5, DAY, DAY + timedelta(hours=3)) == pytest.approx(0.5)
+    assert PvSurplus(RadiationSeries([], [], 3600, TZ), _cfg()).gain(10.0, DAY, DAY + timedelta(hours=1)) == 0.0
+
+
+@pytest.mark.parametrize("step", [3600, 900])
+def test_soc_curve_ends_at_end_of_last_slot(step):
+    cfg = _cfg()
+    n = 86400 // step
+    prices = PriceSeries(T0 + step * np.arange(n), 0.1 + 0.1 * np.sin(np.arange(n) * 2 * np.pi / n), step, TZ)
+    pv = PvSurplus(RadiationSeries(T0 + 3600 * np.arange(24), np.full(24, 300.0), 3600, TZ), cfg)
+    out = plan(40.0, prices, pv, DAY, cfg, TZ)
+    times, values, causes = soc_curve(40.0, pv, out, DAY, cfg, TZ, step)
+    assert times[0] == DAY and times[-1] == DAY + timedelta(days=1)
+    assert len(times) == len(values) == n + 1 and len(causes) == n
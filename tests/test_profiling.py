@@ -0,0 +1,70 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+import profiling
+import services
+from config import DEFAULTS
+from mock_upstream import MockUpstream
+
+ADVICE = ("cheap_start", "cheap_end", "cheap_price", "exp_start", "exp_end", "exp_price", "target_soc_after_charge")
+
+
+def _run(coro):
+    async def go():
+        try:
+            return await coro
+        finally:
+            await services.aclose_http()
+    return asyncio.run(go())
+
+
+def test_request_key_ignores_endpoint():
+    body = json.dumps({"query": "q", "variables": {"startDate": "2025-06-02"}})
+    a = httpx.Request("POST", "https://a.example/graphql", content=body)
+    b = httpx.Request("POST", "https://b.example/graphql", content=body)
+    assert profiling._request_key(a) == profiling._request_key(b)
+    get = httpx.Request("GET", "https://om.example/v1/forecast?latitude=51.9&hourly=shortwave_radiation")
+    assert profiling._request_key(get) == "GET /v1/forecast?latitude=51.9&hourly=shortwave_radiation"
+
+
+def test_record_then_replay_without_network(isolated_services, tmp_path, monkeypatch):
+    bundle = str(tmp_path / "run.json")
+    cfg = {**DEFAULTS, "solis_api_id": "id", "solis_api_secret": "geheim"}
+    mock = MockUpstream()
+    mock.start()
+    mock.install()
+    try:
+        recorded = _run(profiling.record(cfg, "M", 40.0, "00:00", bundle))
+    finally:
+        mock.stop()
+    requests = mock.stats["fe_requests"] + mock.stats["om_requests"]
+
+    with open(bundle, "r", encoding="utf-8") as f:
+        saved = json.load(f)
+    assert "solis_api_secret" not in saved["cfg"] and saved["cfg"]["use_solis_soc_today"] is False
+    assert saved["responses"] and saved["soc"] == 40.0
+
+    # Lege caches: het afspelen moet alles uit de bundel halen, de (gestopte) mock krijgt niets meer
+    monkeypatch.setattr(services, "_radiation_mem", {})
+    replayed = _run(profiling.replay(bundle, str(tmp_path / "prof"), "replay"))
+    assert mock.stats["fe_requests"] + mock.stats["om_requests"] == requests
+    assert "note" not in recorded
+    assert {k: replayed[k] for k in ADVICE} == {k: recorded[k] for k in ADVICE}
+    assert replayed["series"]["soc_values"] == recorded["series"]["soc_values"]
+
+    for ext in (".pstats", ".collapsed", ".json"):
+        assert (tmp_path / "prof" / ("replay" + ext)).exists()
+    with open(tmp_path / "prof" / "replay.json", "r", encoding="utf-8") as f:
+        summary = json.load(f)
+    assert summary["label"] == "replay" and summary["wall_s"] > 0 and summary["top_cumulative"]
+
+
+def test_replay_answers_unknown_requests_with_404(isolated_services, tmp_path):
+    bundle = tmp_path / "empty.json"
+    bundle.write_text(json.dumps({"cfg": dict(DEFAULTS), "choice": "M", "soc": 40.0, "hhmm": "00:00",
+                                  "now": "2025-06-02T12:00:00+02:00", "responses": {}}), encoding="utf-8")
+    with pytest.raises((RuntimeError, httpx.HTTPStatusError), match="404"):
+        _run(profiling.replay(str(bundle)))
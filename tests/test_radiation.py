@@ -0,0 +1,77 @@
+import asyncio
+import time
+from datetime import datetime, timezone
+from zoneinfo import ZoneInfo
+
+import pytest
+
+import services
+from store import RadiationStore
+
+TZ = ZoneInfo("Europe/Amsterdam")
+CFG = {"lat": 52.0, "lon": 5.0, "timezone": "Europe/Amsterdam", "radiation_max_age_min": 180}
+HOURLY = {"time": ["2025-06-02T12:00", "2025-06-02T13:00"], "shortwave_radiation": [500.0, None]}
+
+
+def _ts(hour, minute=0):
+    return datetime(2025, 6, 2, hour, minute, tzinfo=timezone.utc).timestamp()
+
+
+def test_latest_model_run_available():
+    # Run van 09 UTC is om 11 UTC beschikbaar; om 10:59 geldt nog die van 06 UTC (beschikbaar 08 UTC)
+    assert services.latest_model_run_available(_ts(11, 30)) == _ts(11)
+    assert services.latest_model_run_available(_ts(10, 59)) == _ts(8)
+    # Vlak na middernacht: run van 21 UTC gisteren
+    assert services.latest_model_run_available(_ts(1)) == _ts(23) - 24 * 3600
+
+
+def test_radiation_is_fresh():
+    assert services.radiation_is_fresh(_ts(11, 5), _ts(12), 180)
+    assert not services.radiation_is_fresh(_ts(10, 55), _ts(12), 180)     # nieuwere run sindsdien
+    assert not services.radiation_is_fresh(_ts(11, 5), _ts(12), 30)       # te oud
+
+
+@pytest.fixture
+def caches(tmp_path, monkeypatch):
+    monkeypatch.setattr(services, "_radiation_mem", {})
+    store = RadiationStore(str(tmp_path / "s.sqlite"))
+    monkeypatch.setattr(services, "_radiation_store", store)
+    return store
+
+
+def _fetcher(monkeypatch, result):
+    calls = []
+
+    async def fake(cfg):
+        calls.append(cfg)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    monkeypatch.setattr(services, "_fetch_radiation_hourly", fake)
+    return calls
+
+
+def _sw(series):
+    return series.sw.tolist()
+
+
+def test_fresh_cache_is_reused(caches, monkeypatch):
+    calls = _fetcher(monkeypatch, HOURLY)
+    assert _sw(asyncio.run(services.get_radiation_series(CFG, TZ))) == [500.0, 0.0]
+    services._radiation_mem.clear()             # herstart: schijfcache blijft
+    assert _sw(asyncio.run(services.get_radiation_series(CFG, TZ))) == [500.0, 0.0]
+    assert len(calls) == 1
+
+
+def test_stale_cache_served_on_error(caches, monkeypatch):
+    caches.put(services.location_key(CFG), time.time() - 24 * 3600, HOURLY)
+    calls = _fetcher(monkeypatch, RuntimeError("offline"))
+    assert _sw(asyncio.run(services.get_radiation_series(CFG, TZ))) == [500.0, 0.0]
+    assert len(calls) == 1
+
+
+def test_error_without_cache_raises(caches, monkeypatch):
+    _fetcher(monkeypatch, RuntimeError("offline"))
+    with pytest.raises(RuntimeError, match="offline"):
+        asyncio.run(services.get_radiation_series(CFG, TZ))
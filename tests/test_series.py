@@ -0,0 +1,74 @@
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+import numpy as np
+import pytest
+
+from series import PriceSeries, RadiationSeries, TimeSeries
+
+TZ = ZoneInfo("Europe/Amsterdam")
+DAY = datetime(2025, 6, 2, tzinfo=TZ)
+T0 = int(DAY.timestamp())
+
+
+def test_from_points_fills_gaps():
+    s = TimeSeries.from_points([T0, T0 + 7200], [1.0, 3.0], 3600, TZ, fill=-1.0)
+    assert s.t.tolist() == [T0, T0 + 3600, T0 + 7200]
+    assert s.v.tolist() == [1.0, -1.0, 3.0]
+    assert s.t_end == T0 + 3 * 3600
+
+
+def test_index_and_slice():
+    s = TimeSeries(T0 + 3600 * np.arange(24), np.arange(24.0), 3600, TZ)
+    assert s.index(DAY + timedelta(hours=5, minutes=30)) == 5
+    assert s.index(DAY - timedelta(seconds=1)) == -1
+    assert s.at(DAY + timedelta(hours=23, minutes=59)) == 23.0
+    part = s.slice(DAY + timedelta(hours=2, minutes=30), DAY + timedelta(hours=5))
+    assert part.v.tolist() == [2.0, 3.0, 4.0]       # slots die [start, end) overlappen
+    assert np.shares_memory(part.v, s.v)
+
+
+def test_price_blocks_roundtrip():
+    blocks = [{"start": DAY + timedelta(hours=h), "end": DAY + timedelta(hours=h + 1), "price": 0.1 * h}
+              for h in range(24)]
+    s = PriceSeries.from_blocks(blocks, TZ)
+    assert s.step == 3600 and len(s) == 24
+    assert s.blocks() == blocks
+
+
+def test_mixed_resolution_blocks():
+    hourly = [{"start": DAY + timedelta(hours=h), "end": DAY + timedelta(hours=h + 1), "price": float(h)}
+              for h in range(2)]
+    quarters = [{"start": DAY + timedelta(hours=2, minutes=15 * q), "end": DAY + timedelta(hours=2, minutes=15 * (q + 1)),
+                 "price": 10.0 + q} for q in range(4)]
+    s = PriceSeries.from_blocks(hourly + quarters, TZ)
+    assert s.step == 900
+    assert s.t.tolist() == (T0 + 900 * np.arange(12)).tolist()
+    assert s.price.tolist() == [0.0] * 4 + [1.0] * 4 + [10.0, 11.0, 12.0, 13.0]
+
+
+def _radiation(seed, hours=72):
+    rng = np.random.default_rng(seed)
+    return RadiationSeries(T0 + 3600 * np.arange(hours), rng.uniform(0.0, 900.0, hours), 3600, TZ)
+
+
+def test_resample_to_quarters_keeps_hourly_values():
+    r = _radiation(1)
+    q = r.resample(900, T0)
+    assert q.step == 900 and q.t[0] == T0 and q.t_end == r.t_end
+    assert np.allclose(q.sw, np.repeat(r.sw, 4), rtol=0.0, atol=1e-9)
+    assert r.resample(3600, T0) is r
+
+
+def test_resample_preserves_energy():
+    for seed, (step, offset) in enumerate([(900, 0), (1800, 900), (7200, 3600), (5400, 600)]):
+        r = _radiation(seed)
+        out = r.resample(step, T0 + offset)
+        # Nieuw raster dekt de bron volledig; buiten de bron telt 0 W/m2
+        assert out.t[0] <= r.t[0] and out.t_end >= r.t_end
+        assert np.sum(out.sw) * step == pytest.approx(np.sum(r.sw) * 3600, rel=1e-12)
+
+
+def test_resample_empty():
+    r = RadiationSeries([], [], 3600, TZ)
+    assert len(r.resample(900)) == 0
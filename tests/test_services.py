@@ -0,0 +1,153 @@
+import asyncio
+import time
+from zoneinfo import ZoneInfo
+
+import httpx
+import pytest
+
+import services
+
+TZ = ZoneInfo("Europe/Amsterdam")
+A, B, C = services.FE_GRAPHQL_ENDPOINTS
+
+
+@pytest.fixture(autouse=True)
+def fresh_health(monkeypatch):
+    monkeypatch.setattr(services, "_endpoint_health", {})
+    monkeypatch.setattr(services, "FE_HEDGE_DELAY_S", 0.05)
+
+
+def _fake_endpoints(monkeypatch, behaviour):
+    """behaviour: url -> (vertraging s, resultaat of Exception)."""
+    started = []
+
+    async def fake(url, payload, tz):
+        started.append(url)
+        delay, result = behaviour[url]
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            started.append(f"cancelled {url}")
+            raise
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+    monkeypatch.setattr(services, "_query_endpoint", fake)
+    return started
+
+
+def _fetch():
+    return asyncio.run(services.fetch_graphql_day("2025-06-02", "2025-06-03", TZ))
+
+
+def test_endpoint_order_by_health():
+    assert services.endpoint_order() == [A, B, C]
+    services._record_endpoint(A, 2.0, True)
+    services._record_endpoint(B, 0.5, True)
+    services._record_endpoint(C, 0.1, False)        # fout telt als FE_TIMEOUT_S
+    assert services.endpoint_order() == [B, A, C]
+    assert services._endpoint_health[C][0] == services.FE_TIMEOUT_S
+
+
+def test_unmeasured_endpoints_get_neutral_score():
+    services._record_endpoint(A, 3.0, True)
+    assert services.endpoint_order() == [A, B, C]             # één meting is zelf de mediaan: lijstvolgorde
+    services._record_endpoint(B, 0.2, True)
+    assert services.endpoint_order() == [B, C, A]             # C op de mediaan (1.6 s)
+
+
+def test_old_health_expires(monkeypatch):
+    services._record_endpoint(B, 0.5, True)
+    services._record_endpoint(C, 0.2, True)
+    services._endpoint_health[A] = (services.FE_TIMEOUT_S, time.monotonic() - services._HEALTH_MAX_AGE_S - 1.0)
+    assert services.endpoint_order() == [C, A, B]             # A weer op de neutrale score
+    services._record_endpoint(A, 0.1, True)
+    assert services._endpoint_health[A][0] == 0.1             # verlopen EWMA telt niet mee
+
+
+def test_cancelled_sample_is_a_lower_bound():
+    services._record_endpoint(A, 0.1, True)
+    services._record_endpoint(A, 0.05, True, "cancelled")     # sneller dan de schatting: geen informatie
+    assert services._endpoint_health[A][0] == 0.1
+    services._record_endpoint(A, 1.1, True, "cancelled")      # minstens 1.1 s: schatting omhoog
+    assert services._endpoint_health[A][0] == pytest.approx(0.1 + services._HEALTH_ALPHA * 1.0)
+
+
+def test_health_is_ewma():
+    services._record_endpoint(A, 1.0, True)
+    services._record_endpoint(A, 2.0, True)
+    assert services._endpoint_health[A][0] == pytest.approx(1.0 + services._HEALTH_ALPHA * 1.0)
+
+
+def test_slow_endpoint_is_hedged(monkeypatch):
+    started = _fake_endpoints(monkeypatch, {A: (1.0, ["A"]), B: (0.0, ["B"]), C: (0.0, ["C"])})
+    t0 = time.monotonic()
+    assert _fetch() == ["B"]
+    assert time.monotonic() - t0 < 0.5
+    assert started == [A, B, f"cancelled {A}"]        # verliezer afgebroken
+
+
+def test_error_starts_next_endpoint(monkeypatch):
+    started = _fake_endpoints(monkeypatch, {A: (0.0, RuntimeError("down")), B: (0.0, RuntimeError("down")), C: (0.0, ["C"])})
+    assert _fetch() == ["C"]
+    assert started == [A, B, C]
+
+
+def test_all_endpoints_fail(monkeypatch):
+    _fake_endpoints(monkeypatch, {u: (0.0, RuntimeError(f"down {u}")) for u in (A, B, C)})
+    with pytest.raises(RuntimeError, match="Kon Frank Energie prijzen niet ophalen"):
+        _fetch()
+
+
+def test_query_endpoint_parses_local_blocks():
+    data = {"data": {"marketPricesElectricity": [
+        {"from": "2025-06-01T22:00:00.000Z", "till": "2025-06-01T23:00:00.000Z", "marketPrice": 0.12},
+        {"from": "2025-06-01T23:00:00.000Z", "till": "2025-06-02T00:00:00.000Z", "marketPrice": 0.1},
+    ]}}
+
+    async def query():
+        # Gedeelde client van deze loop vervangen door een met MockTransport
+        services._clients[asyncio.get_running_loop()] = httpx.AsyncClient(
+            transport=httpx.MockTransport(lambda request: httpx.Response(200, json=data))
+        )
+        try:
+            return await services._query_endpoint(A, {}, TZ)
+        finally:
+            await services.aclose_http()
+
+    out = asyncio.run(query())
+    assert [(b["start"].hour, b["end"].hour, b["price"]) for b in out] == [(0, 1, 0.12), (1, 2, 0.1)]
+    assert out[0]["start"].tzinfo == TZ
+    assert A in services._endpoint_health
+
+
+def test_cancelled_query_records_no_health():
+    async def slow(request):
+        await asyncio.sleep(1.0)
+        return httpx.Response(200, json={})
+
+    async def race():
+        services._clients[asyncio.get_running_loop()] = httpx.AsyncClient(transport=httpx.MockTransport(slow))
+        try:
+            task = asyncio.create_task(services._query_endpoint(A, {}, TZ))
+            await asyncio.sleep(0.05)
+            task.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await task
+        finally:
+            await services.aclose_http()
+
+    asyncio.run(race())
+    assert A not in services._endpoint_health
+
+
+def test_http_client_shared_per_loop():
+    async def two():
+        c1, c2 = services.http_client(), services.http_client()
+        await services.aclose_http()
+        return c1, c2
+
+    c1, c2 = asyncio.run(two())
+    c3, _ = asyncio.run(two())
+    assert c1 is c2 and c3 is not c1
@@ -0,0 +1,62 @@
+import numpy as np
+import pytest
+
+from config import DEFAULTS
+from simulator import CAUSES, _simulate_batch, cashflow_eur, simulate_soc
+
+
+def _inputs(seed):
+    rng = np.random.default_rng(seed)
+    T = int(rng.integers(1, 60))
+    return dict(
+        pv_pct=np.where(rng.random(T) < 0.5, 0.0, rng.uniform(0.0, 15.0, T)),
+        charge=rng.random(T) < 0.3,
+        discharge=rng.random(T) < 0.3,
+        target_pct=float(rng.choice([50.0, 80.0, 100.0])),
+        floor_pct=float(rng.choice([0.0, 20.0, 35.0])),
+        max_charge_pct=float(rng.uniform(0.0, 30.0)),
+        max_discharge_pct=float(rng.uniform(0.0, 30.0)),
+    ), float(rng.uniform(0.0, 100.0))
+
+
+@pytest.mark.parametrize("seed", range(50))
+def test_single_run_matches_batch(seed):
+    kw, soc0 = _inputs(seed)
+    one = simulate_soc(soc0, **kw)
+    batch = simulate_soc(np.array([soc0, 100.0 - soc0]), **kw)
+    for field in ("soc", "cause", "charged_pct", "discharged_pct"):
+        assert np.array_equal(getattr(one, field), getattr(batch, field)[0])
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_float_path_matches_numpy_loop_at_one_run(seed):
+    kw, soc0 = _inputs(seed)
+    T = len(kw["pv_pct"])
+    one = simulate_soc(soc0, **kw)
+    loop = _simulate_batch(np.array([soc0]), *(np.broadcast_to(np.asarray(v), (1, T)) for v in kw.values()))
+    for field, out in zip(("soc", "cause", "charged_pct", "discharged_pct"), loop):
+        assert np.array_equal(getattr(one, field), np.clip(out[0], 0.0, 100.0) if field == "soc" else out[0])
+
+
+@pytest.mark.parametrize("seed", range(50))
+def test_invariants(seed):
+    kw, soc0 = _inputs(seed)
+    sim = simulate_soc(soc0, **kw)
+    assert np.all((sim.soc >= 0.0) & (sim.soc <= 100.0))
+    assert np.all(sim.charged_pct <= kw["max_charge_pct"] + 1e-9)
+    assert np.all(sim.discharged_pct <= kw["max_discharge_pct"] + 1e-9)
+    assert not np.any(sim.charged_pct[~kw["charge"]])
+    assert not np.any(sim.discharged_pct[~kw["discharge"]])
+    # Ontladen stopt op de vloer
+    assert np.all(sim.soc[1:][sim.discharged_pct > 0] >= kw["floor_pct"] - 1e-9)
+    assert len(sim.cause_labels()) == len(kw["pv_pct"])
+    assert set(sim.cause_labels()) <= set(CAUSES)
+
+
+def test_cashflow():
+    cfg = {**DEFAULTS, "battery_kwh": 10.0, "charge_eff": 0.8, "discharge_eff": 0.9}
+    sim = simulate_soc(20.0, 0.0, [True, False], [False, True], 70.0, 20.0, 50.0, 50.0)
+    assert sim.charged_pct.tolist() == [50.0, 0.0]
+    assert sim.discharged_pct.tolist() == [0.0, 50.0]
+    # 5 kWh opgeslagen: 6.25 kWh inkoop à 0.10, 4.5 kWh afgifte à 0.30
+    assert cashflow_eur([0.10, 0.30], sim, cfg) == pytest.approx(4.5 * 0.30 - 6.25 * 0.10)
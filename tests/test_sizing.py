@@ -0,0 +1,75 @@
+from datetime import timedelta
+
+import pytest
+
+import sizing
+from backtest import run_backtest
+from conftest import BACKTEST_CFG as CFG, BACKTEST_DAYS, BACKTEST_FIRST
+from sizing import _dominates, _name, candidate_grid, sweep
+
+DAYS = [BACKTEST_FIRST + timedelta(days=d) for d in range(BACKTEST_DAYS)]
+
+
+def _cand(bat=10.0, ch=6.0, dis=None, res=20.0):
+    return {"battery_kwh": bat, "inverter_charge_kw": ch, "inverter_discharge_kw": dis or ch, "min_soc_reserve": res}
+
+
+def test_candidate_grid():
+    grid = candidate_grid([30, 50], [6, 12], base_cfg={"min_soc_reserve": 25.0})
+    assert len(grid) == 4
+    assert all(c["inverter_discharge_kw"] == c["inverter_charge_kw"] and c["min_soc_reserve"] == 25.0 for c in grid)
+    assert len(candidate_grid([30], [6], [3, 6], [20, 35])) == 4
+
+
+def test_dominates():
+    small, big = _cand(bat=10.0), _cand(bat=20.0)
+    assert _dominates(small, big, 5.01, 5.0, 0.0)                # minder hardware, meer winst
+    assert not _dominates(small, big, 5.0, 5.0, 0.0)             # gelijke winst snoeit nooit
+    assert not _dominates(big, small, 9.0, 5.0, 0.0)             # meer hardware domineert nooit
+    assert not _dominates(small, big, 4.0, 5.0, 0.0)
+    assert not _dominates(small, small, 5.0, 5.0, 0.0)           # gelijke kandidaat
+    assert not _dominates(_cand(res=10.0), _cand(res=20.0), 9.0, 5.0, 0.0)    # minder reserve
+    assert not _dominates(small, big, 5.2, 5.0, 0.05)            # marge niet gehaald
+    assert _dominates(small, big, 5.3, 5.0, 0.05)
+
+
+def test_sweep_prunes_dominated_after_sample(monkeypatch):
+    cands = [_cand(bat=10.0), _cand(bat=20.0), _cand(bat=30.0)]
+    per_day = {_name(cands[0]): 1.0, _name(cands[1]): 0.9, _name(cands[2]): 1.5}
+    seen = []
+
+    def fake_rows(cfg, days, variants, workers, mode, store_path):
+        seen.append((len(days), [name for name, _ in variants]))
+        return [{"variant": name, "date": d.isoformat(), "sim_profit_eur": per_day[name]}
+                for name, _ in variants for d in days]
+
+    monkeypatch.setattr(sizing, "backtest_rows", fake_rows)
+    table = sweep(CFG, cands, DAYS, sample_every=3)
+    by_name = {_name(r): r for r in table}
+    assert by_name[_name(cands[1])]["status"].startswith("gesnoeid")
+    assert by_name[_name(cands[1])]["days"] == 2
+    # Steekproef (2 dagen) met alle kandidaten, daarna de overige 4 dagen alleen voor de overlevers
+    assert seen == [(2, [_name(c) for c in cands]), (4, [_name(cands[0]), _name(cands[2])])]
+    assert [r["profit_eur"] for r in table] == [9.0, 6.0, 1.8]
+
+
+def test_sweep_keeps_near_ties(monkeypatch):
+    cands = [_cand(bat=10.0), _cand(bat=20.0)]
+    per_day = {_name(cands[0]): 1.0, _name(cands[1]): 0.97}     # binnen PRUNE_MARGIN
+
+    def fake_rows(cfg, days, variants, workers, mode, store_path):
+        return [{"variant": name, "date": d.isoformat(), "sim_profit_eur": per_day[name]}
+                for name, _ in variants for d in days]
+
+    monkeypatch.setattr(sizing, "backtest_rows", fake_rows)
+    assert all(r["status"] == "volledig" for r in sweep(CFG, cands, DAYS, sample_every=3))
+
+
+def test_sweep_totals_match_backtest(backtest_store, tmp_path):
+    cands = [_cand(bat=5.0, ch=3.0), _cand(bat=10.0, ch=6.0)]
+    table = sweep(CFG, cands, DAYS, workers=2, sample_every=2, store_path=backtest_store)
+    assert all(r["status"] == "volledig" and r["days"] == len(DAYS) for r in table)
+    summary = run_backtest(CFG, DAYS[0], DAYS[-1], str(tmp_path / "bt.jsonl"),
+                           [(_name(c), c) for c in cands], workers=1, store_path=backtest_store)
+    for r in table:
+        assert r["profit_eur"] == pytest.approx(summary[_name(r)]["sim_profit_eur"], abs=0.011)
@@ -0,0 +1,120 @@
+import base64
+import hashlib
+import hmac
+
+import pytest
+import requests
+
+import solis_client
+from solis_client import SolisClient, TokenBucket, account_bucket, backoff_delay, signed_headers
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeResponse:
+    def __init__(self, status, body=None):
+        self.status_code = status
+        self.body = body or {"code": "0", "data": {}}
+
+    def json(self):
+        return self.body
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.HTTPError(f"{self.status_code}")
+
+
+class FakeSession:
+    def __init__(self, outcomes):
+        self.outcomes = list(outcomes)
+        self.calls = []
+
+    def post(self, url, headers, data, timeout):
+        self.calls.append(headers)
+        out = self.outcomes.pop(0)
+        if isinstance(out, Exception):
+            raise out
+        return out
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    c = Clock()
+    monkeypatch.setattr(solis_client.time, "monotonic", c)
+    return c
+
+
+def test_token_bucket_reserve(clock):
+    bucket = TokenBucket(rate=2.0, burst=2)
+    assert [bucket.reserve() for _ in range(4)] == [0.0, 0.0, 0.5, 1.0]
+    clock.now += 1.5            # 3 tokens refilled, 2 of them were already owed
+    assert bucket.reserve() == 0.0
+    clock.now += 10.0           # never saves up more than burst
+    assert [bucket.reserve() for _ in range(3)] == [0.0, 0.0, 0.5]
+
+
+def test_account_bucket_shared_per_account():
+    assert account_bucket("acct-a") is account_bucket("acct-a")
+    assert account_bucket("acct-a") is not account_bucket("acct-b")
+
+
+def test_backoff_delay_bounds(monkeypatch):
+    monkeypatch.setattr(solis_client.random, "uniform", lambda lo, hi: hi)
+    assert [backoff_delay(a, base=0.5, cap=8.0) for a in range(6)] == [0.5, 1.0, 2.0, 4.0, 8.0, 8.0]
+    monkeypatch.setattr(solis_client.random, "uniform", lambda lo, hi: lo)
+    assert backoff_delay(3) == 0.0
+
+
+def test_signed_headers():
+    body = b'{"sn":"X"}'
+    h = signed_headers("id", "secret", "/v1/api/inverterDetail", body)
+    md5 = base64.b64encode(hashlib.md5(body).digest()).decode()
+    msg = f"POST\n{md5}\napplication/json\n{h['Date']}\n/v1/api/inverterDetail"
+    sign = base64.b64encode(hmac.new(b"secret", msg.encode(), hashlib.sha1).digest()).decode()
+    assert h["Content-MD5"] == md5 and h["Authorization"] == f"API id:{sign}"
+
+
+def _client(monkeypatch, outcomes, max_retries=3):
+    sleeps = []
+    monkeypatch.setattr(solis_client.time, "sleep", sleeps.append)
+    client = SolisClient("id", "secret", max_retries=max_retries, bucket=TokenBucket(1000.0, 1000))
+    client.session = FakeSession(outcomes)
+    return client, sleeps
+
+
+def test_post_retries_transient_errors(monkeypatch):
+    client, sleeps = _client(monkeypatch, [FakeResponse(503), requests.ConnectionError("reset"),
+                                           FakeResponse(200, {"code": 0, "data": {"ok": 1}})])
+    assert client._post("/v1/api/x", {})["data"] == {"ok": 1}
+    assert len(client.session.calls) == 3 and len(sleeps) == 2
+    assert all("Authorization" in h for h in client.session.calls)      # every attempt is signed again
+
+
+def test_post_gives_up_after_max_retries(monkeypatch):
+    client, sleeps = _client(monkeypatch, [FakeResponse(429)] * 3, max_retries=2)
+    with pytest.raises(requests.HTTPError):
+        client._post("/v1/api/x", {})
+    assert len(client.session.calls) == 3
+
+
+def test_post_does_not_retry_client_errors(monkeypatch):
+    client, _ = _client(monkeypatch, [FakeResponse(401)])
+    with pytest.raises(requests.HTTPError):
+        client._post("/v1/api/x", {})
+    client, _ = _client(monkeypatch, [FakeResponse(200, {"code": 1, "msg": "denied"})])
+    with pytest.raises(RuntimeError, match="Solis API error"):
+        client._post("/v1/api/x", {})
+
+
+def test_push_time_of_use_needs_configured_cids(monkeypatch):
+    client, _ = _client(monkeypatch, [])
+    for cids in (None, {"charge_time": [], "charge_soc": [], "discharge_time": [], "discharge_soc": []}):
+        with pytest.raises(NotImplementedError, match="solis_tou_cids"):
+            client.push_time_of_use("SN1", "02:00", "04:00", "18:00", "20:00", 90, 35, cids)
+    assert client.session.calls == []
@@ -0,0 +1,100 @@
+import asyncio
+import json
+import time
+
+import httpx
+
+from solis_client import TokenBucket
+from solis_fleet import LIST_PAGE_SIZE, FleetCollector, InverterSnapshot
+
+N = 250
+
+
+def _record(i):
+    rec = {"sn": f"SN{i:03d}", "state": 1, "pac": 1500, "pacStr": "W", "dataTimestamp": "1717315200000"}
+    if i % 3:
+        rec["batteryCapacitySoc"] = 50 + i % 50
+    return rec
+
+
+class FakeCloud:
+    """inverterList over pages, inverterDetail with SOC; tracks how many requests run at once."""
+
+    def __init__(self, broken=()):
+        self.broken = set(broken)
+        self.active = self.peak = 0
+        self.paths = []
+
+    async def __call__(self, request):
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await asyncio.sleep(0.001)
+            body = json.loads(request.content)
+            self.paths.append(request.url.path)
+            assert request.headers["Authorization"].startswith("API id:")
+            if request.url.path == "/v1/api/inverterList":
+                first = (body["pageNo"] - 1) * body["pageSize"]
+                records = [_record(i) for i in range(first, min(N, first + body["pageSize"]))]
+                return httpx.Response(200, json={"code": "0", "data": {"page": {"records": records, "total": N}}})
+            if body["sn"] in self.broken:
+                return httpx.Response(500)
+            i = int(body["sn"][2:])
+            return httpx.Response(200, json={"code": "0", "data": {"batteryCapacitySoc": 10 + i % 50, "batteryPower": 2.0,
+                                                                   "batteryPowerStr": "kW"}})
+        finally:
+            self.active -= 1
+
+
+def _poll(cloud, detail=None, concurrency=4, bucket=None):
+    async def run():
+        async with FleetCollector("id", "secret", base_url="http://fake", concurrency=concurrency,
+                                  bucket=bucket or TokenBucket(1e6, 10 ** 6), max_retries=0) as fleet:
+            await fleet._client.aclose()
+            fleet._client = httpx.AsyncClient(transport=httpx.MockTransport(cloud))
+            return await fleet.poll() if detail is None else await fleet.poll(detail)
+
+    return asyncio.run(run())
+
+
+def test_snapshot_units():
+    s = InverterSnapshot.from_record(_record(1), "list", 0.0)
+    assert (s.sn, s.soc, s.power_kw, s.ts) == ("SN001", 51.0, 1.5, 1717315200.0)
+    s = InverterSnapshot.from_record({"sn": "X", "storage": {"batteryCapacitySoc": "40"}, "pac": ""}, "list", 7.0)
+    assert (s.soc, s.power_kw, s.ts) == (40.0, None, 7.0)
+
+
+def test_poll_fetches_all_pages_and_missing_details():
+    cloud = FakeCloud(broken={"SN003"})
+    snaps, errors = _poll(cloud, "missing")
+    assert len(snaps) == N
+    assert cloud.paths.count("/v1/api/inverterList") == -(-N // LIST_PAGE_SIZE)
+    missing = [f"SN{i:03d}" for i in range(N) if i % 3 == 0]
+    assert cloud.paths.count("/v1/api/inverterDetail") == len(missing)
+    assert list(errors) == ["SN003"] and snaps["SN003"].source == "list"
+    assert snaps["SN006"].source == "detail" and snaps["SN006"].soc == 16.0 and snaps["SN006"].state == 1
+    assert snaps["SN001"].source == "list" and snaps["SN001"].soc == 51.0
+    assert cloud.peak <= 4
+
+
+def test_poll_detail_modes():
+    cloud = FakeCloud()
+    snaps, _ = _poll(cloud, "never")
+    assert "/v1/api/inverterDetail" not in cloud.paths
+    cloud = FakeCloud()
+    snaps, errors = _poll(cloud, "always", concurrency=8)
+    assert cloud.paths.count("/v1/api/inverterDetail") == N and not errors
+    assert all(s.source == "detail" for s in snaps.values())
+    assert 1 < cloud.peak <= 8
+
+
+def test_poll_default_details_every_inverter_at_the_bucket_rate():
+    cloud = FakeCloud()
+    rate = 2000.0
+    t0 = time.perf_counter()
+    snaps, errors = _poll(cloud, bucket=TokenBucket(rate, 1))
+    elapsed = time.perf_counter() - t0
+    assert cloud.paths.count("/v1/api/inverterDetail") == N and not errors
+    assert all(s.source == "detail" for s in snaps.values())
+    # the account bucket sets the cycle time: ~requests / rate
+    assert elapsed >= (len(cloud.paths) - 1) / rate
@@ -0,0 +1,79 @@
+import asyncio
+from datetime import date, datetime, timedelta
+from zoneinfo import ZoneInfo
+
+import services
+from store import PriceStore, SocStore, covers_day
+
+TZ = ZoneInfo("Europe/Amsterdam")
+DAY = date(2025, 3, 30)     # zomertijd-overgang: 23 uurblokken
+
+
+def _blocks(day, hours=None, price=0.1):
+    start = datetime(day.year, day.month, day.day, tzinfo=TZ)
+    end = datetime.combine(day + timedelta(days=1), datetime.min.time(), tzinfo=TZ)
+    out, t = [], start
+    while t < end and (hours is None or len(out) < hours):
+        nxt = (t.astimezone(ZoneInfo("UTC")) + timedelta(hours=1)).astimezone(TZ)
+        out.append({"start": t, "end": nxt, "price": price + len(out) / 100})
+        t = nxt
+    return out
+
+
+def test_covers_day():
+    assert covers_day(_blocks(DAY), DAY, TZ)
+    assert len(_blocks(DAY)) == 23
+    assert not covers_day(_blocks(DAY, hours=12), DAY, TZ)
+    assert not covers_day([], DAY, TZ)
+
+
+def test_put_get_roundtrip(tmp_path):
+    store = PriceStore(str(tmp_path / "s.sqlite"))
+    assert store.get_day(DAY, TZ) is None
+    blocks = _blocks(DAY)
+    store.put_day(DAY, blocks)
+    assert store.get_day(DAY, TZ) == blocks
+    # Opnieuw opslaan vervangt de dag in plaats van rijen toe te voegen
+    store.put_day(DAY, _blocks(DAY, price=0.2))
+    assert [b["price"] for b in store.get_day(DAY, TZ)] == [b["price"] for b in _blocks(DAY, price=0.2)]
+    assert store.days() == [DAY]
+
+
+def test_get_frank_day_local_fetches_only_unknown_days(tmp_path, monkeypatch):
+    today = datetime.now(TZ).date()
+    tomorrow = today + timedelta(days=1)
+    answers = {today.isoformat(): _blocks(today), tomorrow.isoformat(): _blocks(tomorrow, hours=10)}
+    calls = []
+
+    async def fake_fetch(start, end, tz):
+        calls.append(start)
+        return answers[start]
+
+    monkeypatch.setattr(services, "fetch_graphql_day", fake_fetch)
+    monkeypatch.setattr(services, "_price_store", PriceStore(str(tmp_path / "s.sqlite")))
+
+    for _ in range(2):
+        assert asyncio.run(services.get_frank_day_local("today", TZ)).blocks() == answers[today.isoformat()]
+        assert asyncio.run(services.get_frank_day_local("tomorrow", TZ)).blocks() == answers[tomorrow.isoformat()]
+    # Complete dag één keer opgehaald; de onvolledige dag van morgen wordt niet opgeslagen en dus opnieuw gevraagd
+    assert calls == [today.isoformat(), tomorrow.isoformat(), tomorrow.isoformat()]
+
+
+def test_price_history_spans_days(tmp_path):
+    store = PriceStore(str(tmp_path / "s.sqlite"))
+    first, second = _blocks(DAY), _blocks(DAY + timedelta(days=1))
+    store.put_day(DAY, first)
+    store.put_day(DAY + timedelta(days=1), second)
+    start = int(first[20]["start"].timestamp())
+    ts, prices = store.history(start, start + 6 * 3600)
+    assert len(ts) == 6 and ts == sorted(ts)
+    assert prices == [b["price"] for b in (first + second)[20:26]]
+
+
+def test_soc_history_latest_wins(tmp_path):
+    store = SocStore(str(tmp_path / "s.sqlite"))
+    store.record("planned", [100, 200, 300], [10.0, 20.0, 30.0])
+    store.record("planned", [200], [25.0])
+    store.record("measured", [150], [12.0])
+    assert store.history("planned", 0, 300) == ([100, 200], [10.0, 25.0])
+    assert store.history("measured", 0, 1000) == ([150], [12.0])
@@ -0,0 +1,82 @@
+import time
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+import numpy as np
+import pytest
+
+import telemetry
+from telemetry import SocPoller, SocRing, latest_soc, needs_replan, planned_soc_at, soc_drift
+
+TZ = ZoneInfo("Europe/Amsterdam")
+T0 = datetime(2025, 6, 2, 0, 0, tzinfo=TZ)
+PLAN = {"series": {"soc_times": [T0 + timedelta(hours=h) for h in range(3)], "soc_values": [40.0, 60.0, 50.0]}}
+
+
+def test_ring_wraps_and_keeps_order():
+    ring = SocRing(capacity=4)
+    assert ring.latest() is None and len(ring) == 0
+    for i in range(6):
+        ring.append(100.0 + i, float(i))
+    assert len(ring) == 4 and ring.latest() == (105.0, 5.0)
+    ts, soc = ring.window()
+    assert ts.tolist() == [102.0, 103.0, 104.0, 105.0] and soc.tolist() == [2.0, 3.0, 4.0, 5.0]
+    assert ring.window(since_ts=104.0)[1].tolist() == [4.0, 5.0]
+    ts[0] = -1.0                                # kopie: de ring zelf verandert niet
+    assert ring.window()[0][0] == 102.0
+
+
+def test_latest_soc_respects_max_age(monkeypatch):
+    ring = SocRing()
+    monkeypatch.setattr(telemetry, "_soc_ring", ring)
+    assert latest_soc({}) is None
+    ring.append(1000.0, 55.0)
+    assert latest_soc({"solis_soc_max_age_min": 10}, now_ts=1000.0 + 600) == 55.0
+    assert latest_soc({"solis_soc_max_age_min": 10}, now_ts=1000.0 + 601) is None
+
+
+def test_planned_soc_and_drift():
+    series = PLAN["series"]
+    assert planned_soc_at(series, (T0 + timedelta(minutes=30)).timestamp()) == pytest.approx(50.0)
+    assert planned_soc_at(series, (T0 - timedelta(minutes=1)).timestamp()) is None
+    assert planned_soc_at({}, 0.0) is None
+
+    ring = SocRing()
+    assert soc_drift(PLAN, ring) is None
+    ring.append((T0 + timedelta(hours=1, minutes=30)).timestamp(), 48.0)     # gepland 55
+    assert soc_drift(PLAN, ring) == pytest.approx(-7.0)
+    assert needs_replan(PLAN, {"replan_drift_pct": 5.0}, ring)
+    assert not needs_replan(PLAN, {"replan_drift_pct": 8.0}, ring)
+    assert not needs_replan({"note": "geen prijzen"}, {}, ring)
+
+
+class FakeSolis:
+    def __init__(self, values):
+        self.values = list(values)
+
+    def get_battery_soc(self, sn):
+        v = self.values.pop(0) if self.values else None
+        if isinstance(v, Exception):
+            raise v
+        return v
+
+
+def test_poller_fills_ring_and_survives_errors():
+    ring = SocRing()
+    poller = SocPoller(FakeSolis([61.0, None, RuntimeError("offline"), 62.5]), "SN1", ring, interval_s=0.0, record=False)
+    assert poller.poll_once() == 61.0
+    assert poller.poll_once() is None
+    poller.start()
+    deadline = time.monotonic() + 2.0
+    while len(ring) < 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    poller.stop()
+    assert np.array_equal(ring.window()[1], [61.0, 62.5])
+    assert poller.errors == 1 and isinstance(poller.last_error, RuntimeError)
+
+
+def test_first_read_event_set_after_failed_or_empty_read():
+    for first in (RuntimeError("offline"), None, 55.0):
+        poller = SocPoller(FakeSolis([first]), "SN1", SocRing(), interval_s=60.0, record=False).start()
+        assert poller.first_read.wait(2.0)
+        poller.stop()
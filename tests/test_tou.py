@@ -0,0 +1,154 @@
+import asyncio
+from datetime import datetime, timedelta
+from zoneinfo import ZoneInfo
+
+import pytest
+
+from tou import DISABLED_TIME, TOU_SLOTS, TouPipeline, TouSlot, _FIELDS, diff_params, slot_params, slots_from_windows
+
+TZ = ZoneInfo("Europe/Amsterdam")
+DAY = datetime(2025, 6, 2, tzinfo=TZ)
+CIDS = {f: [1000 + 100 * k + i for i in range(TOU_SLOTS)] for k, f in enumerate(_FIELDS)}
+
+
+class FakeClient:
+    """Records control writes; `fail` = set of cids that raise. Sync and async variants of control/at_read."""
+
+    def __init__(self, fail=()):
+        self.values = {}
+        self.writes = []
+        self.fail = set(fail)
+
+    def control(self, sn, cid, value):
+        if cid in self.fail:
+            raise RuntimeError(f"cid {cid} rejected")
+        self.values[cid] = value
+        self.writes.append((cid, value))
+
+    def at_read(self, sn, cid):
+        return self.values.get(cid, "")
+
+
+class AsyncFakeClient(FakeClient):
+    async def control(self, sn, cid, value):
+        await asyncio.sleep(0)
+        FakeClient.control(self, sn, cid, value)
+
+    async def at_read(self, sn, cid):
+        return FakeClient.at_read(self, sn, cid)
+
+
+def test_diff_params_only_changed():
+    desired = {"charge_time:0": (1000, "02:00-04:00"), "charge_soc:0": (1200, "90"), "discharge_time:0": (1100, "18:00-19:00")}
+    applied = {"charge_time:0": "02:00-04:00", "charge_soc:0": "80"}
+    assert diff_params(applied, desired) == [("charge_soc:0", 1200, "90"), ("discharge_time:0", 1100, "18:00-19:00")]
+    assert diff_params({k: v for k, (_, v) in desired.items()}, desired) == []
+
+
+def test_slot_params_disables_unused_slots():
+    params = slot_params([TouSlot("charge", 0, "02:00", "04:00", 90)], CIDS)
+    assert params["charge_time:0"] == (CIDS["charge_time"][0], "02:00-04:00")
+    assert params["charge_soc:0"] == (CIDS["charge_soc"][0], "90")
+    assert all(params[f"discharge_time:{i}"][1] == DISABLED_TIME for i in range(TOU_SLOTS))
+    assert "discharge_soc:0" not in params
+
+
+def test_windows_merge_and_split_at_midnight():
+    windows = [
+        ("charge", DAY + timedelta(hours=2), DAY + timedelta(hours=3), 80),
+        ("charge", DAY + timedelta(hours=3), DAY + timedelta(hours=4), 90),        # adjacent: merged
+        ("discharge", DAY + timedelta(hours=23), DAY + timedelta(hours=25), 30),   # over midnight: split
+    ]
+    slots = slots_from_windows(windows, TZ, now=DAY + timedelta(hours=1))   # horizon runs to 01:00 tomorrow
+    assert [(s.kind, s.start, s.end, s.soc) for s in slots] == [
+        ("charge", "02:00", "04:00", 90),
+        ("discharge", "23:00", "00:00", 30),
+        ("discharge", "00:00", "01:00", 30),
+    ]
+
+
+def _minutes(slot):
+    h0, m0 = map(int, slot.start.split(":"))
+    h1, m1 = map(int, slot.end.split(":"))
+    return ((h1 * 60 + m1) - (h0 * 60 + m0)) % (24 * 60)      # "00:00" as end = midnight
+
+
+@pytest.mark.parametrize("start_h, end_h", [(22, 26), (23.5, 24), (21, 30)])
+def test_split_slots_cover_the_whole_window(start_h, end_h):
+    start, end = DAY + timedelta(hours=start_h), DAY + timedelta(hours=end_h)
+    slots = slots_from_windows([("discharge", start, end, 30)], TZ, now=DAY + timedelta(hours=12))
+    assert sum(_minutes(s) for s in slots) == (end - start) / timedelta(minutes=1)
+    assert all(s.end != "23:59" for s in slots)
+
+
+def test_whole_day_slot_is_not_disabled():
+    slots = slots_from_windows([("charge", DAY, DAY + timedelta(days=1), 90)], TZ, now=DAY)
+    assert [(s.start, s.end) for s in slots] == [("00:00", "23:59")]
+
+
+def test_apply_writes_only_changes(tmp_path):
+    client = FakeClient()
+    state = str(tmp_path / "tou_state.json")
+    slots = [TouSlot("charge", 0, "02:00", "04:00", 90)]
+    first = TouPipeline(client, "SN1", CIDS, state_path=state).apply(slots)
+    assert len(first) == len(client.writes) == 2 * TOU_SLOTS + 1
+    # New pipeline (restart) with the saved state: same plan sends nothing, a changed SOC sends one write
+    pipe = TouPipeline(client, "SN1", CIDS, state_path=state)
+    assert pipe.apply(slots) == []
+    assert pipe.apply([TouSlot("charge", 0, "02:00", "04:00", 80)]) == [("charge_soc:0", CIDS["charge_soc"][0], "80")]
+
+
+def test_apply_resumes_after_failed_batch(tmp_path):
+    bad = CIDS["discharge_time"][0]
+    client = FakeClient(fail={bad})
+    state = str(tmp_path / "tou_state.json")
+    slots = [TouSlot("charge", 0, "02:00", "04:00", 90), TouSlot("discharge", 0, "18:00", "19:00", 30)]
+    total = len(TouPipeline(client, "SN1", CIDS, state_path=None, dry_run=True).apply(slots))
+    with pytest.raises(RuntimeError):
+        TouPipeline(client, "SN1", CIDS, state_path=state, batch_size=4).apply(slots)
+    first = list(client.writes)
+
+    client.fail.clear()
+    sent = TouPipeline(client, "SN1", CIDS, state_path=state, batch_size=4).apply(slots)
+    # Completed batches are checkpointed: the rerun only resends from the failed batch on
+    assert 0 < len(first) < total and len(first) // 4 * 4 + len(sent) == total
+    assert (bad, "18:00-19:00") in [(c, v) for _, c, v in sent]
+
+
+def test_apply_async_checkpoints_successful_commands(tmp_path):
+    bad = CIDS["discharge_time"][0]
+    client = AsyncFakeClient(fail={bad})
+    state = str(tmp_path / "tou_state.json")
+    slots = [TouSlot("charge", 0, "02:00", "04:00", 90), TouSlot("discharge", 0, "18:00", "19:00", 30)]
+    pipe = TouPipeline(client, "SN1", CIDS, state_path=state, batch_size=4)
+    with pytest.raises(RuntimeError):
+        asyncio.run(pipe.apply_async(slots))
+    written = len(client.writes)
+    assert written > 0
+
+    # Resume: only the failed command (and anything after it) is left
+    client.fail.clear()
+    resumed = TouPipeline(client, "SN1", CIDS, state_path=state, batch_size=4)
+    sent = asyncio.run(resumed.apply_async(slots))
+    assert ("discharge_time:0", bad, "18:00-19:00") in sent
+    assert written + len(sent) == len(slot_params(slots, CIDS))
+    assert asyncio.run(resumed.apply_async(slots)) == []
+
+
+def test_pipeline_against_mock_cloud():
+    from mock_solis import MockSolisCloud
+    from solis_client import SolisClient, TokenBucket
+
+    mock = MockSolisCloud(inverters=1)
+    url = mock.start()
+    try:
+        with SolisClient(mock.api_id, mock.api_secret, base_url=url, bucket=TokenBucket(1e6, 10 ** 6)) as client:
+            sn = mock.serials[0]
+            pipe = TouPipeline(client, sn, CIDS, state_path=None)
+            sent = pipe.apply([TouSlot("charge", 0, "02:00", "04:00", 90)])
+            assert mock.stats["bad_signature"] == 0
+            assert mock.stats["control_writes"] == len(sent)
+            assert client.at_read(sn, CIDS["charge_time"][0]) == "02:00-04:00"
+            assert pipe.apply([TouSlot("charge", 0, "02:00", "04:00", 90)]) == []
+    finally:
+        mock.stop()
@@ -0,0 +1,77 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from worker import PlanWorker
+
+
+@pytest.fixture
+def worker():
+    w = PlanWorker()
+    yield w
+    w.close()
+
+
+def _wait(worker, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        out = worker.poll()
+        if out is not None:
+            return out
+        time.sleep(0.005)
+    raise AssertionError("geen resultaat")
+
+
+async def _value(v, delay=0.0):
+    await asyncio.sleep(delay)
+    return v, threading.current_thread().name
+
+
+def test_result_arrives_on_worker_thread(worker):
+    worker.submit(_value(1))
+    assert worker.busy
+    status, (value, thread) = _wait(worker)
+    assert (status, value, thread) == ("ok", 1, "plan-worker")
+    assert not worker.busy
+
+
+def test_newer_submit_drops_older_result(worker):
+    release = threading.Event()
+
+    async def slow():
+        await asyncio.to_thread(release.wait, 2.0)
+        return "oud"
+
+    worker.submit(slow())
+    worker.submit(_value("nieuw", 0.05))
+    release.set()
+    status, (value, _) = _wait(worker)
+    assert (status, value) == ("ok", "nieuw")
+    time.sleep(0.05)
+    assert worker.poll() is None            # het geannuleerde/oude resultaat komt nooit door
+
+
+def test_errors_and_cancel(worker):
+    async def boom():
+        raise ValueError("kapot")
+
+    worker.submit(boom())
+    status, value = _wait(worker)
+    assert status == "error" and isinstance(value, ValueError)
+
+    worker.submit(_value("te laat", 0.2))
+    worker.cancel()
+    assert not worker.busy
+    time.sleep(0.3)
+    assert worker.poll() is None
+
+
+def test_side_task_runs_beside_calculation(worker):
+    worker.submit(_value("plan", 0.1))
+    side = worker.run(asyncio.to_thread(lambda: threading.current_thread().name))
+    assert side.result(2.0) != "plan-worker"            # blokkerend werk in een thread, niet op de loop
+    assert worker.busy
+    status, (value, _) = _wait(worker)
+    assert (status, value) == ("ok", "plan")             # de berekening is niet geannuleerd
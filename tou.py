@@ -0,0 +1,317 @@
+# tou.py
+"""
+Time-of-use command pipeline for Solis inverters (Device Control API).
+
+The plan's charge/discharge windows become a fixed number of daily TOU slots per kind. Each slot is
+two control parameters (time range and SOC). Only parameters whose value differs from the last
+applied schedule are written, in batches; the applied state is saved after every batch, so an
+interrupted run resumes without rewriting what already went through, and repeating a run with the
+same plan sends nothing. With an async client (solis_fleet.FleetCollector) the commands of a batch,
+and the pipelines of different inverters, are sent concurrently under the account token bucket.
+
+Load test (always against the local stand-in server, never a real account):
+
+    python tou.py --inverters 50 --replans 20 --latency 0.02 --concurrency 8
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+
+TOU_SLOTS = 6                     # TOU slots per kind on current Solis hybrids
+TOU_STATE_PATH = "tou_state.json"
+DISABLED_TIME = "00:00-00:00"
+
+_FIELDS = ("charge_time", "charge_soc", "discharge_time", "discharge_soc")
+
+
+class TouSlot:
+    """One daily TOU slot: kind 'charge'/'discharge', slot index, local 'HH:MM' start/end, SOC target %."""
+    __slots__ = ("kind", "index", "start", "end", "soc")
+
+    def __init__(self, kind: str, index: int, start: str, end: str, soc: float):
+        self.kind = kind
+        self.index = index
+        self.start = start
+        self.end = end
+        self.soc = soc
+
+    def __repr__(self):
+        return f"TouSlot({self.kind}#{self.index} {self.start}-{self.end} {self.soc:.0f}%)"
+
+
+def check_cids(cids: dict, n_slots: int = TOU_SLOTS) -> dict:
+    """
+    cids: {'charge_time': [cid per slot], 'charge_soc': [...], 'discharge_time': [...], 'discharge_soc': [...]}.
+    The numbers differ per inverter model/firmware, so they come from config (solis_tou_cids).
+    """
+    missing = [f for f in _FIELDS if len(cids.get(f) or []) < n_slots]
+    if missing:
+        raise RuntimeError(
+            f"solis_tou_cids onvolledig ({', '.join(missing)}): vul per veld {n_slots} cid's in "
+            "voor jouw omvormermodel (zie SolisCloud Device Control API)."
+        )
+    return cids
+
+
+# ---------------------------- Plan -> slots ----------------------------
+
+def plan_windows(result: dict):
+    """[(kind, start_dt, end_dt, soc)] from a plan_day result (DP windows if present, else cheap/expensive)."""
+    opt = result.get("optimal")
+    if opt:
+        return [(w["kind"], w["start"], w["end"], w["soc_end"]) for w in opt["windows"]]
+    return [
+        ("charge", result["cheap_start"], result["cheap_end"], result["target_soc_after_charge"]),
+        ("discharge", result["exp_start"], result["exp_end"], result["achievable_min_soc"]),
+    ]
+
+
+def slots_from_windows(windows, tz, now: Optional[datetime] = None, n_slots: int = TOU_SLOTS):
+    """
+    Daily TOU slots for the coming 24 h. Windows that already ended or start later than 24 h from now are
+    skipped; adjacent windows of one kind are merged; windows over midnight are split (TOU times repeat daily)
+    into a part ending at "00:00" (= midnight, end of day) and a part starting at "00:00". Only a slot covering
+    the whole day ends at "23:59", because "00:00-00:00" means a disabled slot. At most n_slots per kind,
+    earliest first.
+    """
+    now = now or datetime.now(tz)
+    horizon = now + timedelta(hours=24)
+    merged = []
+    for kind, start, end, soc in sorted(windows, key=lambda w: w[1]):
+        if end <= now or start >= horizon:
+            continue
+        start, end = max(start, now), min(end, horizon)
+        if merged and merged[-1][0] == kind and merged[-1][2] >= start:
+            merged[-1] = (kind, merged[-1][1], max(end, merged[-1][2]), soc)
+        else:
+            merged.append((kind, start, end, soc))
+
+    parts = []
+    for kind, start, end, soc in merged:
+        s, e = start.astimezone(tz), end.astimezone(tz)
+        while s < e:
+            midnight = datetime.combine(s.date() + timedelta(days=1), datetime.min.time(), tzinfo=tz)
+            cut = min(e, midnight)
+            start_hm, end_hm = s.strftime("%H:%M"), cut.strftime("%H:%M")
+            if cut == midnight and start_hm == "00:00":
+                end_hm = "23:59"            # whole day; 00:00-00:00 would disable the slot
+            parts.append((kind, start_hm, end_hm, soc))
+            s = cut
+
+    slots, used = [], {"charge": 0, "discharge": 0}
+    for kind, start, end, soc in parts:
+        if used[kind] < n_slots and start != end:
+            slots.append(TouSlot(kind, used[kind], start, end, round(float(soc))))
+            used[kind] += 1
+    return slots
+
+
+def slot_params(slots, cids: dict, n_slots: int = TOU_SLOTS) -> dict:
+    """Desired parameter values {'field:slot': (cid, value)}; unused slots are disabled (time only)."""
+    by_key = {(s.kind, s.index): s for s in slots}
+    params = {}
+    for kind in ("charge", "discharge"):
+        for i in range(n_slots):
+            s = by_key.get((kind, i))
+            params[f"{kind}_time:{i}"] = (cids[f"{kind}_time"][i], f"{s.start}-{s.end}" if s else DISABLED_TIME)
+            if s:
+                params[f"{kind}_soc:{i}"] = (cids[f"{kind}_soc"][i], str(int(s.soc)))
+    return params
+
+
+def diff_params(applied: dict, desired: dict):
+    """Commands [(key, cid, value)] for parameters whose desired value differs from the applied one."""
+    return [(key, cid, value) for key, (cid, value) in desired.items() if applied.get(key) != value]
+
+
+# ---------------------------- Pipeline ----------------------------
+
+class TouPipeline:
+    """
+    Diff-based TOU writer for one inverter. `client` is a SolisClient (apply, one command at a time)
+    or a solis_fleet.FleetCollector (apply_async, each batch concurrently).
+    - cids: the Device Control cid's per slot, from config (cfg["solis_tou_cids"]); see check_cids
+    - state_path: JSON with the last applied values per inverter (None = in memory only)
+    - verify: read the current value first (atRead) and skip the write when it already matches;
+      useful after a restart without state or when someone changed the schedule by hand
+    - dry_run: only compute the commands
+    """
+
+    def __init__(self, client, sn: str, cids: dict, state_path: Optional[str] = TOU_STATE_PATH,
+                 batch_size: int = 8, verify: bool = False, dry_run: bool = False, n_slots: int = TOU_SLOTS):
+        self.client = client
+        self.sn = sn
+        self.cids = check_cids(cids, n_slots)
+        self.state_path = state_path
+        self.batch_size = max(1, batch_size)
+        self.verify = verify
+        self.dry_run = dry_run
+        self.n_slots = n_slots
+        self.applied = self._load()
+
+    def _load(self) -> dict:
+        if not self.state_path or not os.path.exists(self.state_path):
+            return {}
+        with open(self.state_path, "r", encoding="utf-8") as f:
+            return (json.load(f) or {}).get(self.sn, {})
+
+    def _save(self):
+        if not self.state_path:
+            return
+        state = {}
+        if os.path.exists(self.state_path):
+            with open(self.state_path, "r", encoding="utf-8") as f:
+                state = json.load(f) or {}
+        state[self.sn] = self.applied
+        tmp = self.state_path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(state, f, indent=2)
+        os.replace(tmp, self.state_path)
+
+    def commands(self, slots):
+        return diff_params(self.applied, slot_params(slots, self.cids, self.n_slots))
+
+    def apply(self, slots):
+        """Write the changed parameters; returns the commands that were (or, in dry_run, would be) sent."""
+        cmds = self.commands(slots)
+        if self.dry_run:
+            return cmds
+        sent = []
+        for b in range(0, len(cmds), self.batch_size):
+            for key, cid, value in cmds[b:b + self.batch_size]:
+                if not (self.verify and self.client.at_read(self.sn, cid) == value):
+                    self.client.control(self.sn, cid, value)
+                    sent.append((key, cid, value))
+                self.applied[key] = value
+            self._save()
+        return sent
+
+    async def apply_async(self, slots):
+        """
+        As apply, with an async client: the commands of a batch go out concurrently (bounded by the client's
+        semaphore and the account token bucket). Successful commands are checkpointed after every batch;
+        if any command of a batch failed, the first error is raised after that checkpoint.
+        """
+        cmds = self.commands(slots)
+        if self.dry_run:
+            return cmds
+        sent = []
+        for b in range(0, len(cmds), self.batch_size):
+            batch = cmds[b:b + self.batch_size]
+            results = await asyncio.gather(*(self._send_async(cid, value) for _, cid, value in batch),
+                                           return_exceptions=True)
+            error = None
+            for (key, cid, value), res in zip(batch, results):
+                if isinstance(res, BaseException):
+                    error = error or res
+                    continue
+                self.applied[key] = value
+                if res:
+                    sent.append((key, cid, value))
+            self._save()
+            if error is not None:
+                raise error
+        return sent
+
+    async def _send_async(self, cid: int, value: str) -> bool:
+        """Write one parameter; False when verify found it already set."""
+        if self.verify and await self.client.at_read(self.sn, cid) == value:
+            return False
+        await self.client.control(self.sn, cid, value)
+        return True
+
+    def apply_plan(self, result: dict, tz, now: Optional[datetime] = None):
+        return self.apply(slots_from_windows(plan_windows(result), tz, now, self.n_slots))
+
+
+async def apply_fleet(jobs):
+    """
+    jobs: [(TouPipeline with an async client, slots)]. All inverters concurrently; returns
+    ({sn: sent commands}, {sn: error message}). A failed inverter keeps its checkpointed batches.
+    """
+    results = await asyncio.gather(*(pipe.apply_async(slots) for pipe, slots in jobs), return_exceptions=True)
+    sent, errors = {}, {}
+    for (pipe, _), res in zip(jobs, results):
+        if isinstance(res, BaseException):
+            errors[pipe.sn] = repr(res)
+        else:
+            sent[pipe.sn] = res
+    return sent, errors
+
+
+# ---------------------------- Load test ----------------------------
+
+def _random_windows(rng: random.Random, day: datetime):
+    """Synthetic plan: 1–3 charge and 1–3 discharge windows of whole hours."""
+    hours = rng.sample(range(24), rng.randint(2, 6))
+    out = []
+    for n, h in enumerate(sorted(hours)):
+        kind = "charge" if n % 2 == 0 else "discharge"
+        start = day + timedelta(hours=h)
+        out.append((kind, start, start + timedelta(hours=1), rng.choice((35, 50, 80, 95))))
+    return out
+
+
+def load_test(inverters: int = 50, replans: int = 20, latency_s: float = 0.0, seed: int = 1,
+              concurrency: int = 8):
+    """Run replans for a fleet against the local mock; compare diff writes with full rewrites."""
+    from zoneinfo import ZoneInfo
+    from mock_solis import MockSolisCloud
+    from solis_client import TokenBucket
+    from solis_fleet import FleetCollector
+
+    tz = ZoneInfo("Europe/Amsterdam")
+    rng = random.Random(seed)
+    mock = MockSolisCloud(inverters=inverters, latency_s=latency_s)
+    url = mock.start()
+    cids = {f: [1000 + 100 * k + i for i in range(TOU_SLOTS)] for k, f in enumerate(_FIELDS)}
+    day = datetime.now(tz).replace(hour=0, minute=0, second=0, microsecond=0)
+    full = 0
+    errors = 0
+
+    async def run():
+        nonlocal full, errors
+        async with FleetCollector(mock.api_id, mock.api_secret, base_url=url, concurrency=concurrency,
+                                  bucket=TokenBucket(1e6, 1e6)) as fleet:
+            pipes = [TouPipeline(fleet, sn, cids, state_path=None) for sn in mock.serials]
+            plans = {p.sn: _random_windows(rng, day) for p in pipes}
+            for r in range(replans):
+                jobs = []
+                for p in pipes:
+                    if r and rng.random() < 0.7:
+                        windows = plans[p.sn]                      # meestal verandert er niets
+                    else:
+                        windows = plans[p.sn] = _random_windows(rng, day)
+                    slots = slots_from_windows(windows, tz, now=day)
+                    full += len(slot_params(slots, cids))
+                    jobs.append((p, slots))
+                errors += len((await apply_fleet(jobs))[1])
+
+    t0 = time.perf_counter()
+    try:
+        asyncio.run(run())
+    finally:
+        mock.stop()
+    elapsed = time.perf_counter() - t0
+    return {"inverters": inverters, "replans": replans, "concurrency": concurrency,
+            "writes": mock.stats["control_writes"], "full_rewrite_writes": full, "errors": errors,
+            "bad_signature": mock.stats["bad_signature"], "seconds": round(elapsed, 2)}
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Solis TOU pipeline load test (local mock server)")
+    ap.add_argument("--inverters", type=int, default=50)
+    ap.add_argument("--replans", type=int, default=20)
+    ap.add_argument("--latency", type=float, default=0.0)
+    ap.add_argument("--concurrency", type=int, default=8, help="concurrent requests (1 = one at a time)")
+    args = ap.parse_args(argv)
+    print(json.dumps(load_test(args.inverters, args.replans, args.latency, concurrency=args.concurrency)))
+
+
+if __name__ == "__main__":
+    main()
@@ -19,6 +19,7 @@ TILT_TABLE = [
 ]
 
 def linear_interp(x, table):
+    """Lineair tussen de punten van `table` [(x, y), ...]; de volgorde van de punten maakt niet uit."""
     table = sorted(table, key=lambda t: t[0])
     if x <= table[0][0]: return table[0][1]
     if x >= table[-1][0]: return table[-1][1]
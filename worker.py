@@ -0,0 +1,91 @@
+import asyncio
+import queue
+import threading
+
+from services import aclose_http
+
+
+class PlanWorker:
+    """
+    Achtergrondthread met één langlevende event loop (httpx-pool en caches blijven warm).
+    - submit(coro) start een berekening en vervangt (annuleert) een eventueel lopende;
+    - resultaten komen in een queue, gelabeld met een generatienummer;
+    - poll() levert alleen resultaten van de laatste generatie, oudere worden weggegooid;
+    - run(coro) draait bijwerk (bijv. historie-queries) op dezelfde loop zonder de berekening te raken.
+    poll() is bedoeld voor de Tk-thread (via root.after), de rest is thread-safe.
+    """
+
+    def __init__(self):
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._run, name="plan-worker", daemon=True)
+        self._results = queue.Queue()
+        self._lock = threading.Lock()
+        self._gen = 0
+        self._future = None
+        self._thread.start()
+
+    def _run(self):
+        asyncio.set_event_loop(self._loop)
+        self._loop.run_forever()
+
+    @property
+    def busy(self) -> bool:
+        """True zolang de laatste berekening nog geen resultaat via poll() heeft afgeleverd."""
+        with self._lock:
+            return self._future is not None
+
+    def submit(self, coro) -> int:
+        """Plan `coro` op de worker-loop; een lopende berekening wordt geannuleerd. Retourneert de generatie."""
+        with self._lock:
+            if self._future is not None:
+                self._future.cancel()
+            self._gen += 1
+            gen = self._gen
+            fut = asyncio.run_coroutine_threadsafe(coro, self._loop)
+            self._future = fut
+        fut.add_done_callback(lambda f, g=gen: self._done(g, f))
+        return gen
+
+    def run(self, coro):
+        """Plan `coro` op de worker-loop naast een lopende berekening; retourneert een concurrent.futures.Future."""
+        return asyncio.run_coroutine_threadsafe(coro, self._loop)
+
+    def _done(self, gen: int, fut):
+        if fut.cancelled():
+            self._results.put((gen, "cancelled", None))
+        elif fut.exception() is not None:
+            self._results.put((gen, "error", fut.exception()))
+        else:
+            self._results.put((gen, "ok", fut.result()))
+
+    def cancel(self):
+        """Annuleer de lopende berekening; een eventueel laat resultaat wordt bij poll() genegeerd."""
+        with self._lock:
+            if self._future is not None:
+                self._future.cancel()
+            self._future = None
+            self._gen += 1
+
+    def poll(self):
+        """Eerstvolgend actueel resultaat als (status, waarde) — status 'ok', 'error' of 'cancelled' — of None."""
+        while True:
+            try:
+                gen, status, value = self._results.get_nowait()
+            except queue.Empty:
+                return None
+            with self._lock:
+                current = gen == self._gen
+                if current:
+                    self._future = None
+            if current:
+                return status, value
+
+    def close(self, timeout: float = 5.0):
+        """Annuleer, sluit de httpx-pool op de worker-loop en stop de thread."""
+        self.cancel()
+        try:
+            asyncio.run_coroutine_threadsafe(aclose_http(), self._loop).result(timeout)
+        except Exception:
+            pass
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join(timeout)